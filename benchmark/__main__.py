@@ -0,0 +1,35 @@
+"""run every benchmark
+
+    python -m benchmark [--tables 10,100,1000,5000] [--output results.json]
+prints, or writes to `--output`, one json document of the results keyed by
+benchmark, with the python version and platform they were measured on.
+"""
+import argparse
+import json
+import platform
+from typing import Any, Dict
+
+from benchmark import bench_introspection, bench_model, bench_scalars, bench_schema
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--tables', default=','.join(map(str, bench_introspection.TABLE_COUNTS)),
+                        help='comma separated catalog sizes')
+    parser.add_argument('--driver', default=bench_introspection.DRIVER)
+    parser.add_argument('--output', help='json file, stdout by default')
+    args = parser.parse_args()
+    results: Dict[str, Any] = {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'scalars': bench_scalars.run(),
+        'model': bench_model.run(),
+        'schema': bench_schema.run(),
+        'introspection': bench_introspection.run(
+            [int(count) for count in args.tables.split(',')], driver=args.driver),
+    }
+    document = json.dumps(results, indent=2)
+    if args.output is None:
+        print(document)
+    else:
+        with open(args.output, 'w') as output:
+            output.write(document)
@@ -0,0 +1,96 @@
+"""introspection benchmark on synthetic sqlite catalogs
+
+    python -m benchmark.bench_introspection [--tables 10,100,1000,5000]
+creates, for every catalog size, a sqlite database of wide tables with a
+composite unique and a composite non unique index, then prints, as json, the
+time and peak python memory of `DbGenerator.get_node` on one table and of
+`DbGenerator.get_nodes` on the whole catalog, with the ODBC catalog
+functions and with the sqlite catalog queries of `--dialect`.
+needs the sqlite ODBC driver of Dockerfile_test (libsqliteodbc).
+"""
+import argparse
+import json
+import os
+import sqlite3
+import tempfile
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, List, Optional
+
+from transpicere.generator.db import DbConfig, DbGenerator
+
+DRIVER = 'SQLite3'
+TABLE_COUNTS = [10, 100, 1000, 5000]
+COLUMN_COUNT = 40
+REPEAT = 3
+# declared types, reported as is by the sqlite driver
+COLUMN_TYPES = ['int4', 'int8', 'text', 'float8', 'numeric',
+                'date', 'time', 'timestamp', 'uuid', 'bool']
+
+
+def table_name(index: int) -> str:
+    return f"t{index:05d}"
+
+
+def create_catalog(path: str, tables: int, columns: int = COLUMN_COUNT) -> None:
+    with sqlite3.connect(path) as cnxn:
+        for index in range(tables):
+            name = table_name(index)
+            definitions = ', '.join(
+                f"c{column} {COLUMN_TYPES[column % len(COLUMN_TYPES)]}" for column in range(columns))
+            cnxn.execute(f"CREATE TABLE {name} ({definitions})")
+            cnxn.execute(f"CREATE UNIQUE INDEX {name}_key ON {name} (c0, c1)")
+            cnxn.execute(f"CREATE INDEX {name}_lookup ON {name} (c2, c3, c5)")
+
+
+def measure(function: Callable[[], Any], repeat: int = REPEAT) -> Dict[str, float]:
+    """best wall time in milliseconds and peak traced memory in KiB"""
+    times: List[float] = []
+    peak = 0
+    for _ in range(repeat):
+        tracemalloc.start()
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+        peak = max(peak, tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+    return {'time_ms': min(times) * 1e3, 'peak_kib': peak / 1024}
+
+
+def run(table_counts: List[int] = TABLE_COUNTS, columns: int = COLUMN_COUNT,
+        driver: str = DRIVER, repeat: int = REPEAT, dialect: Optional[str] = 'sqlite') -> Dict[str, Any]:
+    generator = DbGenerator()
+    results: Dict[str, Any] = {}
+    with tempfile.TemporaryDirectory() as directory:
+        for tables in table_counts:
+            path = os.path.join(directory, f"catalog_{tables}.db")
+            create_catalog(path, tables, columns)
+            connection_string = f"Driver={{{driver}}};Database={path}"
+            # the last table is listed last by the tables catalog
+            node_config = DbConfig(connection_string=connection_string,
+                                   table=table_name(tables - 1))
+            catalog_config = DbConfig(connection_string=connection_string)
+            results[str(tables)] = {
+                'columns': columns,
+                'get_node': measure(lambda: generator.get_node(node_config), repeat),
+                'get_nodes': measure(lambda: generator.get_nodes(catalog_config), repeat),
+            }
+            if dialect is not None:
+                dialect_config = DbConfig(connection_string=connection_string, dialect=dialect)
+                results[str(tables)]['get_nodes_dialect'] = measure(
+                    lambda: generator.get_nodes(dialect_config), repeat)
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--tables', default=','.join(map(str, TABLE_COUNTS)),
+                        help='comma separated catalog sizes')
+    parser.add_argument('--columns', type=int, default=COLUMN_COUNT)
+    parser.add_argument('--driver', default=DRIVER)
+    parser.add_argument('--repeat', type=int, default=REPEAT)
+    parser.add_argument('--dialect', default='sqlite',
+                        help='catalog queries to compare with, empty to skip')
+    args = parser.parse_args()
+    print(json.dumps(run([int(count) for count in args.tables.split(',')],
+                         args.columns, args.driver, args.repeat, args.dialect or None), indent=2))
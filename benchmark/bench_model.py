@@ -0,0 +1,131 @@
+"""memory benchmark of the introspected model
+
+    python -m benchmark.bench_model [--tables 1000] [--columns 100]
+builds the `Node`s of a synthetic catalog, from catalog rows shaped like the
+ones pyodbc returns, with the compact model of `transpicere.generator.db`
+and with plain dataclasses as `Field`, `Query` and `Node` used to be, then
+prints, as json, the traced memory and pickled size of both. both models
+hold the same queries, those of `_build_queries`.
+"""
+import argparse
+import gc
+import json
+import pickle
+import tracemalloc
+from dataclasses import dataclass, field
+from types import SimpleNamespace
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from transpicere.generator.db import (TYPE_MAPPING, Node, _build_fields,
+                                      _build_queries)
+
+TABLE_COUNT = 1000
+COLUMN_COUNT = 100
+TYPE_NAMES = list(TYPE_MAPPING)
+Catalog = List[Tuple[str, List[Any], List[Any]]]
+
+
+@dataclass
+class PlainField:
+    data_type: str
+    is_nullable: bool = field(default=True)
+    is_list: bool = field(default=False)
+
+
+@dataclass
+class PlainQuery:
+    unique: bool
+    return_type: str
+    params: Dict[str, PlainField] = field(default_factory=dict)
+    cardinality: Optional[int] = field(default=None)
+    ranges: Dict[str, PlainField] = field(default_factory=dict)
+
+
+@dataclass
+class PlainNode:
+    name: str
+    fields: Dict[str, PlainField]
+    queries: Dict[str, PlainQuery]
+    table: str = field(default='')
+    schema: Optional[str] = field(default=None)
+
+
+def catalog(tables: int, columns: int) -> Catalog:
+    """columns and statistics rows, with a new string per value as drivers return them"""
+    result: Catalog = []
+    for index in range(tables):
+        table = f"table_{index}"
+        column_rows = [SimpleNamespace(column_name=''.join(['column_', str(column)]),
+                                       type_name=''.join(TYPE_NAMES[column % len(TYPE_NAMES)]))
+                       for column in range(columns)]
+        statistics = [SimpleNamespace(index_name=None, cardinality=1000)]
+        for column in (0, 1):
+            statistics.append(SimpleNamespace(index_name=f"{table}_key", non_unique=0,
+                                              column_name=f"column_{column}", cardinality=1000))
+        for column in (2, 3, 4):
+            statistics.append(SimpleNamespace(index_name=f"{table}_lookup", non_unique=1,
+                                              column_name=f"column_{column}", cardinality=10))
+        result.append((table, column_rows, statistics))
+    return result
+
+
+def compact_model(rows: Catalog) -> Dict[str, Node]:
+    nodes: Dict[str, Node] = dict()
+    for table, columns, statistics in rows:
+        fields = _build_fields(table, columns)
+        nodes[table] = Node(name=table, fields=fields,
+                            queries=_build_queries(table, fields, statistics), table=table)
+    return nodes
+
+
+def plain_model(rows: Catalog) -> Dict[str, PlainNode]:
+    nodes: Dict[str, PlainNode] = dict()
+    for table, columns, statistics in rows:
+        fields = {row.column_name: PlainField(TYPE_MAPPING[row.type_name]) for row in columns}
+        # the column names of the catalog rows, not interned
+        names = {name: name for name in fields}
+
+        def key_fields(columns: Dict[str, Any]) -> Dict[str, PlainField]:
+            return {names[name]: PlainField(fields[name].data_type, is_nullable=False)
+                    for name in columns}
+        queries = {
+            name: PlainQuery(unique=query.unique, return_type=table, params=key_fields(query.params),
+                             cardinality=query.cardinality, ranges=key_fields(query.ranges))
+            for name, query in _build_queries(table, _build_fields(table, columns), statistics).items()
+        }
+        nodes[table] = PlainNode(name=table, fields=fields, queries=queries, table=table)
+    return nodes
+
+
+def measure(build: Callable[[Catalog], Any], tables: int, columns: int) -> Dict[str, float]:
+    rows = catalog(tables, columns)
+    gc.collect()
+    tracemalloc.start()
+    model = build(rows)
+    # the catalog rows are released, as after introspection
+    del rows
+    gc.collect()
+    retained = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return {'memory_kib': retained / 1024, 'pickle_kib': len(pickle.dumps(model)) / 1024}
+
+
+def run(tables: int = TABLE_COUNT, columns: int = COLUMN_COUNT) -> Dict[str, Any]:
+    plain = measure(plain_model, tables, columns)
+    compact = measure(compact_model, tables, columns)
+    return {
+        'tables': tables,
+        'columns': columns,
+        'plain': plain,
+        'compact': compact,
+        'memory_ratio': plain['memory_kib'] / compact['memory_kib'],
+        'pickle_ratio': plain['pickle_kib'] / compact['pickle_kib'],
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--tables', type=int, default=TABLE_COUNT)
+    parser.add_argument('--columns', type=int, default=COLUMN_COUNT)
+    args = parser.parse_args()
+    print(json.dumps(run(args.tables, args.columns), indent=2))
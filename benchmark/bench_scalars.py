@@ -0,0 +1,90 @@
+"""scalar micro benchmark
+
+    python -m benchmark.bench_scalars
+prints, as json, the time per call in microseconds of each datetime parser
+compared to parsing everything with dateutil, and the serialize, parse_value
+and parse_literal throughput in calls per second of every scalar of
+`transpicere.graphql`.
+"""
+import json
+import timeit
+from datetime import date, datetime, time, timezone
+from decimal import Decimal
+from typing import Any, Callable, Dict, Tuple
+from uuid import UUID
+
+from dateutil.parser import parse as dateutil_parse
+from graphql import GraphQLScalarType, StringValueNode, ValueNode, parse_value
+
+import transpicere.graphql
+from transpicere.graphql.graphqldatetime import (parse_date, parse_datetime,
+                                                 parse_datetime_str)
+
+DATETIME_INPUTS = [
+    "2003-09-25T10:49:41",
+    "2003-09-25T10:49:41.502+02:00",
+    "2003-09-25",
+    "Thu Sep 25 10:36:28 2003",
+]
+
+
+# output value, input value and literal of every scalar
+SCALAR_VALUES: Dict[str, Tuple[Any, Any, ValueNode]] = {
+    'Long': (2 ** 40, 2 ** 40, parse_value('1099511627776')),
+    'Datetime': (datetime(2003, 9, 25, 10, 49, 41, tzinfo=timezone.utc), '2003-09-25T10:49:41+00:00',
+                 StringValueNode(value='2003-09-25T10:49:41+00:00')),
+    'Date': (date(2003, 9, 25), '2003-09-25', StringValueNode(value='2003-09-25')),
+    'Time': (time(10, 49, 41), '10:49:41', StringValueNode(value='10:49:41')),
+    'Decimal': (Decimal('1234.5678'), '1234.5678', StringValueNode(value='1234.5678')),
+    'UUID': (UUID('6ba7b810-9dad-11d1-80b4-00c04fd430c8'), '6ba7b810-9dad-11d1-80b4-00c04fd430c8',
+             StringValueNode(value='6ba7b810-9dad-11d1-80b4-00c04fd430c8')),
+}
+
+
+def per_call(function: Callable[[Any], Any], value: Any, number: int) -> float:
+    return timeit.timeit(lambda: function(value), number=number) / number * 1e6
+
+
+def cold(function: Callable[[Any], Any]) -> Callable[[Any], Any]:
+    """defeat the parse cache to time the parser itself"""
+    def parse(value: Any) -> Any:
+        parse_datetime_str.cache_clear()
+        return function(value)
+    return parse
+
+
+def scalars() -> Dict[str, GraphQLScalarType]:
+    return {scalar.name: scalar for scalar in (
+        getattr(transpicere.graphql, name) for name in transpicere.graphql.__all__)}
+
+
+def throughput(number: int = 20000) -> Dict[str, Any]:
+    results: Dict[str, Any] = {}
+    for name, scalar in scalars().items():
+        output_value, input_value, literal = SCALAR_VALUES[name]
+        results[name] = {
+            'serialize_per_s': 1e6 / per_call(scalar.serialize, output_value, number),
+            'parse_value_per_s': 1e6 / per_call(scalar.parse_value, input_value, number),
+            'parse_literal_per_s': 1e6 / per_call(scalar.parse_literal, literal, number),
+        }
+    return results
+
+
+def parsers(number: int = 20000) -> Dict[str, Any]:
+    results: Dict[str, Any] = {}
+    for value in DATETIME_INPUTS:
+        results[value] = {
+            'dateutil_us': per_call(dateutil_parse, value, number),
+            'datetime_cold_us': per_call(cold(parse_datetime), value, number),
+            'datetime_cached_us': per_call(parse_datetime, value, number),
+            'date_us': per_call(parse_date, value, number) if len(value) == 10 else None,
+        }
+    return results
+
+
+def run(number: int = 20000) -> Dict[str, Any]:
+    return {'datetime_parsers': parsers(number), 'throughput': throughput(number)}
+
+
+if __name__ == '__main__':
+    print(json.dumps(run(), indent=2))
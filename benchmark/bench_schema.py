@@ -0,0 +1,73 @@
+"""schema build benchmark
+
+    python -m benchmark.bench_schema [--tables 1000,10000] [--columns 20]
+builds the `GraphQLSchema` of synthetic catalogs, see `bench_model`, and
+prints, as json, the build time and the memory retained by the schema, then
+the time of the first and of a later query on one of its tables.
+"""
+import argparse
+import gc
+import json
+import time
+import tracemalloc
+from contextlib import contextmanager
+from types import SimpleNamespace
+from typing import Any, Dict, Iterator, List
+
+from graphql import graphql_sync
+
+from benchmark.bench_model import catalog, compact_model
+from transpicere.resolver.schema import build_schema
+
+TABLE_COUNTS = [1000, 10000]
+COLUMN_COUNT = 20
+
+
+class Rows:
+    """connection source answering every statement with no row"""
+
+    def execute(self, sql: str, params: Any = ()) -> Any:
+        return SimpleNamespace(fetchall=lambda: [], fetchmany=lambda size: [])
+
+    @contextmanager
+    def borrow(self) -> Iterator['Rows']:
+        yield self
+
+
+def run(table_counts: List[int] = TABLE_COUNTS, columns: int = COLUMN_COUNT) -> Dict[str, Any]:
+    results: Dict[str, Any] = {}
+    for tables in table_counts:
+        nodes = compact_model(catalog(tables, columns))
+        gc.collect()
+        tracemalloc.start()
+        start = time.perf_counter()
+        schema = build_schema(nodes, Rows())
+        built = time.perf_counter() - start
+        gc.collect()
+        retained = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        name = f"table_{tables // 2}"
+        query = f"{{ {name}_{name}_key(column_0: true, column_1: 1) {{ column_0 column_1 }} }}"
+        timings = []
+        for _ in range(2):
+            start = time.perf_counter()
+            result = graphql_sync(schema, query)
+            timings.append(time.perf_counter() - start)
+            assert result.errors is None, result.errors
+        results[str(tables)] = {
+            'columns': columns,
+            'build_ms': built * 1e3,
+            'schema_kib': retained / 1024,
+            'first_query_ms': timings[0] * 1e3,
+            'query_ms': timings[1] * 1e3,
+        }
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--tables', default=','.join(map(str, TABLE_COUNTS)),
+                        help='comma separated catalog sizes')
+    parser.add_argument('--columns', type=int, default=COLUMN_COUNT)
+    args = parser.parse_args()
+    print(json.dumps(run([int(count) for count in args.tables.split(',')], args.columns), indent=2))
@@ -0,0 +1,51 @@
+import sqlite3
+from contextlib import contextmanager
+from types import SimpleNamespace
+
+
+class SqliteCursor:
+    """sqlite cursor recording the sizes of its fetchmany calls"""
+
+    def __init__(self, cursor):
+        self.cursor = cursor
+        self.fetched = []
+
+    def fetchmany(self, size):
+        self.fetched.append(size)
+        return self.cursor.fetchmany(size)
+
+    def __getattr__(self, name):
+        return getattr(self.cursor, name)
+
+
+class SqliteConnections:
+    """runs the generated statements on an in memory sqlite database
+
+    `script` creates the tables, `rows` are inserted by table name. the
+    statements run are recorded in `executed`, their cursors in `cursors`,
+    and the borrows counted in `borrowed`.
+    """
+
+    def __init__(self, script, **rows):
+        self.cnxn = sqlite3.connect(':memory:', check_same_thread=False)
+        self.cnxn.row_factory = lambda cursor, row: SimpleNamespace(
+            **{d[0]: v for d, v in zip(cursor.description, row)})
+        self.cnxn.executescript(script)
+        for table, values in rows.items():
+            if values:
+                self.cnxn.executemany(
+                    f"INSERT INTO {table} VALUES ({', '.join('?' * len(values[0]))})", values)
+        self.executed = []
+        self.cursors = []
+        self.borrowed = 0
+
+    def execute(self, sql, params=()):
+        self.executed.append((sql, list(params)))
+        cursor = SqliteCursor(self.cnxn.execute(sql, params))
+        self.cursors.append(cursor)
+        return cursor
+
+    @contextmanager
+    def borrow(self):
+        self.borrowed += 1
+        yield self
@@ -0,0 +1,75 @@
+import difflib
+import importlib.util
+import os
+import stat
+from dataclasses import replace
+
+from transpicere.generator.codegen import generate_module, write_module
+from transpicere.generator.db import Field, Node, Query, Relation, intern_field
+
+KEY = Field('Int', is_nullable=False)
+NODES = {
+    'db_customer': Node(
+        name='db_customer',
+        fields={'id': Field('Int'), 'name': Field('String'), 'tags': Field('String', is_list=True)},
+        queries={'db_customer_id': Query(unique=True, return_type='db_customer', params={'id': KEY},
+                                         cardinality=1)},
+        table='customer',
+        schema='public',
+        relations={'orders_list_by_customer_id': Relation(
+            unique=False, target='db_orders', columns={'id': 'customer_id'}, cardinality=10)},
+    ),
+    'db_orders': Node(
+        name='db_orders',
+        fields={'id': Field('Int'), 'customer_id': Field('Int'), 'day': Field('Date')},
+        queries={
+            'db_orders_id': Query(unique=True, return_type='db_orders', params={'id': KEY}),
+            'db_orders_customer_id_by_customer_id': Query(
+                unique=False, return_type='db_orders', params={'customer_id': KEY},
+                ranges={'day': Field('Date', is_nullable=False)}),
+        },
+        table="it's orders",
+    ),
+}
+
+
+def load(path):
+    spec = importlib.util.spec_from_file_location('generated_schema', path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def test_module_builds_the_same_nodes(tmp_path):
+    path = tmp_path / 'generated_schema.py'
+    write_module(NODES, str(path), 'db')
+    module = load(path)
+    assert module.NODES == NODES
+    # cardinalities are not compared by ==
+    assert repr(module.NODES) == repr(NODES)
+    assert module.NODES['db_customer'].fields['id'] is intern_field('Int')
+    schema = module.build_schema(connections=None, aggregates=False)
+    assert set(schema.query_type.fields) == {
+        'db_customer_id', 'db_orders_id', 'db_orders_customer_id_by_customer_id'}
+    assert 'orders_list_by_customer_id' in schema.get_type('db_customer').fields
+    assert 'day_between' in schema.query_type.fields['db_orders_customer_id_by_customer_id'].args
+
+
+def test_module_is_readable_by_other_users(tmp_path):
+    path = tmp_path / 'generated_schema.py'
+    umask = os.umask(0o022)
+    try:
+        write_module(NODES, str(path), 'db')
+    finally:
+        os.umask(umask)
+    assert stat.S_IMODE(path.stat().st_mode) == 0o644
+
+
+def test_a_column_change_is_a_line_of_the_diff():
+    changed = dict(NODES)
+    changed['db_orders'] = replace(NODES['db_orders'], fields={
+        **NODES['db_orders'].fields, 'day': Field('Datetime')})
+    diff = [line for line in difflib.unified_diff(
+        generate_module(NODES).splitlines(), generate_module(changed).splitlines(), lineterm='', n=0)
+        if line[:1] in '+-' and line[:3] not in ('+++', '---')]
+    assert diff == ["-            'day': F('Date'),", "+            'day': F('Datetime'),"]
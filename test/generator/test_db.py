@@ -2,7 +2,11 @@ import unittest
 import pyodbc
 import string
 import shortuuid
+import tempfile
+from dataclasses import replace
 from transpicere.generator.db import DbConfig, DbGenerator, Node, Field, Query
+from transpicere.generator.cache import IntrospectionCache
+from transpicere.generator.refresh import SchemaRefresher
 
 ALPHABET = string.ascii_lowercase + string.digits
 SU = shortuuid.ShortUUID(alphabet=ALPHABET)
@@ -85,6 +89,95 @@ class DbTestCase(unittest.TestCase):
                         'bigint_value': Field(data_type='Long', is_nullable=False, is_list=False),
                         'time_value': Field(data_type='Time', is_nullable=False, is_list=False)
                     }
+                ),
+                f'{node.name}_index_name_range': Query(
+                    unique=False,
+                    return_type=node.name,
+                    ranges={
+                        'bigint_value': Field(data_type='Long', is_nullable=False, is_list=False)
+                    }
+                ),
+                f'{node.name}_index_name_by_bigint_value': Query(
+                    unique=False,
+                    return_type=node.name, params={
+                        'bigint_value': Field(data_type='Long', is_nullable=False, is_list=False)
+                    },
+                    ranges={
+                        'time_value': Field(data_type='Time', is_nullable=False, is_list=False)
+                    }
                 )
-            }
+            },
+            table=self.table_name
         )
+
+    def test_db_nodes(self):
+        gen = DbGenerator()
+        node = gen.get_node(config=DbConfig(connection_string=self.connection_string,
+                                            table=self.table_name))
+        nodes = gen.get_nodes(config=DbConfig(connection_string=self.connection_string,
+                                              tables=[self.table_name]))
+        assert nodes == {node.name: node}
+
+        nodes = gen.get_nodes(config=DbConfig(connection_string=self.connection_string,
+                                              schema='public'))
+        assert nodes[node.name] == replace(node, schema='public')
+
+    def test_db_cache(self):
+        cfg = DbConfig(connection_string=self.connection_string,
+                       tables=[self.table_name])
+        with tempfile.TemporaryDirectory() as cache_dir:
+            cache = IntrospectionCache(cache_dir)
+            nodes = cache.get_nodes(cfg)
+            fingerprint = cache.fingerprint(cfg)
+            assert cache.load(cfg, fingerprint) == nodes
+
+            with pyodbc.connect(self.connection_string) as cnxn:
+                cursor = cnxn.cursor()
+                cursor.execute(
+                    f"ALTER TABLE {self.table_name} ADD COLUMN extra_value INTEGER")
+                cursor.commit()
+            assert cache.load(cfg, cache.fingerprint(cfg)) is None
+            node = next(iter(cache.get_nodes(cfg).values()))
+            assert 'extra_value' in node.fields
+
+            cache.invalidate(cfg)
+            assert cache.load(cfg, cache.fingerprint(cfg)) is None
+
+    def test_db_refresh(self):
+        cfg = DbConfig(connection_string=self.connection_string,
+                       tables=[self.table_name])
+        refresher = SchemaRefresher(cfg, build_schema=dict)
+        nodes = refresher.graphql_schema
+        node_name = next(iter(nodes))
+        assert refresher.refresh() == set()
+        assert refresher.graphql_schema is nodes
+
+        with pyodbc.connect(self.connection_string) as cnxn:
+            cursor = cnxn.cursor()
+            cursor.execute(
+                f"ALTER TABLE {self.table_name} ADD COLUMN extra_value INTEGER")
+            cursor.commit()
+        assert refresher.refresh() == {node_name}
+        assert 'extra_value' in refresher.graphql_schema[node_name].fields
+
+    def test_db_refresh_cache(self):
+        cfg = DbConfig(connection_string=self.connection_string,
+                       tables=[self.table_name])
+        with tempfile.TemporaryDirectory() as cache_dir:
+            cache = IntrospectionCache(cache_dir)
+            nodes = cache.get_nodes(cfg)
+            node_name = next(iter(nodes))
+            # as stored by an other worker
+            stored = {node_name: replace(nodes[node_name], schema='stored')}
+            cache.store(cfg, cache.fingerprint(cfg), stored)
+            refresher = SchemaRefresher(cfg, build_schema=dict, cache=cache)
+            assert refresher.graphql_schema == stored
+            assert refresher.refresh() == set()
+
+            with pyodbc.connect(self.connection_string) as cnxn:
+                cursor = cnxn.cursor()
+                cursor.execute(
+                    f"ALTER TABLE {self.table_name} ADD COLUMN extra_value TEXT")
+                cursor.commit()
+            assert refresher.refresh() == {node_name}
+            assert 'extra_value' in refresher.graphql_schema[node_name].fields
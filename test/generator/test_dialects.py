@@ -0,0 +1,142 @@
+import sqlite3
+from types import SimpleNamespace
+
+import pytest
+
+from transpicere.generator.db import DbConfig, DbGenerator, Field, Query, Relation
+from transpicere.generator.dialects import SQLITE, get_dialect
+
+
+class SqliteCursor:
+    def __init__(self, script=''):
+        self.cnxn = sqlite3.connect(':memory:')
+        self.cnxn.row_factory = lambda cursor, row: SimpleNamespace(
+            **{d[0]: v for d, v in zip(cursor.description, row)})
+        self.cnxn.executescript('''
+            CREATE TABLE item (id INTEGER PRIMARY KEY, category INT8 NOT NULL,
+                               label VARCHAR(20), price DECIMAL(10, 2));
+            CREATE INDEX item_category ON item (category, label);
+            CREATE UNIQUE INDEX item_label ON item (label) WHERE label IS NOT NULL;
+            CREATE TABLE pair (a INT4, b INT4, PRIMARY KEY (b, a));
+        ''' + script)
+
+    def execute(self, sql, *params):
+        return self.cnxn.execute(sql, params)
+
+
+def test_sqlite_catalog():
+    node_names, columns, statistics = SQLITE.catalog(SqliteCursor(), None, [])
+    assert node_names == {'item': 'main_item', 'pair': 'main_pair'}
+    assert [(row.column_name, row.type_name, row.nullable) for row in columns['item']] == [
+        ('id', 'integer', True), ('category', 'int8', False),
+        ('label', 'varchar', True), ('price', 'decimal', True)]
+    # primary key columns in key order, partial indexes skipped
+    assert [(row.index_name, row.column_name) for row in statistics['pair'][1:]] == [
+        ('primary_key', 'b'), ('primary_key', 'a')]
+    assert [row.index_name for row in statistics['item']] == [
+        None, 'item_category', 'item_category', 'primary_key']
+
+
+def test_sqlite_nodes():
+    cursor = SqliteCursor()
+    config = DbConfig(connection_string='', tables=['item'], dialect='sqlite')
+    node_names, columns, statistics = SQLITE.catalog(cursor, None, ['item'])
+    nodes = DbGenerator()._build_nodes(cursor, config, node_names, columns,
+                                       statistics, SQLITE.type_mapping)
+    node = nodes['main_item']
+    assert node.fields == {
+        'id': Field('Long'),
+        'category': Field('Long', is_nullable=False),
+        'label': Field('String'),
+        'price': Field('Decimal'),
+    }
+    assert node.queries == {
+        'main_item_item_category': Query(unique=False, return_type='main_item', params={
+            'category': Field('Long', is_nullable=False),
+            'label': Field('String', is_nullable=False)}),
+        'main_item_id': Query(unique=True, return_type='main_item', params={
+            'id': Field('Long', is_nullable=False)}),
+        'main_item_item_category_range': Query(unique=False, return_type='main_item', ranges={
+            'category': Field('Long', is_nullable=False)}),
+        'main_item_item_category_by_category': Query(
+            unique=False, return_type='main_item',
+            params={'category': Field('Long', is_nullable=False)},
+            ranges={'label': Field('String', is_nullable=False)}),
+        'main_item_id_range': Query(unique=False, return_type='main_item', ranges={
+            'id': Field('Long', is_nullable=False)}),
+    }
+
+
+def test_sqlite_relations():
+    # both foreign keys reference the primary key implicitly
+    cursor = SqliteCursor('''
+        CREATE TABLE sale (id INTEGER PRIMARY KEY, item INT8 REFERENCES item,
+                           b INT4, a INT4, FOREIGN KEY (b, a) REFERENCES pair);
+    ''')
+    node_names, columns, statistics = SQLITE.catalog(cursor, None, [])
+    foreign_keys = SQLITE.foreign_keys(cursor, None, node_names)
+    nodes = DbGenerator()._build_nodes(cursor, DbConfig(connection_string='', dialect='sqlite'),
+                                       node_names, columns, statistics, SQLITE.type_mapping,
+                                       foreign_keys)
+    assert nodes['main_sale'].relations == {
+        'item_by_item': Relation(unique=True, target='main_item', columns={'item': 'id'}),
+        'pair_by_b_a': Relation(unique=True, target='main_pair', columns={'b': 'b', 'a': 'a'}),
+    }
+    assert nodes['main_item'].relations == {
+        'sale_list_by_item': Relation(unique=False, target='main_sale', columns={'id': 'item'})}
+    assert list(nodes['main_pair'].relations['sale_list_by_b_a'].columns) == ['b', 'a']
+    # foreign keys to tables left out are dropped
+    partial = SQLITE.foreign_keys(cursor, None, ['sale', 'pair'])
+    assert [(row.fkcolumn_name, row.pktable_name, row.pkcolumn_name, row.key_seq)
+            for row in partial['sale']] == [('b', 'pair', 'b', 1), ('a', 'pair', 'a', 2)]
+
+
+def test_unmapped_types_are_skipped():
+    cursor = SqliteCursor('''
+        CREATE TABLE document (id INTEGER PRIMARY KEY, body JSONB, data BLOB,
+                               item INT8 REFERENCES item);
+        CREATE INDEX document_body ON document (body);
+        CREATE TABLE raw (data BLOB);
+    ''')
+    node_names, columns, statistics = SQLITE.catalog(cursor, None, [])
+    foreign_keys = SQLITE.foreign_keys(cursor, None, node_names)
+    nodes = DbGenerator()._build_nodes(cursor, DbConfig(connection_string='', dialect='sqlite'),
+                                       node_names, columns, statistics, SQLITE.type_mapping,
+                                       foreign_keys)
+    # the table without a mapped column is left out, not the schema
+    assert set(nodes) == {'main_document', 'main_item', 'main_pair'}
+    node = nodes['main_document']
+    assert list(node.fields) == ['id', 'item']
+    assert set(node.queries) == {'main_document_id', 'main_document_id_range'}
+    assert list(node.relations) == ['item_by_item']
+
+
+def test_unknown_tables_and_dialects():
+    with pytest.raises(ValueError):
+        SQLITE.catalog(SqliteCursor(), None, ['missing'])
+    with pytest.raises(ValueError):
+        get_dialect('oracle')
+    # its statements do not quote identifiers the MySQL way
+    with pytest.raises(ValueError):
+        get_dialect('mysql')
+
+
+def test_expression_indexes_are_dropped():
+    cursor = SqliteCursor('''
+        CREATE UNIQUE INDEX item_category_label ON item (category, lower(label));
+    ''')
+    node_names, columns, statistics = SQLITE.catalog(cursor, None, ['item'])
+    nodes = DbGenerator()._build_nodes(cursor, DbConfig(connection_string='', dialect='sqlite'),
+                                       node_names, columns, statistics, SQLITE.type_mapping)
+    queries = nodes['main_item'].queries
+    # its category alone is not unique
+    assert not any(name.startswith('main_item_item_category_label') for name in queries)
+    assert [name for name, query in queries.items() if query.unique] == ['main_item_id']
+
+
+def test_sqlite_fingerprint():
+    cursor = SqliteCursor()
+    fingerprint = [tuple(vars(row).values()) for row in SQLITE.fingerprint(cursor, None)]
+    assert [tuple(vars(row).values()) for row in SQLITE.fingerprint(cursor, None)] == fingerprint
+    cursor.cnxn.execute('CREATE INDEX item_price ON item (price)')
+    assert [tuple(vars(row).values()) for row in SQLITE.fingerprint(cursor, None)] != fingerprint
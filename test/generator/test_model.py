@@ -0,0 +1,110 @@
+import pickle
+from dataclasses import FrozenInstanceError, replace
+from types import SimpleNamespace as Row
+
+import pytest
+
+from transpicere.generator.db import (DbConfig, DbGenerator, Field, Node, Query, _build_fields,
+                                      _build_queries, intern_field)
+
+
+def build_node():
+    fields = _build_fields('sample', [
+        Row(column_name='id', type_name='int4'),
+        Row(column_name='name', type_name='text'),
+    ])
+    queries = _build_queries('db_sample', fields, [
+        Row(index_name=None, cardinality=100),
+        Row(index_name='sample_pkey', non_unique=0, column_name='id', cardinality=100),
+        Row(index_name='sample_name', non_unique=1, column_name='name', cardinality=20),
+    ])
+    return Node(name='db_sample', fields=fields, queries=queries, table='sample')
+
+
+def test_model_is_slotted_and_frozen():
+    node = build_node()
+    for value in (node, node.queries['db_sample_id'], node.fields['id']):
+        assert not hasattr(value, '__dict__')
+    with pytest.raises(FrozenInstanceError):
+        node.name = 'other'
+    assert replace(node, schema='public').schema == 'public'
+
+
+def test_fields_are_shared():
+    node = build_node()
+    assert node.fields['id'] is intern_field('Int')
+    assert node.queries['db_sample_id'].params['id'] is intern_field('Int', is_nullable=False)
+    assert node.queries['db_sample_name'].cardinality == 5
+
+
+def test_queries_follow_ordinal_positions():
+    fields = _build_fields('sample', [
+        Row(column_name='a', type_name='int4'),
+        Row(column_name='b', type_name='text'),
+    ])
+    queries = _build_queries('db_sample', fields, [
+        Row(index_name='sample_ab', non_unique=1, column_name='b', cardinality=None, ordinal_position=2),
+        Row(index_name='sample_ab', non_unique=1, column_name='a', cardinality=None, ordinal_position=1),
+        Row(index_name='sample_a', non_unique=0, column_name='a', cardinality=None, ordinal_position=1),
+    ])
+    assert list(queries['db_sample_sample_ab'].params) == ['a', 'b']
+    assert list(queries['db_sample_sample_ab_by_a'].params) == ['a']
+    assert list(queries['db_sample_sample_ab_by_a'].ranges) == ['b']
+    # the range on a is generated once, for the first index
+    assert [name for name, query in queries.items() if query.ranges] == [
+        'db_sample_sample_ab_range', 'db_sample_sample_ab_by_a']
+
+
+def test_no_range_on_unordered_types():
+    fields = _build_fields('sample', [
+        Row(column_name='active', type_name='bool'),
+        Row(column_name='uid', type_name='uuid'),
+        Row(column_name='day', type_name='date'),
+    ])
+    queries = _build_queries('db_sample', fields, [
+        Row(index_name='sample_uid', non_unique=0, column_name='uid', cardinality=None),
+        Row(index_name='sample_ad', non_unique=1, column_name='active', cardinality=None, ordinal_position=1),
+        Row(index_name='sample_ad', non_unique=1, column_name='day', cardinality=None, ordinal_position=2),
+        Row(index_name='sample_da', non_unique=1, column_name='day', cardinality=None, ordinal_position=1),
+        Row(index_name='sample_da', non_unique=1, column_name='active', cardinality=None, ordinal_position=2),
+    ])
+    assert set(queries) == {'db_sample_uid', 'db_sample_sample_ad', 'db_sample_sample_ad_by_active',
+                            'db_sample_sample_da', 'db_sample_sample_da_range', 'db_sample_sample_da_by_day'}
+    assert list(queries['db_sample_sample_ad_by_active'].ranges) == ['day']
+    # the prefix followed by an unordered column is still looked up by equality
+    assert list(queries['db_sample_sample_da_by_day'].params) == ['day']
+    assert queries['db_sample_sample_da_by_day'].ranges == {}
+
+
+def test_model_pickles_to_shared_fields():
+    node = build_node()
+    loaded = pickle.loads(pickle.dumps(node))
+    assert loaded == node
+    assert loaded.fields['name'] is intern_field('String')
+    assert loaded.queries == {
+        'db_sample_id': Query(unique=True, return_type='db_sample',
+                              params={'id': Field('Int', is_nullable=False)}),
+        'db_sample_name': Query(unique=False, return_type='db_sample',
+                                params={'name': Field('String', is_nullable=False)}),
+        'db_sample_id_range': Query(unique=False, return_type='db_sample',
+                                    ranges={'id': Field('Int', is_nullable=False)}),
+        'db_sample_name_range': Query(unique=False, return_type='db_sample',
+                                      ranges={'name': Field('String', is_nullable=False)}),
+    }
+
+
+def test_tables_of_several_schemas_need_a_schema():
+    class Cursor:
+        def __init__(self, rows):
+            self.rows = rows
+
+        def tables(self, schema=None, tableType=None):
+            return [Row(table_cat='db', **row) for row in self.rows]
+
+    cursor = Cursor([dict(table_schem='public', table_name='sample'),
+                     dict(table_schem='public', table_name='other')])
+    assert DbGenerator()._get_node_names(cursor, DbConfig('')) == {
+        'sample': 'db_sample', 'other': 'db_other'}
+    cursor.rows.append(dict(table_schem='archive', table_name='sample'))
+    with pytest.raises(ValueError, match='sample is in schemas public and archive'):
+        DbGenerator()._get_node_names(cursor, DbConfig(''))
@@ -0,0 +1,83 @@
+import threading
+import time
+
+from dataclasses import replace
+
+from transpicere.generator.db import DbConfig, Field, Node, Query, Relation
+from transpicere.generator.parallel import introspect, rename_node
+
+
+def make_node(name):
+    return Node(name=name, fields={'id': Field('Int')}, queries={
+        f"{name}_id": Query(unique=True, return_type=name,
+                            params={'id': Field('Int', is_nullable=False)})
+    }, table='sample')
+
+
+class FakeGenerator:
+    """nodes by connection string, after a delay; raises for unknown databases"""
+
+    def __init__(self, nodes, delays=None):
+        self.nodes = nodes
+        self.delays = delays or {}
+        self.release = threading.Event()
+
+    def get_nodes(self, config):
+        delay = self.delays.get(config.connection_string)
+        if delay is not None:
+            self.release.wait(delay)
+        if config.connection_string not in self.nodes:
+            raise ConnectionError(config.connection_string)
+        return {name: make_node(name) for name in self.nodes[config.connection_string]}
+
+
+def test_rename_node():
+    node = rename_node(make_node('db_sample'), 'b_db_sample')
+    assert node.name == 'b_db_sample'
+    assert list(node.queries) == ['b_db_sample_id']
+    assert node.queries['b_db_sample_id'].return_type == 'b_db_sample'
+
+
+def test_collisions_are_renamed_in_config_order():
+    generator = FakeGenerator({'a': ['db_sample'], 'b': ['db_sample', 'db_other']},
+                              delays={'a': 0.05})
+    result = introspect([DbConfig('a'), DbConfig('b', name='replica')], generator)
+    assert list(result.nodes) == ['db_sample', 'replica_db_sample', 'db_other']
+    assert result.errors == {}
+
+
+def test_relations_follow_renamed_nodes():
+    class RelatedGenerator(FakeGenerator):
+        def get_nodes(self, config):
+            nodes = super().get_nodes(config)
+            nodes['db_other'] = replace(nodes['db_other'], relations={
+                'sample_by_id': Relation(unique=True, target='db_sample', columns={'id': 'id'})})
+            return nodes
+
+    generator = RelatedGenerator({'a': ['db_sample', 'db_other'], 'b': ['db_sample', 'db_other']})
+    result = introspect([DbConfig('a'), DbConfig('b', name='replica')], generator)
+    assert result.nodes['db_other'].relations['sample_by_id'].target == 'db_sample'
+    assert result.nodes['replica_db_other'].relations['sample_by_id'].target == 'replica_db_sample'
+
+
+def test_failures_and_timeouts_do_not_block_the_others():
+    generator = FakeGenerator({'a': ['db_sample'], 'slow': ['db_slow']},
+                              delays={'slow': 10})
+    start = time.monotonic()
+    result = introspect([DbConfig('slow', timeout=0.1), DbConfig('down'), DbConfig('a')], generator)
+    generator.release.set()
+    assert time.monotonic() - start < 5
+    assert list(result.nodes) == ['db_sample']
+    assert isinstance(result.errors['db0'], TimeoutError)
+    assert isinstance(result.errors['db1'], ConnectionError)
+
+
+def test_hung_database_delays_no_other():
+    generator = FakeGenerator({'a': ['db_sample'], 'hung': ['db_hung']}, delays={'hung': 10})
+    configs = [DbConfig('hung', timeout=0.1), DbConfig('a', timeout=1.0)]
+    start = time.monotonic()
+    result = introspect(configs, generator)
+    generator.release.set()
+    assert time.monotonic() - start < 1
+    assert isinstance(result.errors['db0'], TimeoutError)
+    assert result.sources == {'db_sample': configs[1]}
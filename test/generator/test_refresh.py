@@ -0,0 +1,80 @@
+from types import SimpleNamespace
+
+from transpicere.generator import refresh
+from transpicere.generator.db import DbConfig, DbGenerator, Relation
+from transpicere.generator.refresh import SchemaRefresher
+from test_dialects import SqliteCursor
+
+
+class SqliteConnection:
+    def __init__(self, cursor):
+        self.cursor = lambda: cursor
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        pass
+
+
+def test_refresh_keeps_relations(monkeypatch):
+    cursor = SqliteCursor('''
+        CREATE TABLE sale (id INTEGER PRIMARY KEY, item INT8 REFERENCES item);
+    ''')
+    monkeypatch.setattr(refresh, 'connect', lambda config: SqliteConnection(cursor))
+    refresher = SchemaRefresher(DbConfig(connection_string='', dialect='sqlite'), build_schema=dict)
+    nodes = refresher.graphql_schema
+    assert nodes['main_sale'].relations == {
+        'item_by_item': Relation(unique=True, target='main_item', columns={'item': 'id'})}
+    # the dialect types and nullability are used
+    assert not nodes['main_item'].fields['category'].is_nullable
+    assert refresher.refresh() == set()
+
+    cursor.cnxn.execute('ALTER TABLE item ADD COLUMN stock INT4')
+    # the unchanged sale node keeps its relation to the rebuilt item node
+    assert refresher.refresh() == {'main_item'}
+    nodes = refresher.graphql_schema
+    assert 'stock' in nodes['main_item'].fields
+    assert list(nodes['main_item'].relations) == ['sale_list_by_item']
+    assert list(nodes['main_sale'].relations) == ['item_by_item']
+
+    cursor.cnxn.execute('DROP TABLE sale')
+    assert refresher.refresh() == {'main_item', 'main_sale'}
+    assert refresher.graphql_schema['main_item'].relations == {}
+
+
+def test_foreign_key_change_alone_is_detected(monkeypatch):
+    cursor = SqliteCursor('''
+        CREATE TABLE sale (id INTEGER PRIMARY KEY, item INT8 REFERENCES item);
+    ''')
+    monkeypatch.setattr(refresh, 'connect', lambda config: SqliteConnection(cursor))
+    refresher = SchemaRefresher(DbConfig(connection_string='', dialect='sqlite'), build_schema=dict)
+    assert list(refresher.graphql_schema['main_sale'].relations) == ['item_by_item']
+    # same columns, without the foreign key
+    cursor.cnxn.executescript('''
+        DROP TABLE sale;
+        CREATE TABLE sale (id INTEGER PRIMARY KEY, item INT8);
+    ''')
+    assert refresher.refresh() == {'main_item', 'main_sale'}
+    assert refresher.graphql_schema['main_sale'].relations == {}
+
+
+def test_only_affected_foreign_keys_are_read_again():
+    def key(table, target):
+        return SimpleNamespace(fktable_name=table, pktable_name=target)
+
+    class Generator(DbGenerator):
+        read = []
+
+        def _get_foreign_keys(self, cursor, config, tables):
+            self.read.append(sorted(tables))
+            return {table: [key(table, 'item')] for table in tables if table != 'item'}
+
+    refresher = SchemaRefresher(DbConfig(connection_string=''), build_schema=dict, generator=Generator())
+    tables = {table: f"main_{table}" for table in ('item', 'sale', 'order', 'pair')}
+    refresher._foreign_keys = refresher._read_foreign_keys(None, tables, set(tables), set())
+    refresher._foreign_keys['pair'] = [key('pair', 'other')]
+    # the changed item, and the sale and order tables referencing it
+    foreign_keys = refresher._read_foreign_keys(None, tables, {'item'}, set())
+    assert Generator.read == [['item', 'order', 'pair', 'sale'], ['item', 'order', 'sale']]
+    assert foreign_keys['pair'] == [key('pair', 'other')]
@@ -1,7 +1,8 @@
 import pytest
 from decimal import Decimal
 from transpicere.graphql.graphqldatetime import (
-    parse_datetime, GraphQLDatetime, GraphQLDate, GraphQLTime, GraphQLError)
+    parse_datetime, parse_date, GraphQLDatetime, GraphQLDate, GraphQLTime, GraphQLError)
+from dateutil.parser import parse as dateutil_parse
 from scalar_schema import check_scalar_schema
 import sys
 from datetime import datetime, date, time
@@ -90,6 +91,30 @@ def test_graphqldatetime_parse_error(test_input):
         print(parse_datetime(test_input))
 
 
+@pytest.mark.parametrize("input_value", [
+    "2003-09-25",
+    "2003-09-25T10",
+    "2003-09-25T10:49:41",
+    "2003-09-25 10:49:41.502",
+    "2003-09-25T10:49:41.123456+02:00",
+    "2003-09-25T10:49:41Z",
+    "2003-09-25T10:49:41,502",
+])
+def test_graphqldatetime_iso_matches_dateutil(input_value):
+    assert parse_datetime(input_value) == dateutil_parse(input_value)
+    assert parse_datetime(input_value).isoformat(
+    ) == dateutil_parse(input_value).isoformat()
+
+
+@pytest.mark.parametrize("input_value,inner_value", [
+    ("2003-09-25", date(2003, 9, 25)),
+    ("Thu Sep 25 2003", date(2003, 9, 25)),
+    ("2003-09-25T00:00:00", date(2003, 9, 25)),
+])
+def test_graphqldate_parse(input_value, inner_value):
+    assert parse_date(input_value) == inner_value
+
+
 @pytest.mark.parametrize("input_value,inner_value", [
     ("Thu Sep 25 2003", date(2003, 9, 25)),
     ("2003-09-25", date(2003, 9, 25)),
@@ -156,3 +181,12 @@ def test_graphqldate_schema(input_value, inner_value):
     expected = inner_value.isoformat()
     check_scalar_schema(GraphQLTime, f'"{input_value}"' if isinstance(input_value, str) else input_value,
                         inner_value, expected)
+
+
+def test_graphqldatetime_relative_values_are_not_cached(monkeypatch):
+    import transpicere.graphql.graphqldatetime as graphqldatetime
+    days = iter([datetime(2003, 9, 25), datetime(2003, 9, 26)])
+    monkeypatch.setattr(graphqldatetime, 'dateutil_parse',
+                        lambda value: datetime.combine(next(days), time.fromisoformat(value)))
+    assert parse_datetime("10:30") == datetime(2003, 9, 25, 10, 30)
+    assert parse_datetime("10:30") == datetime(2003, 9, 26, 10, 30)
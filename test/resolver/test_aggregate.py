@@ -0,0 +1,84 @@
+from decimal import Decimal
+
+from graphql import graphql_sync
+
+from transpicere.generator.db import Field, Node, Query
+from transpicere.resolver.aggregate import aggregate_columns
+from transpicere.resolver.schema import build_schema
+from conftest import SqliteConnections
+
+NODE = Node(
+    name='db_sale',
+    fields={
+        'id': Field('Int'),
+        'category': Field('Long'),
+        'amount': Field('Decimal'),
+        'label': Field('String'),
+    },
+    queries={
+        'db_sale_category': Query(unique=False, return_type='db_sale', params={
+            'category': Field('Long', is_nullable=False)
+        }),
+        'db_sale_category_by_category': Query(unique=False, return_type='db_sale', params={
+            'category': Field('Long', is_nullable=False)
+        }, ranges={'id': Field('Int', is_nullable=False)}),
+    },
+    table='sale'
+)
+
+
+SALE = 'CREATE TABLE sale (id INTEGER, category INTEGER, amount TEXT, label TEXT)'
+SALES = [(1, 1, '1.10', 'a'), (2, 1, '2.20', 'b'), (3, 2, '3.30', 'c'), (4, 1, None, 'd')]
+
+
+def test_aggregate_types():
+    assert aggregate_columns(NODE) == {
+        'sum': {'id': 'Long', 'category': 'Decimal', 'amount': 'Decimal'},
+        'avg': {'id': 'Decimal', 'category': 'Decimal', 'amount': 'Decimal'},
+        'min': {'id': 'Int', 'category': 'Long', 'amount': 'Decimal'},
+        'max': {'id': 'Int', 'category': 'Long', 'amount': 'Decimal'},
+    }
+
+
+def test_table_aggregate_is_a_single_select():
+    connections = SqliteConnections(SALE, sale=SALES)
+    schema = build_schema({NODE.name: NODE}, connections)
+    result = graphql_sync(schema, """{
+        db_sale_aggregate { count sum { id } avg { id } max { id } m: max { category } }
+    }""")
+    assert result.errors is None
+    assert result.data == {'db_sale_aggregate': {
+        'count': 4, 'sum': {'id': 10}, 'avg': {'id': Decimal('2.5')},
+        'max': {'id': 4}, 'm': {'category': 2}}}
+    assert connections.executed == [(
+        'SELECT AVG("id") AS "a0", COUNT(*) AS "a1", MAX("category") AS "a2", '
+        'MAX("id") AS "a3", SUM("id") AS "a4" FROM "sale"', [])]
+
+
+def test_connection_aggregate_uses_its_filter():
+    connections = SqliteConnections(SALE, sale=SALES)
+    schema = build_schema({NODE.name: NODE}, connections)
+    result = graphql_sync(schema, """{
+        a: db_sale_category(category: 1, first: 1) { aggregate { count } }
+        b: db_sale_category_by_category(category: 1, id_gte: 2) {
+            edges { node { id } }
+            aggregate { count min { amount } }
+        }
+    }""")
+    assert result.errors is None
+    assert result.data == {
+        'a': {'aggregate': {'count': 3}},
+        'b': {'edges': [{'node': {'id': 2}}, {'node': {'id': 4}}],
+              'aggregate': {'count': 2, 'min': {'amount': Decimal('2.20')}}},
+    }
+    # no page is fetched for a, first and after do not apply to the aggregate
+    assert [params for _, params in connections.executed] == [[1], [1, 2, 101], [1, 2]]
+    assert connections.executed[2][0] == (
+        'SELECT COUNT(*) AS "a0", MIN("amount") AS "a1" FROM "sale" '
+        'WHERE "category" = ? AND "id" >= ?')
+
+
+def test_aggregates_can_be_left_out():
+    schema = build_schema({NODE.name: NODE}, SqliteConnections(SALE, sale=SALES), aggregates=False)
+    assert 'db_sale_aggregate' not in schema.query_type.fields
+    assert 'aggregate' not in schema.get_type('db_sale_connection').fields
@@ -0,0 +1,83 @@
+from dataclasses import replace
+
+from graphql import parse, specified_rules, validate
+
+from transpicere.resolver.cost import DEFAULT_CARDINALITY, cost_rule, filtered_rows, query_rows, table_rows
+from transpicere.resolver.schema import build_schema
+from test_sql import NODE
+from test_schema import FakeConnections
+
+
+def schema_with_cardinality(cardinality):
+    queries = dict(NODE.queries)
+    queries['db_sample_index_name'] = replace(
+        queries['db_sample_index_name'], cardinality=cardinality)
+    node = replace(NODE, queries=queries)
+    return build_schema({node.name: node}, FakeConnections([]), max_page_size=500)
+
+
+def errors(schema, query, max_cost):
+    return [error.message for error in validate(schema, parse(query), [cost_rule(max_cost)])]
+
+
+def test_query_rows():
+    query = NODE.queries['db_sample_index_name']
+    assert query_rows(NODE.queries['db_sample_int_value'])({}) == 1
+    assert query_rows(query, 500, 100)({}) == 100
+    assert query_rows(query, 500, 100)({'first': 10000}) == 500
+    assert query_rows(replace(query, cardinality=7), 500, 100)({'first': 50}) == 7
+    assert query_rows(query, 5000, 100)({'first': 5000}) == DEFAULT_CARDINALITY
+
+
+def test_unique_lookups_cost_one_row_each():
+    schema = schema_with_cardinality(None)
+    query = """{
+        a: db_sample_int_value(int_value: 1) { int_value }
+        b: db_sample_int_value(int_value: 2) { ...f }
+    }
+    fragment f on db_sample { int_value }"""
+    assert errors(schema, query, 2) == []
+    assert errors(schema, query, 1) == [
+        'operation anonymous costs 2 rows, more than the maximum of 1']
+
+
+def test_non_unique_cost_is_bounded_by_page_and_cardinality():
+    query = """query pages($n: Int) {
+        small: db_sample_index_name(bigint_value: 2, time_value: "10:00", first: 20) {
+            edges { node { int_value } }
+        }
+        large: db_sample_index_name(bigint_value: 2, time_value: "10:00", first: $n) {
+            edges { node { int_value } }
+        }
+    }"""
+    assert errors(schema_with_cardinality(None), query, 519) == [
+        'operation pages costs 520 rows, more than the maximum of 519']
+    assert errors(schema_with_cardinality(30), query, 50) == []
+
+
+def test_cost_rule_runs_with_the_specified_rules():
+    schema = schema_with_cardinality(None)
+    query = '{ db_sample_int_value(int_value: 1) { int_value } }'
+    assert validate(schema, parse(query), [*specified_rules, cost_rule(1)]) == []
+
+
+def test_aggregates_cost_the_rows_they_read():
+    schema = schema_with_cardinality(30)
+    query = """{
+        db_sample_aggregate { count }
+        db_sample_index_name(bigint_value: 2, time_value: "10:00", first: 5) {
+            aggregate { count }
+        }
+    }"""
+    # the whole table without statistics, the 30 rows of the filter whatever the page
+    assert errors(schema, query, DEFAULT_CARDINALITY + 35) == []
+    assert errors(schema, query, DEFAULT_CARDINALITY + 34) == [
+        f'operation anonymous costs {DEFAULT_CARDINALITY + 35} rows, more than the maximum of {DEFAULT_CARDINALITY + 34}']
+
+
+def test_table_rows():
+    assert table_rows(NODE)({}) == DEFAULT_CARDINALITY
+    queries = dict(NODE.queries, db_sample_range=replace(
+        NODE.queries['db_sample_index_name'], params={}, cardinality=70))
+    assert table_rows(replace(NODE, queries=queries))({}) == 70
+    assert filtered_rows(NODE.queries['db_sample_int_value'])({}) == 1
@@ -0,0 +1,50 @@
+import threading
+import time
+from dataclasses import replace
+from types import SimpleNamespace as Row
+from graphql import graphql_sync
+from transpicere.resolver.executor import AsyncExecutor
+from transpicere.resolver.schema import build_schema
+from test_sql import NODE
+from test_schema import FakeConnection, FakeConnections
+
+
+class SlowConnection(FakeConnection):
+    def __init__(self, rows):
+        super().__init__(rows)
+        self.threads = set()
+
+    def execute(self, sql, params=()):
+        self.threads.add(threading.current_thread().name)
+        time.sleep(0.2)
+        return super().execute(sql, params)
+
+
+def test_root_fields_run_concurrently():
+    connections = FakeConnections([])
+    connections.cnxn = SlowConnection(
+        [Row(int_value=1, bigint_value=2, time_value=None)])
+    other = replace(NODE, name='db_other', queries={
+        'db_other_int_value': replace(NODE.queries['db_sample_int_value'], return_type='db_other')
+    })
+    schema = build_schema({NODE.name: NODE, other.name: other},
+                          connections, run_async=True)
+    executor = AsyncExecutor(max_workers=4)
+    try:
+        start = time.perf_counter()
+        result = graphql_sync(schema, """{
+            a: db_sample_int_value(int_value: 1) { bigint_value }
+            b: db_sample_int_value(int_value: 2) { bigint_value }
+            c: db_other_int_value(int_value: 1) { bigint_value }
+        }""", context_value={}, execution_context_class=executor.execution_context_class())
+        elapsed = time.perf_counter() - start
+    finally:
+        executor.close()
+    assert result.errors is None
+    assert result.data == {'a': {'bigint_value': 2},
+                           'b': None, 'c': {'bigint_value': 2}}
+    # a and b are batched, c runs next to them
+    assert len(connections.cnxn.executed) == 2
+    assert elapsed < 0.4
+    assert all(name.startswith('transpicere-sql')
+               for name in connections.cnxn.threads)
@@ -0,0 +1,96 @@
+from dataclasses import replace
+
+from graphql import graphql_sync, parse
+
+from transpicere.generator.db import Query
+from transpicere.resolver.executor import AsyncExecutor
+from transpicere.resolver.incremental import execute_incrementally
+from transpicere.resolver.schema import build_schema
+
+from conftest import SqliteConnections
+from test_relations import KEY, NODES, ORDERS, TABLES
+
+BY_CUSTOMER = {**NODES, ORDERS.name: replace(ORDERS, queries={
+    **ORDERS.queries,
+    'main_orders_customer_id': Query(unique=False, return_type='main_orders', params={'customer_id': KEY}),
+})}
+
+DEFERRED = """{
+    main_customer_id(id: 1) {
+        name
+        ... @defer(label: "orders") { orders_list_by_customer_id { total } }
+    }
+}"""
+
+STREAMED = """{
+    main_orders_customer_id(customer_id: 1) {
+        edges @stream(initialCount: 1) { node { total line_list_by_order_id { product } } }
+        pageInfo { hasNextPage }
+    }
+}"""
+STREAMED_DATA = {'main_orders_customer_id': {
+    'edges': [{'node': {'total': 5, 'line_list_by_order_id': [{'product': 'a'}, {'product': 'b'}]}}],
+    'pageInfo': {'hasNextPage': False}}}
+STREAMED_PAYLOADS = [{'incremental': [{
+    'items': [{'node': {'total': 7, 'line_list_by_order_id': [{'product': 'c'}]}}],
+    'path': ['main_orders_customer_id', 'edges', 1]}], 'hasNext': False}]
+
+
+def test_deferred_fragment_follows():
+    connections = SqliteConnections(TABLES)
+    result, subsequent = execute_incrementally(
+        build_schema(NODES, connections), parse(DEFERRED), context_value={})
+    assert result.errors is None
+    assert result.data == {'main_customer_id': {'name': 'ada'}}
+    # the fragment is only executed once the initial result is sent
+    assert len(connections.executed) == 1
+    assert list(subsequent) == [{'incremental': [{
+        'data': {'orders_list_by_customer_id': [{'total': 5}, {'total': 7}]},
+        'path': ['main_customer_id'], 'label': 'orders'}], 'hasNext': False}]
+
+
+def test_deferred_root_fields():
+    schema = build_schema(NODES, SqliteConnections(TABLES))
+    result, subsequent = execute_incrementally(schema, parse("""{
+        a: main_customer_id(id: 1) { name }
+        ... @defer { b: main_customer_id(id: 2) { name } }
+        ... @defer(if: false) { c: main_customer_id(id: 1) { id } }
+    }"""), context_value={})
+    assert result.data == {'a': {'name': 'ada'}, 'c': {'id': 1}}
+    assert list(subsequent) == [{'incremental': [
+        {'data': {'b': {'name': 'bob'}}, 'path': []}], 'hasNext': False}]
+
+
+def test_streamed_items_load_their_relations_together():
+    connections = SqliteConnections(TABLES)
+    result, subsequent = execute_incrementally(
+        build_schema(BY_CUSTOMER, connections), parse(STREAMED), context_value={})
+    assert result.errors is None
+    assert result.data == STREAMED_DATA
+    assert list(subsequent) == STREAMED_PAYLOADS
+    # the lines of the streamed orders were fetched with those of the first
+    assert len(connections.executed) == 2
+
+
+def test_async_stream():
+    executor = AsyncExecutor(max_workers=2)
+    try:
+        result, subsequent = execute_incrementally(
+            build_schema(BY_CUSTOMER, SqliteConnections(TABLES), run_async=True), parse(STREAMED),
+            context_value={}, execution_context_class=executor.execution_context_class())
+        assert result.data == STREAMED_DATA
+        assert list(subsequent) == STREAMED_PAYLOADS
+    finally:
+        executor.close()
+
+
+def test_nothing_deferred():
+    schema = build_schema(NODES, SqliteConnections(TABLES))
+    result, subsequent = execute_incrementally(
+        schema, parse('{ main_customer_id(id: 2) { name } }'), context_value={})
+    assert result.data == {'main_customer_id': {'name': 'bob'}}
+    assert subsequent is None
+    # other executors ignore the directives
+    result = graphql_sync(schema, DEFERRED, context_value={})
+    assert result.data == {'main_customer_id': {'name': 'ada', 'orders_list_by_customer_id': [
+        {'total': 5}, {'total': 7}]}}
@@ -0,0 +1,101 @@
+import asyncio
+from dataclasses import replace
+from datetime import datetime, timezone
+from types import SimpleNamespace as Row
+from uuid import UUID
+from transpicere.generator.db import Field, Node, Query
+from transpicere.resolver.loader import BatchQuery, QueryLoader
+from test_sql import NODE
+from test_schema import FakeConnections
+
+
+class RowsByKey(FakeConnections):
+    """answers IN queries on int_value with one row per value, twice for even values"""
+
+    def __init__(self):
+        super().__init__([])
+        execute = self.cnxn.execute
+
+        def lookup(sql, params=()):
+            self.cnxn.rows = [Row(int_value=v, bigint_value=v * 10, time_value=None)
+                              for v in sorted(set(params)) for _ in range(1 + (v % 2 == 0))]
+            return execute(sql, params)
+        self.cnxn.execute = lookup
+
+
+def test_chunks_are_padded_and_bounded():
+    batch = BatchQuery(NODE, NODE.queries['db_sample_index_name'], max_params=10)
+    assert batch.max_keys == 5
+    chunks = list(batch.chunks([(i, i) for i in range(7)], batch.columns))
+    assert [len(values) for _, values in chunks] == [10, 4]
+    assert chunks[0][0].sql.count('(?, ?)') == 5
+    assert chunks[1][1] == [5, 5, 6, 6]
+    assert batch.statement(2, batch.columns) is chunks[1][0]
+
+
+def test_projection_keeps_keys_and_table_order():
+    batch = BatchQuery(NODE, NODE.queries['db_sample_index_name'])
+    assert batch.projection(['int_value', 'unknown']) == (
+        'int_value', 'bigint_value', 'time_value')
+    batch = BatchQuery(NODE, NODE.queries['db_sample_int_value'])
+    assert batch.projection(['time_value']) == ('int_value', 'time_value')
+    assert batch.statement(1, ('int_value',)).sql.startswith(
+        'SELECT "int_value" FROM')
+
+
+def test_wider_projection_is_fetched_again():
+    connections = RowsByKey()
+    loader = QueryLoader(connections, BatchQuery(
+        NODE, NODE.queries['db_sample_int_value']))
+    loader.load_many([(1,)], ('int_value',))
+    loader.load_many([(1,)], ('int_value',))
+    loader.load_many([(1,)], ('int_value', 'bigint_value'))
+    loader.load_many([(1,)], ('int_value',))
+    assert [sql.split(' FROM')[0] for sql, _ in connections.cnxn.executed] == [
+        'SELECT "int_value"', 'SELECT "int_value", "bigint_value"']
+
+
+def test_unique_load_many():
+    connections = RowsByKey()
+    loader = QueryLoader(connections, BatchQuery(
+        NODE, NODE.queries['db_sample_int_value']))
+    rows = loader.load_many([(1,), (3,), (1,)])
+    assert [row.bigint_value for row in rows] == [10, 30, 10]
+    assert loader.load_many([(3,)])[0].bigint_value == 30
+    assert len(connections.cnxn.executed) == 1
+
+
+def test_non_unique_groups_rows():
+    query = replace(NODE.queries['db_sample_int_value'], unique=False)
+    loader = QueryLoader(RowsByKey(), BatchQuery(NODE, query))
+    rows = loader.load_many([(1,), (2,), (5,)])
+    assert [len(r) for r in rows] == [1, 2, 1]
+
+
+def test_load_batches_one_tick():
+    connections = RowsByKey()
+    loader = QueryLoader(connections, BatchQuery(
+        NODE, NODE.queries['db_sample_int_value']))
+
+    async def main():
+        return await asyncio.gather(loader.load((1,)), loader.load((2,)), loader.load((1,)))
+    rows = asyncio.run(main())
+    assert [row.int_value for row in rows] == [1, 2, 1]
+    assert connections.cnxn.executed == [
+        ('SELECT "int_value", "bigint_value", "time_value" FROM "public"."sample" '
+         'WHERE "int_value" IN (?, ?)', [1, 2])]
+
+
+def test_keys_match_the_driver_values():
+    node = Node(name='db_event', fields={'id': Field('UUID'), 'at': Field('Datetime')}, queries={
+        'db_event_id_at': Query(unique=True, return_type='db_event', params={
+            'id': Field('UUID', is_nullable=False), 'at': Field('Datetime', is_nullable=False)})
+    }, table='event')
+    uuid = UUID('0f5e3a1c-2b4d-4c6e-8f00-1a2b3c4d5e6f')
+    # pyodbc returns GUIDs as str, and timestamps without time zone
+    connections = FakeConnections([Row(id=str(uuid).upper(), at=datetime(2021, 1, 2, 3, 4))])
+    loader = QueryLoader(connections, BatchQuery(node, node.queries['db_event_id_at']))
+    rows = loader.load_many([(uuid, datetime(2021, 1, 2, 3, 4, tzinfo=timezone.utc)),
+                             (str(uuid), datetime(2021, 1, 2, 3, 4)),
+                             (uuid, datetime(2021, 1, 2, 3, 5))])
+    assert [row is not None for row in rows] == [True, True, False]
@@ -0,0 +1,66 @@
+import asyncio
+from types import SimpleNamespace as Row
+
+from graphql import graphql, graphql_sync
+
+from transpicere.resolver.metrics import Histogram, Metrics
+from transpicere.resolver.schema import build_schema
+from test_sql import NODE
+from test_schema import FakeConnections
+
+QUERY = '{ db_sample_int_value(int_value: 1) { int_value bigint_value } }'
+LABELS = (NODE.name, 'db_sample_int_value')
+
+
+def test_histogram_buckets():
+    histogram = Histogram((0.1, 1.0))
+    for value in (0.05, 0.1, 0.5, 2.0):
+        histogram.observe(value)
+    assert histogram.cumulative() == [2, 3, 4]
+    assert histogram.count == 4
+
+
+def test_phases_are_labelled_by_node_and_query():
+    metrics = Metrics()
+    connections = FakeConnections([Row(int_value=1, bigint_value=2)])
+    schema = build_schema({NODE.name: NODE}, connections, instrumentation=metrics)
+    result = graphql_sync(schema, QUERY,
+                          execution_context_class=metrics.execution_context_class())
+    assert result.errors is None
+    for phase in ('resolve', 'sql', 'fetch'):
+        assert metrics.histogram(phase, *LABELS).count == 1
+    assert metrics.histogram('serialize').count == 1
+    text = metrics.render()
+    assert ('transpicere_phase_seconds_count{phase="sql",node="db_sample",'
+            'query="db_sample_int_value"} 1') in text
+
+
+def test_async_resolvers_are_timed():
+    metrics = Metrics()
+    connections = FakeConnections([Row(int_value=1, bigint_value=2)])
+    schema = build_schema({NODE.name: NODE}, connections,
+                          run_async=True, instrumentation=metrics)
+    result = asyncio.run(graphql(schema, QUERY, context_value={},
+                                 execution_context_class=metrics.execution_context_class()))
+    assert result.errors is None
+    assert metrics.histogram('resolve', *LABELS).count == 1
+    assert metrics.histogram('serialize').count == 1
+
+
+def test_gauges_are_rendered():
+    metrics = Metrics()
+    metrics.gauge('pool_in_use', lambda: 3)
+    assert metrics.render().endswith(
+        '# TYPE transpicere_pool_in_use gauge\ntranspicere_pool_in_use 3\n')
+
+
+def test_gauge_names_are_sanitized():
+    metrics = Metrics()
+    metrics.gauge('replica_db-1_errors', lambda: 1)
+    metrics.gauge('replica_errors', lambda: 2, labels={'replica': 'db-"1"'})
+    metrics.gauge('replica_errors', lambda: 3, labels={'replica': 'db-2'})
+    assert metrics.render().endswith(
+        '# TYPE transpicere_replica_db_1_errors gauge\ntranspicere_replica_db_1_errors 1\n'
+        '# TYPE transpicere_replica_errors gauge\n'
+        'transpicere_replica_errors{replica="db-\\"1\\""} 2\n'
+        'transpicere_replica_errors{replica="db-2"} 3\n')
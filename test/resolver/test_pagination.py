@@ -0,0 +1,163 @@
+from types import SimpleNamespace
+import pytest
+from graphql import graphql_sync
+from transpicere.generator.db import Node, Field, Query
+from transpicere.resolver.pagination import PageQuery, tiebreaker
+from transpicere.resolver.schema import build_schema
+from conftest import SqliteConnections
+
+NODE = Node(
+    name='db_item',
+    fields={
+        'id': Field(data_type='Int', is_nullable=False),
+        'category': Field(data_type='Long'),
+        'label': Field(data_type='String')
+    },
+    queries={
+        'db_item_id': Query(unique=True, return_type='db_item', params={
+            'id': Field(data_type='Int', is_nullable=False)
+        }),
+        'db_item_category': Query(unique=False, return_type='db_item', params={
+            'category': Field(data_type='Long', is_nullable=False)
+        })
+    },
+    table='item'
+)
+
+
+ITEM = 'CREATE TABLE item (id INTEGER PRIMARY KEY, category INTEGER, label TEXT)'
+
+
+QUERY = """query($first: Int, $after: String) {
+    db_item_category(category: 1, first: $first, after: $after) {
+        edges { cursor node { label } }
+        pageInfo { hasNextPage endCursor }
+    }
+}"""
+
+
+def test_keyset_pages():
+    connections = SqliteConnections(ITEM, item=
+        [(i, i % 2, f"item{i}") for i in range(10, 0, -1)])
+    schema = build_schema({NODE.name: NODE}, connections)
+    labels = []
+    after = None
+    while True:
+        result = graphql_sync(schema, QUERY, variable_values={
+                              'first': 2, 'after': after})
+        assert result.errors is None
+        page = result.data['db_item_category']
+        labels.extend(edge['node']['label'] for edge in page['edges'])
+        after = page['pageInfo']['endCursor']
+        assert after == page['edges'][-1]['cursor']
+        if not page['pageInfo']['hasNextPage']:
+            break
+    assert labels == ['item1', 'item3', 'item5', 'item7', 'item9']
+
+
+def test_max_page_size():
+    schema = build_schema({NODE.name: NODE}, SqliteConnections(ITEM),
+                          max_page_size=10)
+    result = graphql_sync(schema, QUERY, variable_values={'first': 11})
+    assert result.errors[0].message == 'first must be between 0 and 10, got 11'
+
+
+def test_invalid_cursor():
+    schema = build_schema({NODE.name: NODE}, SqliteConnections(ITEM))
+    result = graphql_sync(schema, QUERY, variable_values={'after': 'abc'})
+    assert result.errors[0].message == 'invalid cursor: abc'
+
+
+def test_fetchmany_batches():
+    connections = SqliteConnections(ITEM, item=[(i, 1, f"item{i}") for i in range(250)])
+    page = PageQuery(NODE, NODE.queries['db_item_category'], fetch_size=100).fetch(
+        connections, {'category': 1}, ('id', 'category'), first=220)
+    assert len(page.rows) == 220 and page.has_next_page
+    assert connections.cursors[0].fetched == [100, 100, 21]
+
+
+def test_cursor_roundtrip():
+    page_query = PageQuery(NODE, NODE.queries['db_item_category'])
+    cursor = page_query.encode_cursor(SimpleNamespace(id=3, category=1))
+    assert page_query.decode_cursor(cursor) == [1, 3]
+    other = PageQuery(NODE, NODE.queries['db_item_id'])
+    with pytest.raises(Exception):
+        other.decode_cursor(cursor)
+
+
+def test_range_pages():
+    node = Node(name=NODE.name, fields=NODE.fields, table='item', queries={
+        **NODE.queries,
+        'db_item_id_range': Query(unique=False, return_type='db_item', ranges={
+            'id': Field(data_type='Int', is_nullable=False)
+        })
+    })
+    connections = SqliteConnections(ITEM, item=[(i, i % 2, f"item{i}") for i in range(1, 11)])
+    schema = build_schema({node.name: node}, connections)
+    query = """query($after: String) {
+        db_item_id_range(id_gt: 2, id_lte: 8, first: 4, after: $after) {
+            edges { node { label } }
+            pageInfo { endCursor }
+        }
+    }"""
+    result = graphql_sync(schema, query)
+    assert result.errors is None
+    page = result.data['db_item_id_range']
+    assert [edge['node']['label'] for edge in page['edges']] == [
+        'item3', 'item4', 'item5', 'item6']
+    result = graphql_sync(schema, query, variable_values={
+                          'after': page['pageInfo']['endCursor']})
+    assert [edge['node']['label'] for edge in result.data['db_item_id_range']['edges']] == [
+        'item7', 'item8']
+    result = graphql_sync(
+        schema, '{ db_item_id_range(id_between: [4]) { edges { cursor } } }')
+    assert result.errors[0].message == 'id_between takes two values, got 1'
+
+
+def all_labels(schema, query, args=''):
+    labels = []
+    after = None
+    while True:
+        result = graphql_sync(schema, """query($after: String) {
+            %s(%s first: 1, after: $after) {
+                edges { node { label } }
+                pageInfo { hasNextPage endCursor }
+            }
+        }""" % (query, args), variable_values={'after': after})
+        assert result.errors is None
+        page = result.data[query]
+        labels.extend(edge['node']['label'] for edge in page['edges'])
+        after = page['pageInfo']['endCursor']
+        if not page['pageInfo']['hasNextPage']:
+            return labels
+
+
+def test_null_order_values():
+    # no unique index: the nullable columns tell the rows apart, nulls first
+    node = Node(name=NODE.name, table='item', fields={
+        'label': Field('String'), 'category': Field('Long'), 'id': Field('Int')
+    }, queries={
+        'db_item_category': NODE.queries['db_item_category'],
+        'db_item_category_range': Query(unique=False, return_type='db_item', ranges={
+            'category': Field('Long', is_nullable=False)}),
+    })
+    connections = SqliteConnections(ITEM, item=[
+        (1, 1, 'b'), (2, 1, None), (3, None, 'c'), (4, 1, 'a'), (5, 1, None), (6, 2, 'a')])
+    schema = build_schema({node.name: node}, connections)
+    assert all_labels(schema, 'db_item_category', 'category: 1,') == [None, None, 'a', 'b']
+    # a null range value is not in any range
+    assert all_labels(schema, 'db_item_category_range') == [None, None, 'a', 'b', 'a']
+    assert all_labels(schema, 'db_item_category_range', 'category_gte: 2,') == ['a']
+
+
+def test_nullable_unique_index_is_no_tiebreaker():
+    # a unique index on a nullable column holds any number of nulls
+    node = Node(name=NODE.name, table='item', fields=NODE.fields, queries={
+        'db_item_category': NODE.queries['db_item_category'],
+        'db_item_label': Query(unique=True, return_type='db_item', params={
+            'label': Field('String', is_nullable=False)}),
+    })
+    assert tiebreaker(node) == ('id', 'category', 'label')
+    connections = SqliteConnections(ITEM, item=[(i, 1, None) for i in range(1, 7)])
+    schema = build_schema({node.name: node}, connections)
+    assert all_labels(schema, 'db_item_category', 'category: 1,') == [None] * 6
@@ -0,0 +1,138 @@
+import threading
+import pyodbc
+import pytest
+from transpicere.resolver.pool import ConnectionPool, PoolTimeout
+
+
+class FakeCursor:
+    def __init__(self, cnxn):
+        self.cnxn = cnxn
+
+    def execute(self, sql, *params):
+        self.cnxn.executed += 1
+        if self.cnxn.dead:
+            raise pyodbc.OperationalError('connection lost')
+        return self
+
+    def fetchall(self):
+        return [(1,)]
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    def __init__(self):
+        self.dead = False
+        self.closed = False
+        self.executed = 0
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def close(self):
+        self.closed = True
+
+
+def make_pool(**kwargs):
+    return ConnectionPool('', connect=FakeConnection, **kwargs)
+
+
+def test_reuse():
+    pool = make_pool(max_size=2)
+    with pool.borrow() as first:
+        pass
+    with pool.borrow() as second:
+        assert pool.stats().in_use == 1
+    assert first is second
+    stats = pool.stats()
+    assert (stats.created, stats.idle, stats.in_use, stats.acquired) == (1, 1, 0, 2)
+
+
+def test_min_size():
+    pool = make_pool(min_size=2, max_size=3)
+    assert pool.stats().created == 2
+    assert pool.stats().idle == 2
+
+
+def test_timeout():
+    pool = make_pool(max_size=1, timeout=0.05)
+    with pool.borrow():
+        with pytest.raises(PoolTimeout):
+            with pool.borrow():
+                pass
+    assert pool.stats().timeouts == 1
+
+
+def test_wait_for_release():
+    pool = make_pool(max_size=1, timeout=5)
+    pooled = pool.acquire()
+    threading.Timer(0.05, pool.release, args=(pooled,)).start()
+    with pool.borrow() as cnxn:
+        assert cnxn is pooled.connection
+    stats = pool.stats()
+    assert stats.waits == 1 and stats.wait_time > 0
+
+
+def test_recycle_after_max_uses():
+    pool = make_pool(max_uses=2)
+    with pool.borrow() as first:
+        pass
+    with pool.borrow() as second:
+        pass
+    with pool.borrow() as third:
+        pass
+    assert first is second and third is not first
+    assert first.cnxn.closed
+    assert pool.stats().created == 2
+
+
+def test_recycle_after_max_age():
+    pool = make_pool(max_age=0)
+    with pool.borrow() as first:
+        pass
+    with pool.borrow() as second:
+        pass
+    assert first is not second
+
+
+def test_liveness_check():
+    pool = make_pool(ping_after=0)
+    with pool.borrow() as first:
+        pass
+    first.cnxn.dead = True
+    with pool.borrow() as second:
+        pass
+    assert second is not first
+    assert pool.stats().failed_checks == 1
+
+
+def test_broken_connection_is_discarded():
+    pool = make_pool()
+    with pytest.raises(pyodbc.Error):
+        with pool.borrow() as cnxn:
+            raise pyodbc.OperationalError('lost')
+    assert cnxn.cnxn.closed
+    stats = pool.stats()
+    assert (stats.idle, stats.in_use, stats.closed) == (0, 0, 1)
+
+
+def test_recently_used_connection_is_not_checked():
+    pool = make_pool(ping_after=60)
+    with pool.borrow() as first:
+        pass
+    with pool.borrow() as second:
+        pass
+    assert second is first
+    assert first.cnxn.executed == 0
+
+
+def test_statement_error_keeps_the_connection():
+    pool = make_pool()
+    with pytest.raises(pyodbc.ProgrammingError):
+        with pool.borrow() as first:
+            raise pyodbc.ProgrammingError('syntax error')
+    with pool.borrow() as second:
+        pass
+    assert second is first and not first.cnxn.closed
+    assert pool.stats().closed == 0
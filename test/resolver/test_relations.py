@@ -0,0 +1,115 @@
+import asyncio
+
+from graphql import graphql, graphql_sync, parse, validate
+
+from transpicere.generator.db import Field, Node, Query, Relation
+from transpicere.resolver.cost import cost_rule
+from transpicere.resolver.schema import build_schema
+from conftest import SqliteConnections
+
+KEY = Field('Int', is_nullable=False)
+
+CUSTOMER = Node(
+    name='main_customer',
+    fields={'id': Field('Int'), 'name': Field('String')},
+    queries={'main_customer_id': Query(unique=True, return_type='main_customer', params={'id': KEY})},
+    table='customer',
+    relations={'orders_list_by_customer_id': Relation(
+        unique=False, target='main_orders', columns={'id': 'customer_id'}, cardinality=10)}
+)
+ORDERS = Node(
+    name='main_orders',
+    fields={'id': Field('Int'), 'customer_id': Field('Int'), 'total': Field('Int')},
+    queries={'main_orders_id': Query(unique=True, return_type='main_orders', params={'id': KEY})},
+    table='orders',
+    relations={
+        'customer_by_customer_id': Relation(
+            unique=True, target='main_customer', columns={'customer_id': 'id'}),
+        'line_list_by_order_id': Relation(
+            unique=False, target='main_line', columns={'id': 'order_id'}, cardinality=5),
+    }
+)
+LINE = Node(
+    name='main_line',
+    fields={'id': Field('Int'), 'order_id': Field('Int'), 'product': Field('String')},
+    queries={'main_line_id': Query(unique=True, return_type='main_line', params={'id': KEY})},
+    table='line',
+    relations={'orders_by_order_id': Relation(
+        unique=True, target='main_orders', columns={'order_id': 'id'})}
+)
+NODES = {node.name: node for node in (CUSTOMER, ORDERS, LINE)}
+
+
+TABLES = '''
+    CREATE TABLE customer (id INT PRIMARY KEY, name TEXT);
+    CREATE TABLE orders (id INT PRIMARY KEY, customer_id INT, total INT);
+    CREATE TABLE line (id INT PRIMARY KEY, order_id INT, product TEXT);
+    INSERT INTO customer VALUES (1, 'ada'), (2, 'bob');
+    INSERT INTO orders VALUES (10, 1, 5), (11, 1, 7), (12, 2, 3), (13, NULL, 1);
+    INSERT INTO line VALUES (100, 10, 'a'), (101, 10, 'b'), (102, 11, 'c'), (103, 12, 'd');
+'''
+
+
+NESTED = """{
+    a: main_customer_id(id: 1) { name orders_list_by_customer_id {
+        total line_list_by_order_id { product orders_by_order_id { id } } } }
+    b: main_customer_id(id: 2) { name orders_list_by_customer_id {
+        total line_list_by_order_id { product orders_by_order_id { id } } } }
+}"""
+NESTED_DATA = {
+    'a': {'name': 'ada', 'orders_list_by_customer_id': [
+        {'total': 5, 'line_list_by_order_id': [
+            {'product': 'a', 'orders_by_order_id': {'id': 10}},
+            {'product': 'b', 'orders_by_order_id': {'id': 10}}]},
+        {'total': 7, 'line_list_by_order_id': [
+            {'product': 'c', 'orders_by_order_id': {'id': 11}}]}]},
+    'b': {'name': 'bob', 'orders_list_by_customer_id': [
+        {'total': 3, 'line_list_by_order_id': [
+            {'product': 'd', 'orders_by_order_id': {'id': 12}}]}]},
+}
+
+
+def test_nested_relations_run_one_statement_per_level():
+    connections = SqliteConnections(TABLES)
+    schema = build_schema(NODES, connections)
+    result = graphql_sync(schema, NESTED, context_value={})
+    assert result.errors is None
+    assert result.data == NESTED_DATA
+    assert [sql for sql, _ in connections.executed] == [
+        'SELECT "id", "name" FROM "customer" WHERE "id" IN (?, ?)',
+        'SELECT "id", "customer_id", "total" FROM "orders" WHERE "customer_id" IN (?, ?)',
+        'SELECT "order_id", "product" FROM "line" WHERE "order_id" IN (?, ?, ?, ?)',
+        'SELECT "id" FROM "orders" WHERE "id" IN (?, ?, ?, ?)',
+    ]
+
+
+def test_null_foreign_key_has_no_related_row():
+    connections = SqliteConnections(TABLES)
+    schema = build_schema(NODES, connections)
+    result = graphql_sync(schema, """{
+        main_orders_id(id: 13) { customer_by_customer_id { name } line_list_by_order_id { id } }
+    }""", context_value={})
+    assert result.errors is None
+    assert result.data == {'main_orders_id': {
+        'customer_by_customer_id': None, 'line_list_by_order_id': []}}
+    # the keys of the relations are selected, a null key is not looked up
+    assert connections.executed == [
+        ('SELECT "id", "customer_id" FROM "orders" WHERE "id" = ?', [13]),
+        ('SELECT "id", "order_id" FROM "line" WHERE "order_id" = ?', [13])]
+
+
+def test_async_relations_are_batched_per_level():
+    connections = SqliteConnections(TABLES)
+    schema = build_schema(NODES, connections, run_async=True)
+    result = asyncio.run(graphql(schema, NESTED, context_value={}))
+    assert result.errors is None
+    assert result.data == NESTED_DATA
+    assert len(connections.executed) == 4
+
+
+def test_relation_cost_multiplies():
+    schema = build_schema(NODES, SqliteConnections(TABLES))
+    errors = validate(schema, parse(NESTED), [cost_rule(100)])
+    # per customer: 1 + 10 orders + 10 x 5 lines + 50 orders
+    assert [error.message for error in errors] == [
+        'operation anonymous costs 222 rows, more than the maximum of 100']
@@ -0,0 +1,141 @@
+import asyncio
+from contextlib import contextmanager
+
+import pyodbc
+import pytest
+
+from transpicere.resolver.executor import AsyncExecutor
+from transpicere.resolver.pool import PoolTimeout
+from transpicere.resolver.replicas import ReplicaRouter, primary_reads
+
+
+class FakeSource:
+    def __init__(self, name, fail=None):
+        self.name = name
+        self.fail = fail
+
+    @contextmanager
+    def borrow(self):
+        if self.fail is not None:
+            raise self.fail
+        yield self.name
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def make_router(weights=(('a', 1), ('b', 1)), **kwargs):
+    return ReplicaRouter(FakeSource('primary'), {
+        name: (FakeSource(name), weight) for name, weight in weights}, **kwargs)
+
+
+def borrowed(router, count):
+    names = []
+    for _ in range(count):
+        with router.borrow() as cnxn:
+            names.append(cnxn)
+    return names
+
+
+def test_weighted_round_robin():
+    router = make_router((('a', 2), ('b', 1)))
+    assert borrowed(router, 6) == ['a', 'b', 'a', 'a', 'b', 'a']
+    stats = router.stats()
+    assert (stats['a'].borrowed, stats['b'].borrowed, stats['primary'].borrowed) == (4, 2, 0)
+
+
+def test_least_outstanding():
+    router = make_router((('a', 2), ('b', 1)), balancing='least_outstanding')
+    with router.borrow() as first, router.borrow() as second, router.borrow() as third:
+        # a is picked while it has fewer outstanding connections per weight
+        assert (first, second, third) == ('a', 'a', 'b')
+        assert router.stats()['a'].outstanding == 2
+    assert router.stats()['a'].outstanding == 0
+    with pytest.raises(ValueError):
+        make_router(balancing='random')
+
+
+def test_primary_reads():
+    router = make_router()
+    with primary_reads():
+        assert borrowed(router, 2) == ['primary', 'primary']
+    assert borrowed(router, 1) == ['a']
+
+
+def test_primary_reads_follow_async_resolvers():
+    router = make_router()
+
+    async def read():
+        def borrow():
+            with router.borrow() as cnxn:
+                return cnxn
+        return await asyncio.get_running_loop().run_in_executor(None, borrow)
+
+    executor = AsyncExecutor(max_workers=1)
+    try:
+        with primary_reads():
+            assert executor.run(read()) == 'primary'
+        assert executor.run(read()) == 'a'
+    finally:
+        executor.close()
+
+
+def test_failing_replica_is_ejected_then_retried():
+    clock = Clock()
+    router = make_router(max_failures=2, retry_after=10.0, clock=clock)
+    for _ in range(2):
+        with pytest.raises(pyodbc.OperationalError):
+            with router.borrow() as cnxn:
+                assert cnxn == 'a'
+                raise pyodbc.OperationalError('connection lost')
+        assert borrowed(router, 1) == ['b']
+    assert not router.stats()['a'].healthy
+    assert borrowed(router, 2) == ['b', 'b']
+    clock.now = 10.0
+    assert sorted(borrowed(router, 2)) == ['a', 'b']
+    stats = router.stats()['a']
+    assert (stats.healthy, stats.errors, stats.ejections) == (True, 2, 1)
+
+
+def test_statement_errors_do_not_eject():
+    router = make_router(max_failures=1)
+    for error in (pyodbc.ProgrammingError('no such column'), pyodbc.DatabaseError('division by zero')):
+        with pytest.raises(type(error)):
+            with router.borrow():
+                raise error
+    router._replicas[0].source.fail = pyodbc.ProgrammingError('login failed')
+    assert borrowed(router, 2) == ['b', 'b']
+    stats = router.stats()['a']
+    assert (stats.healthy, stats.errors, stats.ejections) == (True, 0, 0)
+
+
+def test_unavailable_replicas_are_skipped():
+    router = make_router(max_failures=1)
+    router._replicas[0].source.fail = pyodbc.OperationalError('refused')
+    router._replicas[1].source.fail = PoolTimeout('busy')
+    assert borrowed(router, 1) == ['primary']
+    stats = router.stats()
+    # a busy replica is not ejected
+    assert (stats['a'].healthy, stats['b'].healthy) == (False, True)
+    assert (stats['a'].outstanding, stats['b'].outstanding) == (0, 0)
+    router.primary.fail = PoolTimeout('busy')
+    with pytest.raises(PoolTimeout):
+        borrowed(router, 1)
+
+
+def test_latency_counters():
+    clock = Clock()
+    router = make_router(clock=clock)
+    with router.borrow():
+        clock.now += 0.5
+    with router.borrow():
+        clock.now += 0.25
+    with router.borrow():
+        clock.now += 1.0
+    stats = router.stats()
+    assert (stats['a'].latency, stats['a'].max_latency, stats['b'].latency) == (1.5, 1.0, 0.25)
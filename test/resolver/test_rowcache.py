@@ -0,0 +1,94 @@
+from types import SimpleNamespace as Row
+
+from transpicere.generator.db import Field, Node, Query
+from transpicere.resolver.loader import BatchQuery, QueryLoader
+from transpicere.resolver.rowcache import RowCache, row_size
+from test_sql import NODE
+from test_loader import RowsByKey
+from test_schema import FakeConnections
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_rows_are_shared_across_loaders():
+    connections = RowsByKey()
+    cache = RowCache()
+    batch = BatchQuery(NODE, NODE.queries['db_sample_int_value'])
+    QueryLoader(connections, batch, cache).load_many([(1,), (2,)])
+    rows = QueryLoader(connections, batch, cache).load_many(
+        [(1,), (3,)], ('int_value', 'bigint_value'))
+    assert [row.bigint_value for row in rows] == [10, 30]
+    assert [params for _, params in connections.cnxn.executed] == [[1, 2], [3]]
+    stats = cache.stats()
+    assert (stats.hits, stats.misses, stats.entries) == (1, 3, 3)
+    assert stats.hit_rate == 0.25
+
+
+def test_narrower_cached_rows_are_fetched_again():
+    cache = RowCache()
+    cache.put('sample', ('int_value',), (1,), ('int_value',), Row(int_value=1), cache.generation('sample'))
+    assert cache.get('sample', ('int_value',), (1,), ('int_value',)) is not None
+    assert cache.get('sample', ('int_value',), (1,), ('int_value', 'bigint_value')) is None
+
+
+def test_node_ttl():
+    clock = Clock()
+    cache = RowCache(default_ttl=10, ttls={'other': 0}, clock=clock)
+    row = Row(int_value=1)
+    cache.put('sample', ('int_value',), (1,), ('int_value',), row, cache.generation('sample'))
+    cache.put('other', ('int_value',), (1,), ('int_value',), row, cache.generation('other'))
+    assert cache.get('other', ('int_value',), (1,), ('int_value',)) is None
+    clock.now = 9
+    assert cache.get('sample', ('int_value',), (1,), ('int_value',)) is row
+    clock.now = 10
+    assert cache.get('sample', ('int_value',), (1,), ('int_value',)) is None
+    assert cache.stats().entries == 0
+
+
+def test_eviction_is_bounded_by_bytes():
+    row = Row(int_value=1)
+    size = row_size(row, ('int_value',))
+    cache = RowCache(max_bytes=2 * size)
+    for key in range(3):
+        cache.put('sample', ('int_value',), (key,), ('int_value',), row, cache.generation('sample'))
+    assert cache.get('sample', ('int_value',), (0,), ('int_value',)) is None
+    stats = cache.stats()
+    assert (stats.entries, stats.bytes) == (2, 2 * size)
+    assert (stats.evictions, stats.evicted_bytes) == (1, size)
+
+
+def test_invalidate_drops_rows_and_pending_stores():
+    cache = RowCache()
+    row = Row(int_value=1)
+    cache.put('sample', ('int_value',), (1,), ('int_value',), row, cache.generation('sample'))
+    cache.put('other', ('int_value',), (1,), ('int_value',), row, cache.generation('other'))
+    generation = cache.generation('sample')
+    cache.invalidate('sample')
+    cache.put('sample', ('int_value',), (2,), ('int_value',), row, generation)
+    assert cache.get('sample', ('int_value',), (1,), ('int_value',)) is None
+    assert cache.get('sample', ('int_value',), (2,), ('int_value',)) is None
+    assert cache.get('other', ('int_value',), (1,), ('int_value',)) is row
+    cache.invalidate()
+    assert cache.stats().entries == 0
+
+
+def test_unique_queries_of_a_node_do_not_share_rows():
+    key = Field('Int', is_nullable=False)
+    node = Node(name='db_item', fields={'id': Field('Int'), 'category': Field('Int')}, queries={
+        'db_item_id': Query(unique=True, return_type='db_item', params={'id': key}),
+        'db_item_category': Query(unique=True, return_type='db_item', params={'category': key}),
+    }, table='item')
+    cache = RowCache()
+    by_id = QueryLoader(FakeConnections([Row(id=1, category=2)]),
+                        BatchQuery(node, node.queries['db_item_id']), cache)
+    assert by_id.load_many([(1,)])[0].category == 2
+    by_category = QueryLoader(FakeConnections([Row(id=2, category=1)]),
+                              BatchQuery(node, node.queries['db_item_category']), cache)
+    assert by_category.load_many([(1,)])[0].id == 2
+    assert cache.stats().entries == 2
@@ -0,0 +1,111 @@
+from contextlib import contextmanager
+from datetime import time
+from types import SimpleNamespace as Row
+from graphql import graphql_sync
+from transpicere.resolver.schema import build_schema
+from test_sql import NODE
+
+
+class FakeCursor:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def fetchone(self):
+        return self.rows[0] if self.rows else None
+
+    def fetchall(self):
+        return self.rows
+
+    def fetchmany(self, size):
+        rows, self.rows = self.rows[:size], self.rows[size:]
+        return rows
+
+
+class FakeConnection:
+    def __init__(self, rows):
+        self.rows = rows
+        self.executed = []
+
+    def execute(self, sql, params=()):
+        self.executed.append((sql, list(params)))
+        return FakeCursor(self.rows)
+
+
+class FakeConnections:
+    def __init__(self, rows):
+        self.cnxn = FakeConnection(rows)
+
+    @contextmanager
+    def borrow(self):
+        yield self.cnxn
+
+
+def test_unique_query():
+    connections = FakeConnections(
+        [Row(int_value=1, bigint_value=2, time_value=None)])
+    schema = build_schema({NODE.name: NODE}, connections)
+    result = graphql_sync(
+        schema, '{ db_sample_int_value(int_value: 1) { int_value bigint_value } }')
+    assert result.errors is None
+    assert result.data == {'db_sample_int_value': {
+        'int_value': 1, 'bigint_value': 2}}
+    assert connections.cnxn.executed == [
+        ('SELECT "int_value", "bigint_value" FROM "public"."sample" WHERE "int_value" = ?', [1])]
+
+
+def test_non_unique_query_binds_index_order():
+    connections = FakeConnections([
+        Row(int_value=1, bigint_value=2, time_value=time(10)),
+        Row(int_value=3, bigint_value=2, time_value=time(10))
+    ])
+    schema = build_schema({NODE.name: NODE}, connections)
+    result = graphql_sync(schema, """{
+        db_sample_index_name(bigint_value: 2, time_value: "10:00") {
+            edges { node { int_value } }
+            pageInfo { hasNextPage }
+        }
+    }""")
+    assert result.errors is None
+    assert result.data == {'db_sample_index_name': {
+        'edges': [{'node': {'int_value': 1}}, {'node': {'int_value': 3}}],
+        'pageInfo': {'hasNextPage': False}
+    }}
+    sql, params = connections.cnxn.executed[0]
+    assert params == [time(10), 2, 101]
+
+
+def test_sibling_lookups_are_batched():
+    connections = FakeConnections([
+        Row(int_value=1, bigint_value=2, time_value=None),
+        Row(int_value=2, bigint_value=4, time_value=None)
+    ])
+    schema = build_schema({NODE.name: NODE}, connections)
+    result = graphql_sync(schema, """
+    query($other: Int!) {
+        a: db_sample_int_value(int_value: 1) { bigint_value }
+        b: db_sample_int_value(int_value: $other) { bigint_value }
+        ...more
+    }
+    fragment more on Query {
+        c: db_sample_int_value(int_value: 3) { bigint_value }
+    }
+    """, variable_values={'other': 2}, context_value={})
+    assert result.errors is None
+    assert result.data == {
+        'a': {'bigint_value': 2}, 'b': {'bigint_value': 4}, 'c': None}
+    assert connections.cnxn.executed == [
+        ('SELECT "int_value", "bigint_value" FROM "public"."sample" '
+         'WHERE "int_value" IN (?, ?, ?, ?)', [1, 2, 3, 3])]
+
+
+def test_projection_is_the_union_of_siblings():
+    connections = FakeConnections(
+        [Row(int_value=1, bigint_value=2, time_value=time(10))])
+    schema = build_schema({NODE.name: NODE}, connections)
+    result = graphql_sync(schema, """{
+        a: db_sample_int_value(int_value: 1) { __typename }
+        b: db_sample_int_value(int_value: 1) { ... on db_sample { time_value } }
+    }""", context_value={})
+    assert result.errors is None
+    assert connections.cnxn.executed == [
+        ('SELECT "int_value", "time_value" FROM "public"."sample" WHERE "int_value" = ?', [1])]
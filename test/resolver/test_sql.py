@@ -0,0 +1,97 @@
+from dataclasses import replace
+from transpicere.generator.db import Node, Field, Query
+from transpicere.resolver.sql import compile_page_query, compile_query, quote_identifier
+
+NODE = Node(
+    name='db_sample',
+    fields={
+        'int_value': Field(data_type='Int'),
+        'bigint_value': Field(data_type='Long'),
+        'time_value': Field(data_type='Time')
+    },
+    queries={
+        'db_sample_int_value': Query(unique=True, return_type='db_sample', params={
+            'int_value': Field(data_type='Int', is_nullable=False)
+        }),
+        'db_sample_index_name': Query(unique=False, return_type='db_sample', params={
+            'time_value': Field(data_type='Time', is_nullable=False),
+            'bigint_value': Field(data_type='Long', is_nullable=False)
+        })
+    },
+    table='sample',
+    schema='public'
+)
+
+
+def test_quote_identifier():
+    assert quote_identifier('sample') == '"sample"'
+    assert quote_identifier('a"b') == '"a""b"'
+
+
+def test_compile_unique_query():
+    compiled = compile_query(NODE, NODE.queries['db_sample_int_value'])
+    assert compiled.sql == ('SELECT "int_value", "bigint_value", "time_value" '
+                            'FROM "public"."sample" WHERE "int_value" = ?')
+    assert compiled.params == ('int_value',)
+    assert compiled.unique
+
+
+def test_compile_keeps_index_column_order():
+    compiled = compile_query(NODE, NODE.queries['db_sample_index_name'])
+    assert compiled.sql.endswith('WHERE "time_value" = ? AND "bigint_value" = ?')
+    assert compiled.params == ('time_value', 'bigint_value')
+    assert not compiled.unique
+
+
+def test_compile_batch_query():
+    compiled = compile_query(NODE, NODE.queries['db_sample_int_value'], 3)
+    assert compiled.sql.endswith('WHERE "int_value" IN (?, ?, ?)')
+    compiled = compile_query(NODE, NODE.queries['db_sample_index_name'], 2)
+    assert compiled.sql.endswith(
+        'WHERE ("time_value", "bigint_value") IN ((?, ?), (?, ?))')
+
+
+def test_compile_page_query():
+    query = NODE.queries['db_sample_index_name']
+    order = ('time_value', 'bigint_value', 'int_value')
+    first = compile_page_query(NODE, query, order, ('int_value',), after=False)
+    assert first.sql == ('SELECT "int_value" FROM "public"."sample" '
+                         'WHERE "time_value" = ? AND "bigint_value" = ? '
+                         'ORDER BY "time_value", "bigint_value", "int_value" LIMIT ?')
+    after = compile_page_query(NODE, query, order, ('int_value',), after=True)
+    assert ('AND ("time_value", "bigint_value", "int_value") > (?, ?, ?) ORDER BY'
+            in after.sql)
+
+
+def test_compile_range_page_query():
+    query = Query(unique=False, return_type='db_sample', params={
+        'time_value': Field(data_type='Time', is_nullable=False)
+    }, ranges={'bigint_value': Field(data_type='Long', is_nullable=False)})
+    order = ('time_value', 'bigint_value', 'int_value')
+    compiled = compile_page_query(NODE, query, order, ('int_value',), after=True, ranges=(
+        ('bigint_value', 'gte'), ('bigint_value', 'between')))
+    assert compiled.sql == ('SELECT "int_value" FROM "public"."sample" '
+                            'WHERE "time_value" = ? AND "bigint_value" >= ? '
+                            'AND "bigint_value" BETWEEN ? AND ? '
+                            'AND ("time_value", "bigint_value", "int_value") > (?, ?, ?) '
+                            'ORDER BY "time_value", "bigint_value", "int_value" LIMIT ?')
+    unfiltered = compile_page_query(NODE, replace(query, params={}), order[1:], ('int_value',),
+                                    after=False)
+    assert unfiltered.sql == ('SELECT "int_value" FROM "public"."sample" '
+                              'ORDER BY "bigint_value", "int_value" LIMIT ?')
+
+
+def test_compile_page_query_with_nulls():
+    query = replace(NODE.queries['db_sample_index_name'], params={}, ranges={
+        'time_value': Field(data_type='Time', is_nullable=False)})
+    order = ('time_value', 'bigint_value', 'int_value')
+    compiled = compile_page_query(NODE, query, order, ('int_value',), after=True,
+                                  not_null=('time_value',), nullable=('bigint_value', 'int_value'),
+                                  nulls=('bigint_value',))
+    assert compiled.sql == (
+        'SELECT "int_value" FROM "public"."sample" '
+        'WHERE "time_value" IS NOT NULL AND ("time_value") >= (?) AND (("time_value") > (?) '
+        'OR ("bigint_value" IS NOT NULL) OR ("bigint_value" IS NULL AND "int_value" > ?)) '
+        'ORDER BY "time_value", CASE WHEN "bigint_value" IS NULL THEN 0 ELSE 1 END, "bigint_value", '
+        'CASE WHEN "int_value" IS NULL THEN 0 ELSE 1 END, "int_value" LIMIT ?')
+    assert compiled.cursor_values == (0, 0, 2)
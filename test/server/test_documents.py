@@ -0,0 +1,70 @@
+import unittest
+
+from graphql import GraphQLError, GraphQLField, GraphQLObjectType, GraphQLSchema, GraphQLString
+
+from transpicere.resolver.metrics import Metrics
+from transpicere.server.documents import PERSISTED_QUERY_NOT_FOUND, DocumentCache, sha256
+
+
+def make_schema() -> GraphQLSchema:
+    return GraphQLSchema(GraphQLObjectType('Query', {'hello': GraphQLField(GraphQLString)}))
+
+
+class TestDocumentCache(unittest.TestCase):
+    def test_document_cache_hit(self):
+        cache = DocumentCache()
+        schema = make_schema()
+        document, errors = cache.get(schema, '{ hello }')
+        self.assertEqual(errors, [])
+        cached, errors = cache.get(schema, '{ hello }')
+        self.assertIs(cached, document)
+        stats = cache.stats()
+        self.assertEqual((stats.hits, stats.misses, stats.size), (1, 1, 1))
+
+    def test_document_cache_validation_errors(self):
+        cache = DocumentCache()
+        schema = make_schema()
+        _, errors = cache.get(schema, '{ missing }')
+        self.assertEqual(len(errors), 1)
+        _, cached = cache.get(schema, '{ missing }')
+        self.assertIs(cached, errors)
+        document, errors = cache.get(schema, '{ hello')
+        self.assertIsNone(document)
+        self.assertEqual(len(errors), 1)
+
+    def test_document_cache_schema_version(self):
+        cache = DocumentCache()
+        document, _ = cache.get(make_schema(), '{ hello }')
+        refreshed, _ = cache.get(make_schema(), '{ hello }')
+        self.assertIsNot(refreshed, document)
+        self.assertEqual(cache.stats().hits, 0)
+
+    def test_document_cache_eviction(self):
+        cache = DocumentCache(max_size=2)
+        schema = make_schema()
+        for query in ('{ hello }', '{ a: hello }', '{ b: hello }'):
+            cache.get(schema, query)
+        stats = cache.stats()
+        self.assertEqual((stats.size, stats.evictions), (2, 1))
+
+    def test_persisted_query(self):
+        cache = DocumentCache()
+        query = '{ hello }'
+        extensions = {'persistedQuery': {'version': 1, 'sha256Hash': sha256(query)}}
+        with self.assertRaises(GraphQLError) as e:
+            cache.persisted_query(None, extensions)
+        self.assertEqual(e.exception.message, PERSISTED_QUERY_NOT_FOUND)
+        self.assertEqual(cache.persisted_query(query, extensions), (query, sha256(query)))
+        self.assertEqual(cache.persisted_query(None, extensions), (query, sha256(query)))
+        self.assertEqual(cache.persisted_query(query, None), (query, None))
+        with self.assertRaises(GraphQLError):
+            cache.persisted_query('{ a: hello }', extensions)
+
+    def test_document_cache_instrumentation(self):
+        metrics = Metrics()
+        cache = DocumentCache(instrumentation=metrics)
+        schema = make_schema()
+        cache.get(schema, '{ hello }')
+        cache.get(schema, '{ hello }')
+        self.assertEqual(metrics.histogram('parse').count, 1)
+        self.assertEqual(metrics.histogram('validate').count, 1)
@@ -0,0 +1,58 @@
+import json
+import unittest
+
+from graphql import GraphQLError
+
+from transpicere.generator.db import Field, Node, Query
+from transpicere.resolver.schema import build_schema
+from transpicere.server.export import export_field, export_lines
+from conftest import SqliteConnections
+
+NODE = Node(
+    name='db_sale',
+    fields={'id': Field('Int', is_nullable=False), 'category': Field('Long'), 'amount': Field('Decimal')},
+    queries={
+        'db_sale_id': Query(unique=True, return_type='db_sale', params={'id': Field('Int', is_nullable=False)}),
+        'db_sale_category': Query(unique=False, return_type='db_sale', params={
+            'category': Field('Long', is_nullable=False)
+        }, ranges={'id': Field('Int', is_nullable=False)}),
+    },
+    table='sale'
+)
+
+
+SALE = 'CREATE TABLE sale (id INTEGER, category INTEGER, amount TEXT)'
+
+
+class TestExport(unittest.TestCase):
+    def setUp(self):
+        self.connections = SqliteConnections(SALE, sale=[(id, id % 2, f'{id}.50') for id in range(1, 10)])
+        self.schema = build_schema({NODE.name: NODE}, self.connections, max_page_size=2)
+
+    def test_export_every_page(self):
+        lines = export_lines(self.schema, 'db_sale_category', {'category': 1, 'id_gt': 1})
+        # the first page is read before the first line
+        self.assertEqual(self.connections.borrowed, 1)
+        self.assertEqual([json.loads(line) for line in lines], [
+            {'id': id, 'category': 1, 'amount': f'{id}.50'} for id in (3, 5, 7, 9)])
+        self.assertEqual(self.connections.borrowed, 2)
+
+    def test_export_columns(self):
+        lines = export_lines(self.schema, 'db_sale_category', {'category': 0}, ['amount'])
+        self.assertEqual(''.join(lines), '{"amount":"2.50"}\n{"amount":"4.50"}\n'
+                                         '{"amount":"6.50"}\n{"amount":"8.50"}\n')
+
+    def test_export_errors(self):
+        self.assertIsNone(export_field(self.schema, 'db_sale_id'))
+        with self.assertRaises(GraphQLError):
+            export_lines(self.schema, 'db_sale_id', {'id': 1})
+        with self.assertRaises(GraphQLError):
+            export_lines(self.schema, 'db_sale_category', {})
+        with self.assertRaises(GraphQLError):
+            export_lines(self.schema, 'db_sale_category', {'category': 1, 'first': 1})
+        with self.assertRaises(GraphQLError):
+            export_lines(self.schema, 'db_sale_category', {'category': 'one'})
+        with self.assertRaises(GraphQLError):
+            export_lines(self.schema, 'db_sale_category', {'category': 1}, ['missing'])
+        with self.assertRaises(GraphQLError):
+            export_lines(self.schema, 'db_sale_category', {'category': 1, 'id_between': [1]})
@@ -0,0 +1,112 @@
+import hashlib
+import logging
+import os
+import pickle
+import tempfile
+from typing import Any, Dict, Optional
+
+from transpicere.generator.db import DbConfig, DbGenerator, Node, connect
+from transpicere.generator.dialects import get_dialect
+
+LOGGER = logging.Logger(__name__)
+CACHE_VERSION = 7
+
+
+class IntrospectionCache:
+    """on-disk cache of the introspected `Node` model
+
+    entries are keyed by the connection string and the requested tables, and
+    are only used while the catalog fingerprint they were stored with still
+    matches the database.
+
+    with `config.dialect`, the fingerprint is the cheap schema change marker
+    of the dialect, see `Dialect.fingerprint_sql`. without, it hashes the
+    whole columns catalog, which a warm start still reads, and index-only
+    changes are not part of it. pass a `fingerprint_sql` returning a DDL
+    change counter or a hash of the catalog to use instead, or call
+    `invalidate`.
+    entries are pickles, which run code when loaded: the directory must only
+    be writable by trusted users.
+    """
+
+    def __init__(self, directory: str, generator: Optional[DbGenerator] = None,
+                 fingerprint_sql: Optional[str] = None):
+        self.directory = directory
+        self.generator = generator or DbGenerator()
+        self.fingerprint_sql = fingerprint_sql
+
+    def get_nodes(self, config: DbConfig) -> Dict[str, Node]:
+        fingerprint = self.fingerprint(config)
+        nodes = self.load(config, fingerprint)
+        if nodes is None:
+            nodes = self.generator.get_nodes(config)
+            self.store(config, fingerprint, nodes)
+        return nodes
+
+    def fingerprint(self, config: DbConfig) -> str:
+        digest = hashlib.sha256()
+        with connect(config) as cnxn:
+            cursor = cnxn.cursor()
+            if self.fingerprint_sql is not None:
+                rows = cursor.execute(self.fingerprint_sql).fetchall()
+            elif config.dialect is not None:
+                rows = get_dialect(config.dialect).fingerprint(cursor, config.schema)
+            else:
+                rows = cursor.columns(schema=config.schema).fetchall()
+            for row in rows:
+                digest.update(repr(tuple(row)).encode())
+        return digest.hexdigest()
+
+    def load(self, config: DbConfig, fingerprint: str) -> Optional[Dict[str, Node]]:
+        try:
+            with open(self.path(config), 'rb') as cache_file:
+                entry = pickle.load(cache_file)
+        except FileNotFoundError:
+            return None
+        except (pickle.UnpicklingError, EOFError, AttributeError, ImportError) as e:
+            LOGGER.warning(f"ignoring corrupted cache {self.path(config)}: {e}")
+            return None
+        if entry.get('version') != CACHE_VERSION or entry.get('fingerprint') != fingerprint:
+            return None
+        nodes: Dict[str, Node] = entry['nodes']
+        return nodes
+
+    def store(self, config: DbConfig, fingerprint: str, nodes: Dict[str, Node]) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        entry: Dict[str, Any] = {
+            'version': CACHE_VERSION,
+            'fingerprint': fingerprint,
+            'nodes': nodes
+        }
+        # write then rename so that concurrent workers never read a partial file
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as cache_file:
+                pickle.dump(entry, cache_file,
+                            protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, self.path(config))
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    def invalidate(self, config: Optional[DbConfig] = None) -> None:
+        """drop the entry of `config`, or every entry when no config is given"""
+        if config is not None:
+            paths = [self.path(config)]
+        elif os.path.isdir(self.directory):
+            paths = [os.path.join(self.directory, name) for name in os.listdir(self.directory)
+                     if name.endswith('.pickle')]
+        else:
+            paths = []
+        for path in paths:
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+
+    def path(self, config: DbConfig) -> str:
+        key = repr((config.connection_string, config.table,
+                   sorted(config.tables), config.schema, config.dialect))
+        # the connection string may hold credentials: only its hash hits the disk
+        name = hashlib.sha256(key.encode()).hexdigest()
+        return os.path.join(self.directory, f"{name}.pickle")
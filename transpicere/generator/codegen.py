@@ -0,0 +1,140 @@
+"""write the introspected `Node` model as a python module
+
+    python -m transpicere.generator.codegen --tables a,b --output web/generated_schema.py
+reads the connection string from $TRANSPICERE_CONNECTION_STRING, so that it
+does not end up in the shell history nor in the module.
+"""
+import argparse
+import os
+import sys
+import tempfile
+from typing import Dict, List
+
+from transpicere.generator.db import DbConfig, DbGenerator, Field, Node, Query, Relation
+
+CONNECTION_STRING_VARIABLE = 'TRANSPICERE_CONNECTION_STRING'
+HEADER = '''"""generated by transpicere.generator.codegen from the catalog of {source}, do not edit"""
+from typing import Any
+
+from graphql import GraphQLSchema
+
+from transpicere.generator.db import Node, Query, Relation, intern_field as F
+from transpicere.resolver.connection import ConnectionSource
+from transpicere.resolver.schema import build_schema as _build_schema
+'''
+FOOTER = '''
+
+def build_schema(connections: ConnectionSource, **options: Any) -> GraphQLSchema:
+    """the schema of `NODES`, see `transpicere.resolver.schema.build_schema`"""
+    return _build_schema(NODES, connections, **options)
+'''
+INDENT = '    '
+
+
+def field_code(field: Field) -> str:
+    args = [repr(field.data_type)]
+    if not field.is_nullable:
+        args.append('is_nullable=False')
+    if field.is_list:
+        args.append('is_list=True')
+    return f"F({', '.join(args)})"
+
+
+def fields_code(fields: Dict[str, Field]) -> str:
+    return '{' + ', '.join(f"{name!r}: {field_code(field)}" for name, field in fields.items()) + '}'
+
+
+def query_code(query: Query) -> str:
+    args = [f"unique={query.unique!r}", f"return_type={query.return_type!r}"]
+    if query.params:
+        args.append(f"params={fields_code(query.params)}")
+    if query.cardinality is not None:
+        args.append(f"cardinality={query.cardinality!r}")
+    if query.ranges:
+        args.append(f"ranges={fields_code(query.ranges)}")
+    return f"Query({', '.join(args)})"
+
+
+def relation_code(relation: Relation) -> str:
+    args = [f"unique={relation.unique!r}", f"target={relation.target!r}",
+            f"columns={relation.columns!r}"]
+    if relation.cardinality is not None:
+        args.append(f"cardinality={relation.cardinality!r}")
+    return f"Relation({', '.join(args)})"
+
+
+def mapping_code(entries: Dict[str, str], depth: int) -> str:
+    """a dict literal with an entry per line, so that a change shows as a line of the diff"""
+    if not entries:
+        return '{}'
+    indent = INDENT * depth
+    lines = [f"{indent}{INDENT}{key!r}: {value}," for key, value in entries.items()]
+    return '{\n' + '\n'.join(lines) + f"\n{indent}}}"
+
+
+def node_code(node: Node, depth: int) -> str:
+    indent = INDENT * (depth + 1)
+    lines = [
+        f"{indent}name={node.name!r},",
+        f"{indent}table={node.table!r},",
+        f"{indent}schema={node.schema!r},",
+        f"{indent}fields={mapping_code({name: field_code(field) for name, field in node.fields.items()}, depth + 1)},",
+        f"{indent}queries={mapping_code({name: query_code(query) for name, query in node.queries.items()}, depth + 1)},",
+    ]
+    if node.relations:
+        relations = {name: relation_code(relation) for name, relation in node.relations.items()}
+        lines.append(f"{indent}relations={mapping_code(relations, depth + 1)},")
+    return 'Node(\n' + '\n'.join(lines) + f"\n{INDENT * depth})"
+
+
+def generate_module(nodes: Dict[str, Node], source: str = 'the database') -> str:
+    """source of a module holding `nodes` as `NODES`, and their `build_schema`
+
+    nodes, queries and relations are written in the order of `nodes`, one
+    column, query or relation per line, so that the module of a changed
+    catalog diffs as the changes of its tables. importing the module builds
+    the same nodes, without connecting to the database.
+    """
+    entries = {name: node_code(node, 1) for name, node in nodes.items()}
+    return f"{HEADER.format(source=source)}\nNODES = {mapping_code(entries, 0)}\n{FOOTER}"
+
+
+def write_module(nodes: Dict[str, Node], path: str, source: str = 'the database') -> None:
+    code = generate_module(nodes, source)
+    # write then rename so that workers never import a partial module
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w') as module_file:
+            module_file.write(code)
+        # mkstemp creates the file readable by its owner only: give it the
+        # mode of a new file, for workers running as an other user to import it
+        os.chmod(tmp_path, 0o644 & ~current_umask())
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def current_umask() -> int:
+    # the umask can only be read by setting it
+    umask = os.umask(0)
+    os.umask(umask)
+    return umask
+
+
+def main(argv: List[str]) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--tables', default='', help='comma separated tables, all of the schema by default')
+    parser.add_argument('--schema')
+    parser.add_argument('--dialect', help='catalog queries to introspect with, see dialects.DIALECTS')
+    parser.add_argument('--name', help='database name, in the module header')
+    parser.add_argument('--output', required=True, help='python file to write')
+    args = parser.parse_args(argv)
+    config = DbConfig(connection_string=os.environ[CONNECTION_STRING_VARIABLE],
+                      tables=[table for table in args.tables.split(',') if table],
+                      schema=args.schema, name=args.name, dialect=args.dialect)
+    write_module(DbGenerator().get_nodes(config), args.output, args.name or args.schema or 'the database')
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
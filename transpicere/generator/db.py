@@ -1,11 +1,12 @@
 # mypy: allow-untyped-defs
 import pyodbc
 import logging
-from typing import Dict, List, TypeVar, Any
+import sys
+from typing import Dict, List, Set, Tuple, TypeVar, Any, Iterable, Optional, cast
 from decimal import Decimal
 from datetime import date, time, datetime
 from uuid import UUID
-from dataclasses import dataclass, field
+from dataclasses import dataclass, field, fields, replace
 from transpicere.graphql import *
 from graphql import GraphQLInt, GraphQLFloat, GraphQLString, GraphQLBoolean, GraphQLID
 
@@ -25,39 +26,136 @@ TYPE_MAPPING = {
     'timestamp': GraphQLDatetime.name,
     'uuid': GraphQLUuid.name
 }
+# types without a meaningful order: no range query is generated on them
+UNORDERED_TYPES = {GraphQLBoolean.name, GraphQLUuid.name}
 
 
-@dataclass
+T = TypeVar('T')
+
+
+def compact(cls: T) -> T:
+    """slot a frozen dataclass, as dataclass(slots=True) does from python 3.10
+
+    instances have no __dict__ and are pickled as their constructor
+    arguments, without the attribute names, unless the class defines its
+    own __reduce__.
+    """
+    names = tuple(f.name for f in fields(cast(Any, cls)))
+    namespace = {
+        key: value for key, value in vars(cls).items()
+        if key not in names and key not in ('__dict__', '__weakref__')
+    }
+    namespace['__slots__'] = names
+    namespace.setdefault('__reduce__', lambda self: (
+        type(self), tuple(getattr(self, name) for name in names)))
+    return type(cls)(cls.__name__, cls.__bases__, namespace)  # type: ignore
+
+
+@compact
+@dataclass(frozen=True)
 class Field:
     data_type: str
     is_nullable: bool = field(default=True)
     is_list: bool = field(default=False)
 
+    def __reduce__(self):
+        return intern_field, (self.data_type, self.is_nullable, self.is_list)
 
-@dataclass
+
+_FIELDS: Dict[Tuple[str, bool, bool], Field] = dict()
+
+
+def intern_field(data_type: str, is_nullable: bool = True, is_list: bool = False) -> Field:
+    """the shared `Field` of a type: there are only a few distinct ones"""
+    key = (data_type, is_nullable, is_list)
+    shared = _FIELDS.get(key)
+    if shared is None:
+        shared = _FIELDS.setdefault(
+            key, Field(sys.intern(data_type), is_nullable, is_list))
+    return shared
+
+
+@compact
+@dataclass(frozen=True)
 class Query:
     unique: bool
     return_type: str
     params: Dict[str, Field] = field(default_factory=dict)
+    # estimated rows per lookup from the index statistics, None when unknown
+    cardinality: Optional[int] = field(default=None, compare=False)
+    # the index column following the params, filtered by range, if any
+    ranges: Dict[str, Field] = field(default_factory=dict)
 
 
-@dataclass
+@compact
+@dataclass(frozen=True)
+class Relation:
+    """rows of the `target` node whose columns equal the `columns` of a row
+
+    `columns` maps the columns of the node to the columns of the target, in
+    key order. unique relations follow a foreign key to the row it
+    references, the others list the rows referencing the node.
+    """
+    unique: bool
+    target: str
+    columns: Dict[str, str] = field(default_factory=dict)
+    # estimated rows per lookup, None when unknown
+    cardinality: Optional[int] = field(default=None, compare=False)
+
+
+@compact
+@dataclass(frozen=True)
 class Node:
     name: str
     fields: Dict[str, Field]
     queries: Dict[str, Query]
+    table: str = field(default='')
+    schema: Optional[str] = field(default=None)
+    relations: Dict[str, Relation] = field(default_factory=dict)
+
+
+@dataclass
+class ReplicaConfig:
+    connection_string: str
+    # share of the reads, relative to the other replicas
+    weight: int = field(default=1)
+    name: Optional[str] = field(default=None)
 
 
 @ dataclass
 class DbConfig:
+    # the primary: introspected, and written to
     connection_string: str
-    table: str
+    table: Optional[str] = field(default=None)
+    tables: List[str] = field(default_factory=list)
+    schema: Optional[str] = field(default=None)
+    # names the database when several are introspected together
+    name: Optional[str] = field(default=None)
+    # seconds allowed to introspect the database, bounding the login and
+    # every catalog query
+    timeout: Optional[float] = field(default=None)
+    # catalog queries of `dialects.DIALECTS` to introspect with, instead of
+    # the ODBC catalog functions
+    dialect: Optional[str] = field(default=None)
+    # read replicas of the primary, see `ReplicaRouter`
+    replicas: List[ReplicaConfig] = field(default_factory=list)
+
+
+def connect(config: DbConfig) -> pyodbc.Connection:
+    """connection to the primary, its login and statements bounded by `config.timeout`"""
+    if config.timeout is None:
+        return pyodbc.connect(config.connection_string)
+    timeout = max(1, int(config.timeout))
+    cnxn = pyodbc.connect(config.connection_string, timeout=timeout)
+    # the login timeout does not apply to the catalog queries
+    cnxn.timeout = timeout
+    return cnxn
 
 
 class DbGenerator:
 
     def get_node(self, config: DbConfig) -> Node:
-        with pyodbc.connect(config.connection_string) as cnxn:
+        with connect(config) as cnxn:
             cursor = cnxn.cursor()
             node_name = self._get_node_name(cursor, config)
             fields = self._get_fields(cursor, config)
@@ -66,9 +164,121 @@ class DbGenerator:
             return Node(
                 name=node_name,
                 fields=fields,
-                queries=queries
+                queries=queries,
+                table=config.table or '',
+                schema=config.schema
             )
 
+    def get_nodes(self, config: DbConfig) -> Dict[str, Node]:
+        """introspect several tables over a single connection
+
+        tables are taken from `config.tables` (or `config.table`), every table
+        of `config.schema` is used when none is given. without a schema, a
+        table name found in several schemas raises a ValueError.
+        the tables and columns catalogs are read once and indexed in memory,
+        so the cost grows with the catalog size, not tables x catalog size.
+        with `config.dialect`, the statistics, the column nullability and the
+        foreign keys are also read for the whole schema at once, with the
+        catalog queries of the dialect.
+        the foreign keys between the introspected tables become `Relation`s
+        in both directions, see `_build_relations`.
+        """
+        with connect(config) as cnxn:
+            cursor = cnxn.cursor()
+            if config.dialect is not None:
+                # imported here: dialects import the model of this module
+                from transpicere.generator.dialects import get_dialect
+                dialect = get_dialect(config.dialect)
+                node_names, columns, statistics = dialect.catalog(
+                    cursor, config.schema, self._wanted_tables(config))
+                foreign_keys = dialect.foreign_keys(cursor, config.schema, node_names)
+                return self._build_nodes(cursor, config, node_names, columns,
+                                         statistics, dialect.type_mapping, foreign_keys)
+            node_names = self._get_node_names(cursor, config)
+            columns = self._get_columns(cursor, config, node_names)
+            foreign_keys = self._get_foreign_keys(cursor, config, node_names)
+            return self._build_nodes(cursor, config, node_names, columns,
+                                     foreign_keys=foreign_keys)
+
+    def _build_nodes(self, cursor: pyodbc.Cursor, config: DbConfig, node_names: Dict[str, str],
+                     columns: Dict[str, List[Any]], statistics: Optional[Dict[str, List[Any]]] = None,
+                     type_mapping: Optional[Dict[str, str]] = None,
+                     foreign_keys: Optional[Dict[str, List[Any]]] = None) -> Dict[str, Node]:
+        nodes: Dict[str, Node] = dict()
+        built: Dict[str, str] = dict()
+        for table, node_name in node_names.items():
+            try:
+                if statistics is None:
+                    fields = _build_fields(table, columns.get(table, []))
+                else:
+                    fields = _build_fields(table, columns.get(table, []),
+                                           type_mapping, nullability=True)
+            except ValueError as e:
+                # a table of unmapped types does not fail the others
+                LOGGER.warning("table %s skipped: %s", table, e)
+                continue
+            if statistics is None:
+                indices = cursor.statistics(table=table, schema=config.schema)
+            else:
+                indices = statistics.get(table, [])
+            built[table] = node_name
+            nodes[node_name] = Node(
+                name=node_name,
+                fields=fields,
+                queries=_build_queries(node_name, fields, indices),
+                table=table,
+                schema=config.schema
+            )
+        if foreign_keys:
+            nodes = _build_relations(nodes, built, foreign_keys)
+        return nodes
+
+    def _wanted_tables(self, config: DbConfig) -> List[str]:
+        wanted = list(config.tables)
+        if config.table is not None and config.table not in wanted:
+            wanted.append(config.table)
+        return wanted
+
+    def _get_node_names(self, cursor: pyodbc.Cursor, config: DbConfig) -> Dict[str, str]:
+        """node names by table name: a table found in several schemas needs `config.schema`"""
+        wanted = set(self._wanted_tables(config))
+        table_type = None if wanted else 'TABLE'
+        node_names: Dict[str, str] = dict()
+        schemas: Dict[str, Any] = dict()
+        for table in cursor.tables(schema=config.schema, tableType=table_type):
+            if not wanted or table.table_name in wanted:
+                _check_schema(schemas, table)
+                node_names.setdefault(
+                    table.table_name, f"{table.table_cat}_{table.table_name}")
+        missing = wanted.difference(node_names)
+        if missing:
+            raise ValueError(f"tables {sorted(missing)} not found")
+        return node_names
+
+    def _get_columns(self, cursor: pyodbc.Cursor, config: DbConfig, tables: Iterable[str]) -> Dict[str, List[Any]]:
+        wanted = set(tables)
+        columns: Dict[str, List[Any]] = dict()
+        schemas: Dict[str, Any] = dict()
+        for row in cursor.columns(schema=config.schema):
+            if row.table_name in wanted:
+                _check_schema(schemas, row)
+                columns.setdefault(row.table_name, []).append(row)
+        return columns
+
+    def _get_foreign_keys(self, cursor: pyodbc.Cursor, config: DbConfig, tables: Iterable[str]) -> Dict[str, List[Any]]:
+        # SQLForeignKeys needs a table: one call per table
+        foreign_keys: Dict[str, List[Any]] = dict()
+        try:
+            for table in tables:
+                rows = cursor.foreignKeys(
+                    foreignTable=table, foreignSchema=config.schema).fetchall()
+                if rows:
+                    foreign_keys[table] = rows
+        except pyodbc.Error as e:
+            LOGGER.warning("could not read the foreign keys: %s", e)
+            return dict()
+        return foreign_keys
+
     def _get_node_name(self, cursor: pyodbc.Cursor, config: DbConfig) -> str:
         for table in cursor.tables():
             if table.table_name == config.table:
@@ -76,26 +286,187 @@ class DbGenerator:
         raise ValueError(f"table {table} not found")
 
     def _get_fields(self, cursor: pyodbc.Cursor, config: DbConfig) -> Dict[str, Field]:
-        rows = cursor.columns(table=config.table)
-        fields = {
-            row.column_name: Field(TYPE_MAPPING[row.type_name]) for row in rows
-        }
-        if len(fields) == 0:
-            raise ValueError(f"table {config.table} has no column")
-        return fields
+        return _build_fields(config.table, cursor.columns(table=config.table))
 
     def _get_queries(self, cursor: pyodbc.Cursor, config: DbConfig, node_name: str, fields: Dict[str, Field]) -> Dict[str, Query]:
         indices = cursor.statistics(table=config.table)
-        queries: dict[str, Query] = dict()
-        for row in indices:
-            query = queries.setdefault(
-                row.index_name, Query(return_type=node_name, unique=not row.non_unique))
-            query.params[row.column_name] = Field(
-                fields[row.column_name].data_type, is_nullable=False)
-
-        def query_name(index_name: str, query: Query) -> str:
-            index = index_name
-            if len(query.params) == 1:
-                index = next(iter(query.params))
-            return f"{node_name}_{index}"
-        return {query_name(k, v): v for k, v in queries.items()}
+        return _build_queries(node_name, fields, indices)
+
+
+def _check_schema(schemas: Dict[str, Any], row: Any) -> None:
+    """raise for a catalog row of a table already seen in an other schema
+
+    tables are keyed by name: those of the same name in several schemas
+    would be merged into a single node.
+    """
+    schema = schemas.setdefault(row.table_name, row.table_schem)
+    if schema != row.table_schem:
+        raise ValueError(f"table {row.table_name} is in schemas {schema} and {row.table_schem}, "
+                         f"configure the schema to introspect")
+
+
+def _build_fields(table: Optional[str], rows: Iterable[Any], type_mapping: Optional[Dict[str, str]] = None,
+                  nullability: bool = False) -> Dict[str, Field]:
+    """the fields of the columns whose type is mapped, the others are skipped
+
+    without `nullability` every field is nullable, whatever the catalog says.
+    """
+    type_mapping = TYPE_MAPPING if type_mapping is None else type_mapping
+    fields: Dict[str, Field] = dict()
+    for row in rows:
+        data_type = type_mapping.get(row.type_name)
+        if data_type is None:
+            LOGGER.warning("column %s of %s skipped: type %s is not mapped",
+                           row.column_name, table, row.type_name)
+            continue
+        fields[sys.intern(row.column_name)] = intern_field(
+            data_type, is_nullable=not nullability or bool(row.nullable))
+    if len(fields) == 0:
+        raise ValueError(f"table {table} has no column of a mapped type")
+    return fields
+
+
+def _build_queries(node_name: str, fields: Dict[str, Field], indices: Iterable[Any]) -> Dict[str, Query]:
+    """the queries an index serves, from the rows of SQLStatistics
+
+    every index gives an equality query on all its columns, in ordinal
+    position order, named after the index (after the column for single
+    column indexes). each leftmost prefix of the index, the empty one
+    included, also gives a non unique query: equality on the prefix and
+    range on the next column, named `{index}_by_{prefix}`, or `{index}_range`
+    for the empty prefix. the next column of an `UNORDERED_TYPES` gets no
+    range: the prefix is looked up by equality only, if not empty.
+    indexes with an expression part, a row without column, give no query:
+    their columns alone are not their key.
+    """
+    columns: Dict[str, List[Tuple[int, str]]] = dict()
+    unique: Dict[str, bool] = dict()
+    table_rows: Optional[int] = None
+    distinct: Dict[str, int] = dict()
+    expressions: Set[str] = set()
+    for row in indices:
+        if row.index_name is None:
+            # SQL_TABLE_STAT row, not an index: its cardinality is the table rows
+            table_rows = row.cardinality
+            continue
+        if row.column_name is None:
+            expressions.add(row.index_name)
+            continue
+        index_columns = columns.setdefault(row.index_name, [])
+        position = getattr(row, 'ordinal_position', None)
+        index_columns.append((len(index_columns) if position is None else position,
+                              sys.intern(row.column_name)))
+        unique.setdefault(row.index_name, not row.non_unique)
+        if row.cardinality:
+            distinct[row.index_name] = row.cardinality
+
+    def key_fields(names: Iterable[str]) -> Dict[str, Field]:
+        return {name: intern_field(fields[name].data_type, is_nullable=False) for name in names}
+
+    queries: Dict[str, Query] = dict()
+    range_queries: Dict[str, Query] = dict()
+    ranges: Set[Tuple[Tuple[str, ...], Optional[str]]] = set()
+    for index_name, index_columns in columns.items():
+        if index_name in expressions:
+            continue
+        ordered = tuple(column for _, column in sorted(index_columns))
+        if not all(column in fields for column in ordered):
+            # a skipped column cannot be a param
+            continue
+        index = ordered[0] if len(ordered) == 1 else index_name
+        queries[f"{node_name}_{index}"] = Query(
+            unique=unique[index_name],
+            return_type=node_name,
+            params=key_fields(ordered),
+            cardinality=_cardinality(
+                unique[index_name], table_rows, distinct.get(index_name))
+        )
+        for length, column in enumerate(ordered):
+            prefix = ordered[:length]
+            range_column = None if fields[column].data_type in UNORDERED_TYPES else column
+            if (prefix, range_column) in ranges or not (prefix or range_column):
+                continue
+            ranges.add((prefix, range_column))
+            suffix = f"by_{'_'.join(prefix)}" if prefix else 'range'
+            range_queries[f"{node_name}_{index}_{suffix}"] = Query(
+                unique=False,
+                return_type=node_name,
+                params=key_fields(prefix),
+                cardinality=_cardinality(False, table_rows, None),
+                ranges=key_fields(() if range_column is None else (range_column,))
+            )
+    for name, query in range_queries.items():
+        queries.setdefault(name, query)
+    return queries
+
+
+def _cardinality(unique: bool, table_rows: Optional[int], distinct: Optional[int]) -> Optional[int]:
+    """rows per lookup: table rows over the distinct values of the index"""
+    if unique:
+        return 1
+    if table_rows is None:
+        return None
+    if distinct is None:
+        return table_rows
+    return max(1, -(-table_rows // distinct))
+
+
+def _build_relations(nodes: Dict[str, Node], node_names: Dict[str, str],
+                     foreign_keys: Dict[str, List[Any]]) -> Dict[str, Node]:
+    """`nodes` with a relation for each direction of the foreign keys between them
+
+    `foreign_keys` holds the rows of SQLForeignKeys (fktable_name, fk_name,
+    fkcolumn_name, pktable_name, pkcolumn_name, key_seq) by referencing
+    table. the referencing node gets a `{pktable}_by_{columns}` relation to
+    the referenced row, the referenced node a `{fktable}_list_by_{columns}`
+    relation to the referencing rows. a relation named like a column or an
+    other relation of its node is skipped.
+    """
+    relations: Dict[str, Dict[str, Relation]] = {name: dict() for name in nodes}
+
+    def add(node_name: str, name: str, relation: Relation) -> None:
+        if name in nodes[node_name].fields or name in relations[node_name]:
+            LOGGER.warning("relation %s of %s skipped: the name is taken",
+                           name, node_name)
+            return
+        relations[node_name][sys.intern(name)] = relation
+
+    for table, rows in foreign_keys.items():
+        source = node_names.get(table)
+        if source is None:
+            continue
+        keys: Dict[Tuple[str, str], List[Any]] = dict()
+        for row in rows:
+            keys.setdefault((row.pktable_name, row.fk_name or ''), []).append(row)
+        for (pktable, _), key_rows in keys.items():
+            target = node_names.get(pktable)
+            if target is None:
+                continue
+            key_rows.sort(key=lambda row: row.key_seq)
+            columns = {sys.intern(row.fkcolumn_name): sys.intern(row.pkcolumn_name)
+                       for row in key_rows}
+            if not set(columns).issubset(nodes[source].fields) or \
+                    not set(columns.values()).issubset(nodes[target].fields):
+                # the key has a skipped column
+                continue
+            suffix = '_'.join(columns)
+            add(source, f"{pktable}_by_{suffix}",
+                Relation(unique=True, target=target, columns=columns))
+            add(target, f"{table}_list_by_{suffix}", Relation(
+                unique=False,
+                target=source,
+                columns={pk: fk for fk, pk in columns.items()},
+                cardinality=_index_cardinality(nodes[source], columns)))
+    return {
+        name: replace(node, relations=relations[name]) if relations[name] else node
+        for name, node in nodes.items()
+    }
+
+
+def _index_cardinality(node: Node, columns: Iterable[str]) -> Optional[int]:
+    """rows per lookup of the index of `node` on exactly `columns`, if any"""
+    wanted = set(columns)
+    for query in node.queries.values():
+        if not query.ranges and set(query.params) == wanted:
+            return query.cardinality
+    return None
@@ -0,0 +1,309 @@
+from dataclasses import dataclass
+from types import SimpleNamespace
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from graphql import GraphQLBoolean, GraphQLFloat, GraphQLInt, GraphQLString
+
+from transpicere.graphql import *
+
+# rows of the tables, columns and statistics of each table, by table name
+Catalog = Tuple[Dict[str, str], Dict[str, List[Any]], Dict[str, List[Any]]]
+
+
+@dataclass(frozen=True)
+class Dialect:
+    """set based catalog queries of a database
+
+    each query reads the whole schema at once: `tables_sql` returns
+    table_name, table_cat and cardinality (the estimated rows),
+    `columns_sql` table_name, column_name, type_name and nullable in column
+    order, `statistics_sql` table_name, index_name, non_unique, column_name,
+    cardinality and ordinal_position in index column order,
+    `foreign_keys_sql` fktable_name, fk_name, fkcolumn_name, pktable_name,
+    pkcolumn_name and key_seq, i.e. the columns of the ODBC catalog
+    functions. the expression parts of an index have a null column_name,
+    which drops the index, see `_build_queries`. `fingerprint_sql` returns
+    a cheap marker of the schema changing, see `IntrospectionCache`. every
+    `?` is bound to the
+    configured schema, which may be None for the default one.
+    type names are lower cased and stripped of their size before being
+    looked up in `type_mapping`.
+    """
+    name: str
+    type_mapping: Dict[str, str]
+    tables_sql: str
+    columns_sql: str
+    statistics_sql: str
+    foreign_keys_sql: str
+    fingerprint_sql: str
+
+    def type_name(self, type_name: str) -> str:
+        return type_name.split('(')[0].strip().lower()
+
+    def catalog(self, cursor: Any, schema: Optional[str], tables: List[str]) -> Catalog:
+        """node names, columns and statistics of `tables`, of every table when empty"""
+        wanted = set(tables)
+        node_names: Dict[str, str] = dict()
+        statistics: Dict[str, List[Any]] = dict()
+        for row in self._execute(cursor, self.tables_sql, schema):
+            if wanted and row.table_name not in wanted:
+                continue
+            node_names[row.table_name] = f"{row.table_cat}_{row.table_name}"
+            cardinality = None if row.cardinality is None or row.cardinality < 0 else int(
+                row.cardinality)
+            # as the SQL_TABLE_STAT row of SQLStatistics
+            statistics[row.table_name] = [SimpleNamespace(
+                index_name=None, cardinality=cardinality)]
+        missing = wanted.difference(node_names)
+        if missing:
+            raise ValueError(f"tables {sorted(missing)} not found")
+        columns: Dict[str, List[Any]] = dict()
+        for row in self._execute(cursor, self.columns_sql, schema):
+            if row.table_name in node_names:
+                columns.setdefault(row.table_name, []).append(SimpleNamespace(
+                    column_name=row.column_name,
+                    type_name=self.type_name(row.type_name),
+                    nullable=bool(row.nullable)))
+        for row in self._execute(cursor, self.statistics_sql, schema):
+            if row.table_name in node_names:
+                statistics[row.table_name].append(row)
+        return node_names, columns, statistics
+
+    def foreign_keys(self, cursor: Any, schema: Optional[str], tables: Iterable[str]) -> Dict[str, List[Any]]:
+        """foreign key columns of `tables` referencing `tables`, by referencing table"""
+        wanted = set(tables)
+        foreign_keys: Dict[str, List[Any]] = dict()
+        for row in self._execute(cursor, self.foreign_keys_sql, schema):
+            if row.fktable_name in wanted and row.pktable_name in wanted:
+                foreign_keys.setdefault(row.fktable_name, []).append(row)
+        return foreign_keys
+
+    def fingerprint(self, cursor: Any, schema: Optional[str]) -> List[Any]:
+        """rows changing with the tables, columns, indexes or foreign keys of the schema"""
+        return self._execute(cursor, self.fingerprint_sql, schema)
+
+    def _execute(self, cursor: Any, sql: str, schema: Optional[str]) -> List[Any]:
+        rows: List[Any] = cursor.execute(
+            sql, *[schema] * sql.count('?')).fetchall()
+        return rows
+
+
+POSTGRESQL = Dialect(
+    name='postgresql',
+    type_mapping={
+        'bool': GraphQLBoolean.name,
+        'int2': GraphQLInt.name,
+        'int4': GraphQLInt.name,
+        'int8': GraphQLLong.name,
+        'text': GraphQLString.name,
+        'varchar': GraphQLString.name,
+        'bpchar': GraphQLString.name,
+        '_varchar': GraphQLString.name,
+        'float4': GraphQLFloat.name,
+        'float8': GraphQLFloat.name,
+        'numeric': GraphQLDecimal.name,
+        'date': GraphQLDate.name,
+        'time': GraphQLTime.name,
+        'timestamp': GraphQLDatetime.name,
+        'timestamptz': GraphQLDatetime.name,
+        'uuid': GraphQLUuid.name
+    },
+    tables_sql="""
+        SELECT c.relname AS table_name, current_database() AS table_cat,
+               c.reltuples AS cardinality
+        FROM pg_catalog.pg_class c
+        JOIN pg_catalog.pg_namespace n ON n.oid = c.relnamespace
+        WHERE c.relkind IN ('r', 'p') AND n.nspname = COALESCE(?, current_schema())
+        ORDER BY c.relname""",
+    columns_sql="""
+        SELECT c.relname AS table_name, a.attname AS column_name,
+               t.typname AS type_name, NOT a.attnotnull AS nullable
+        FROM pg_catalog.pg_attribute a
+        JOIN pg_catalog.pg_class c ON c.oid = a.attrelid
+        JOIN pg_catalog.pg_namespace n ON n.oid = c.relnamespace
+        JOIN pg_catalog.pg_type t ON t.oid = a.atttypid
+        WHERE c.relkind IN ('r', 'p') AND a.attnum > 0 AND NOT a.attisdropped
+          AND n.nspname = COALESCE(?, current_schema())
+        ORDER BY c.relname, a.attnum""",
+    # partial and expression indexes cannot be looked up by equality
+    statistics_sql="""
+        SELECT c.relname AS table_name, i.relname AS index_name,
+               NOT x.indisunique AS non_unique, a.attname AS column_name,
+               NULL AS cardinality, k.position AS ordinal_position
+        FROM pg_catalog.pg_index x
+        JOIN pg_catalog.pg_class c ON c.oid = x.indrelid
+        JOIN pg_catalog.pg_class i ON i.oid = x.indexrelid
+        JOIN pg_catalog.pg_namespace n ON n.oid = c.relnamespace
+        CROSS JOIN LATERAL unnest(x.indkey::int2[]) WITH ORDINALITY AS k(attnum, position)
+        JOIN pg_catalog.pg_attribute a ON a.attrelid = c.oid AND a.attnum = k.attnum
+        WHERE x.indpred IS NULL AND 0 <> ALL (x.indkey::int2[])
+          AND n.nspname = COALESCE(?, current_schema())
+        ORDER BY c.relname, i.relname, k.position""",
+    foreign_keys_sql="""
+        SELECT c.relname AS fktable_name, k.conname AS fk_name, a.attname AS fkcolumn_name,
+               r.relname AS pktable_name, p.attname AS pkcolumn_name, u.position AS key_seq
+        FROM pg_catalog.pg_constraint k
+        JOIN pg_catalog.pg_class c ON c.oid = k.conrelid
+        JOIN pg_catalog.pg_class r ON r.oid = k.confrelid
+        JOIN pg_catalog.pg_namespace n ON n.oid = c.relnamespace
+        CROSS JOIN LATERAL unnest(k.conkey, k.confkey) WITH ORDINALITY AS u(fkattnum, pkattnum, position)
+        JOIN pg_catalog.pg_attribute a ON a.attrelid = c.oid AND a.attnum = u.fkattnum
+        JOIN pg_catalog.pg_attribute p ON p.attrelid = r.oid AND p.attnum = u.pkattnum
+        WHERE k.contype = 'f' AND r.relnamespace = c.relnamespace
+          AND n.nspname = COALESCE(?, current_schema())
+        ORDER BY c.relname, k.conname, u.position""",
+    # a DDL statement writes new versions, i.e. xmin, of the catalog rows it changes
+    fingerprint_sql="""
+        SELECT md5(string_agg(c.oid::text || ':' || c.xmin::text || ':' || COALESCE((
+                   SELECT string_agg(a.attnum::text || '.' || a.xmin::text, ',' ORDER BY a.attnum)
+                   FROM pg_catalog.pg_attribute a WHERE a.attrelid = c.oid), '') || ':' || COALESCE((
+                   SELECT string_agg(k.oid::text || '.' || k.xmin::text, ',' ORDER BY k.oid)
+                   FROM pg_catalog.pg_constraint k WHERE k.conrelid = c.oid), ''),
+               ';' ORDER BY c.oid)) AS fingerprint
+        FROM pg_catalog.pg_class c
+        JOIN pg_catalog.pg_namespace n ON n.oid = c.relnamespace
+        WHERE c.relkind IN ('r', 'p', 'i') AND n.nspname = COALESCE(?, current_schema())""",
+)
+
+SQLITE = Dialect(
+    name='sqlite',
+    type_mapping={
+        'boolean': GraphQLBoolean.name,
+        'bool': GraphQLBoolean.name,
+        'smallint': GraphQLInt.name,
+        'int2': GraphQLInt.name,
+        'int4': GraphQLInt.name,
+        # sqlite integers are 64 bits
+        'int': GraphQLLong.name,
+        'integer': GraphQLLong.name,
+        'bigint': GraphQLLong.name,
+        'int8': GraphQLLong.name,
+        'text': GraphQLString.name,
+        'varchar': GraphQLString.name,
+        'char': GraphQLString.name,
+        'clob': GraphQLString.name,
+        'real': GraphQLFloat.name,
+        'float': GraphQLFloat.name,
+        'double': GraphQLFloat.name,
+        'float4': GraphQLFloat.name,
+        'float8': GraphQLFloat.name,
+        'numeric': GraphQLDecimal.name,
+        'decimal': GraphQLDecimal.name,
+        'date': GraphQLDate.name,
+        'time': GraphQLTime.name,
+        'datetime': GraphQLDatetime.name,
+        'timestamp': GraphQLDatetime.name,
+        'uuid': GraphQLUuid.name
+    },
+    # sqlite has a single schema: the configured one is ignored
+    tables_sql="""
+        SELECT name AS table_name, 'main' AS table_cat, NULL AS cardinality
+        FROM sqlite_master
+        WHERE type = 'table' AND name NOT LIKE 'sqlite_%'
+        ORDER BY name""",
+    columns_sql="""
+        SELECT m.name AS table_name, p.name AS column_name,
+               p.type AS type_name, NOT p."notnull" AS nullable
+        FROM sqlite_master m JOIN pragma_table_info(m.name) p
+        WHERE m.type = 'table'
+        ORDER BY m.name, p.cid""",
+    # an INTEGER PRIMARY KEY is the rowid, it has no index: primary keys are
+    # read from the columns, their automatic indexes skipped
+    statistics_sql="""
+        SELECT m.name AS table_name, 'primary_key' AS index_name, 0 AS non_unique,
+               p.name AS column_name, NULL AS cardinality, p.pk AS ordinal_position
+        FROM sqlite_master m JOIN pragma_table_info(m.name) p
+        WHERE m.type = 'table' AND p.pk > 0
+        UNION ALL
+        SELECT m.name, l.name, NOT l."unique", i.name, NULL, i.seqno + 1
+        FROM sqlite_master m JOIN pragma_index_list(m.name) l
+        JOIN pragma_index_info(l.name) i
+        WHERE m.type = 'table' AND l.origin <> 'pk' AND NOT l.partial
+        ORDER BY table_name, index_name, ordinal_position""",
+    # a foreign key without referenced columns references the primary key
+    foreign_keys_sql="""
+        SELECT m.name AS fktable_name, 'fk_' || f.id AS fk_name, f."from" AS fkcolumn_name,
+               f."table" AS pktable_name,
+               COALESCE(f."to", (SELECT t.name FROM pragma_table_info(f."table") t
+                                 WHERE t.pk = f.seq + 1)) AS pkcolumn_name,
+               f.seq + 1 AS key_seq
+        FROM sqlite_master m JOIN pragma_foreign_key_list(m.name) f
+        WHERE m.type = 'table'
+        ORDER BY fktable_name, f.id, f.seq""",
+    # incremented by every schema change
+    fingerprint_sql="""
+        SELECT schema_version AS fingerprint FROM pragma_schema_version""",
+)
+
+# not in DIALECTS: the statements quote identifiers with double quotes,
+# which MySQL only reads as identifiers in the ANSI_QUOTES sql mode
+MYSQL = Dialect(
+    name='mysql',
+    type_mapping={
+        'bool': GraphQLBoolean.name,
+        'boolean': GraphQLBoolean.name,
+        'tinyint': GraphQLInt.name,
+        'smallint': GraphQLInt.name,
+        'mediumint': GraphQLInt.name,
+        'int': GraphQLInt.name,
+        'bigint': GraphQLLong.name,
+        'char': GraphQLString.name,
+        'varchar': GraphQLString.name,
+        'tinytext': GraphQLString.name,
+        'text': GraphQLString.name,
+        'mediumtext': GraphQLString.name,
+        'longtext': GraphQLString.name,
+        'float': GraphQLFloat.name,
+        'double': GraphQLFloat.name,
+        'decimal': GraphQLDecimal.name,
+        'date': GraphQLDate.name,
+        'time': GraphQLTime.name,
+        'datetime': GraphQLDatetime.name,
+        'timestamp': GraphQLDatetime.name
+    },
+    tables_sql="""
+        SELECT table_name AS table_name, table_schema AS table_cat,
+               table_rows AS cardinality
+        FROM information_schema.tables
+        WHERE table_schema = COALESCE(?, DATABASE()) AND table_type = 'BASE TABLE'
+        ORDER BY table_name""",
+    columns_sql="""
+        SELECT table_name AS table_name, column_name AS column_name,
+               data_type AS type_name, is_nullable = 'YES' AS nullable
+        FROM information_schema.columns
+        WHERE table_schema = COALESCE(?, DATABASE())
+        ORDER BY table_name, ordinal_position""",
+    statistics_sql="""
+        SELECT table_name AS table_name, index_name AS index_name,
+               non_unique AS non_unique, column_name AS column_name,
+               cardinality AS cardinality, seq_in_index AS ordinal_position
+        FROM information_schema.statistics
+        WHERE table_schema = COALESCE(?, DATABASE())
+        ORDER BY table_name, index_name, seq_in_index""",
+    foreign_keys_sql="""
+        SELECT table_name AS fktable_name, constraint_name AS fk_name,
+               column_name AS fkcolumn_name, referenced_table_name AS pktable_name,
+               referenced_column_name AS pkcolumn_name, ordinal_position AS key_seq
+        FROM information_schema.key_column_usage
+        WHERE table_schema = COALESCE(?, DATABASE())
+          AND referenced_table_schema = table_schema
+        ORDER BY table_name, constraint_name, ordinal_position""",
+    # ALTER TABLE recreates the table, or at least updates its create time
+    fingerprint_sql="""
+        SELECT table_name AS table_name, create_time AS fingerprint
+        FROM information_schema.tables
+        WHERE table_schema = COALESCE(?, DATABASE())
+        ORDER BY table_name""",
+)
+
+DIALECTS: Dict[str, Dialect] = {
+    dialect.name: dialect for dialect in (POSTGRESQL, SQLITE)
+}
+
+
+def get_dialect(name: str) -> Dialect:
+    dialect = DIALECTS.get(name)
+    if dialect is None:
+        raise ValueError(
+            f"unknown dialect {name}, expected one of {sorted(DIALECTS)}")
+    return dialect
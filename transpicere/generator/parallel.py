@@ -0,0 +1,123 @@
+import logging
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, wait
+from dataclasses import dataclass, field, replace
+from typing import Dict, Optional, Sequence
+
+from transpicere.generator.db import DbConfig, DbGenerator, Node
+
+LOGGER = logging.Logger(__name__)
+DEFAULT_TIMEOUT = 30.0
+
+
+@dataclass
+class Introspection:
+    nodes: Dict[str, Node] = field(default_factory=dict)
+    # config of the database of each node, by node name: the connection its
+    # queries are to be routed to
+    sources: Dict[str, DbConfig] = field(default_factory=dict)
+    # failure of each database that could not be introspected, by label
+    errors: Dict[str, BaseException] = field(default_factory=dict)
+
+
+def label(config: DbConfig, index: int) -> str:
+    """name of a database in node names and errors: never its connection string"""
+    return config.name or f"db{index}"
+
+
+def introspect(configs: Sequence[DbConfig], generator: Optional[DbGenerator] = None,
+               timeout: float = DEFAULT_TIMEOUT) -> Introspection:
+    """introspect several databases concurrently and merge their nodes
+
+    every database is introspected with `generator.get_nodes`, on its own
+    connection and daemon thread, all started at once. a database failing
+    or taking longer than its timeout (`config.timeout`, `timeout` by
+    default) is reported in `errors` and the nodes of the others are
+    returned. a timed out introspection cannot be interrupted: it keeps its
+    thread until the driver gives up, which the login and query timeouts
+    set from `config.timeout` bound, but delays no other database.
+
+    nodes are merged in the order of `configs`, whatever the order their
+    introspection completes in: a node named like the node of a previous
+    database is renamed with the label of its database as prefix, and the
+    relations of its database follow it. `sources` tells the database of
+    every node.
+    """
+    generator = generator or DbGenerator()
+    results: Dict[int, Dict[str, Node]] = dict()
+    errors: Dict[int, BaseException] = dict()
+
+    def run(future: 'Future[Dict[str, Node]]', config: DbConfig) -> None:
+        try:
+            future.set_result(generator.get_nodes(config))
+        except BaseException as e:
+            future.set_exception(e)
+
+    pending: Dict['Future[Dict[str, Node]]', int] = dict()
+    deadlines: Dict[int, float] = dict()
+    for index, config in enumerate(configs):
+        future: 'Future[Dict[str, Node]]' = Future()
+        pending[future] = index
+        deadlines[index] = time.monotonic() + (config.timeout or timeout)
+        threading.Thread(target=run, args=(future, config), daemon=True,
+                         name=f"transpicere-introspect-{index}").start()
+    while pending:
+        wait_for = max(0.0, min(deadlines[index] for index in pending.values()) - time.monotonic())
+        done, _ = wait(pending, timeout=wait_for, return_when=FIRST_COMPLETED)
+        for future in done:
+            index = pending.pop(future)
+            try:
+                results[index] = future.result()
+            except Exception as e:
+                errors[index] = e
+        now = time.monotonic()
+        for future in [future for future, index in pending.items() if now >= deadlines[index]]:
+            index = pending.pop(future)
+            errors[index] = TimeoutError(
+                f"introspection of {label(configs[index], index)} timed out")
+
+    introspection = Introspection()
+    for index, config in enumerate(configs):
+        if index in errors:
+            LOGGER.warning("could not introspect %s: %s",
+                           label(config, index), errors[index])
+            introspection.errors[label(config, index)] = errors[index]
+            continue
+        names: Dict[str, str] = dict()
+        for node in results[index].values():
+            name = node.name
+            if name in introspection.nodes:
+                name = f"{label(config, index)}_{node.name}"
+                if name in introspection.nodes:
+                    raise ValueError(f"node {name} is defined twice")
+            names[node.name] = name
+            introspection.nodes[name] = node
+        for node in results[index].values():
+            if names[node.name] != node.name:
+                node = rename_node(node, names[node.name])
+            introspection.nodes[node.name] = retarget_relations(node, names)
+            introspection.sources[node.name] = config
+    return introspection
+
+
+def rename_node(node: Node, name: str) -> Node:
+    """`node` named `name`, with its queries, named after the node, renamed too"""
+    def query_name(key: str) -> str:
+        if key.startswith(node.name):
+            return name + key[len(node.name):]
+        return f"{name}_{key}"
+    return replace(node, name=name, queries={
+        query_name(key): replace(query, return_type=name) for key, query in node.queries.items()
+    })
+
+
+def retarget_relations(node: Node, names: Dict[str, str]) -> Node:
+    """`node` with its relations pointing to the nodes renamed in `names`"""
+    if all(names.get(relation.target, relation.target) == relation.target
+           for relation in node.relations.values()):
+        return node
+    return replace(node, relations={
+        name: replace(relation, target=names.get(relation.target, relation.target))
+        for name, relation in node.relations.items()
+    })
@@ -0,0 +1,189 @@
+import hashlib
+import logging
+import threading
+from dataclasses import replace
+from typing import Any, Callable, Dict, Generic, List, Optional, Set, TypeVar
+
+import pyodbc
+
+from transpicere.generator.cache import IntrospectionCache
+from transpicere.generator.db import DbConfig, DbGenerator, Node, _build_relations, connect
+from transpicere.generator.dialects import get_dialect
+
+LOGGER = logging.Logger(__name__)
+SchemaT = TypeVar('SchemaT')
+
+
+class SchemaRefresher(Generic[SchemaT]):
+    """keep a schema built from `Node`s in sync with the database catalog
+
+    every `interval` seconds the tables and columns catalogs are read once
+    and hashed per table; only the tables whose hash changed get their
+    statistics read and their `Node` rebuilt. index changes are only
+    detected with `check_indexes`, which reads the statistics of every table.
+    the catalog is read with the queries of `config.dialect`, if any. the
+    relations of every node are rebuilt once a node changed, those of the
+    unchanged nodes referencing or referenced by the changed ones included.
+    with a dialect, the foreign keys are read at once on every refresh and
+    hashed with the columns of their table, so that a foreign key added or
+    dropped alone is detected. without, only the foreign keys of the changed
+    tables and of the tables referencing the changed or removed ones are
+    read again, one call per table, and a foreign key added or dropped
+    without a column change goes unnoticed.
+
+    the new schema replaces the served one in a single assignment: requests
+    already running keep the schema they started with.
+    the refresher can be given as `schema` to graphql_server's `GraphQLView`
+    as it exposes the current schema as `graphql_schema`, which the view
+    reads every time it is instantiated, i.e. on every request.
+    with a `cache`, the first load reuses the nodes stored by an other
+    worker while the catalog fingerprint matches, the later ones only
+    rebuild the tables changed since.
+    """
+
+    def __init__(self, config: DbConfig, build_schema: Callable[[Dict[str, Node]], SchemaT],
+                 generator: Optional[DbGenerator] = None, interval: float = 60.0,
+                 check_indexes: bool = False, cache: Optional[IntrospectionCache] = None):
+        self.config = config
+        self.build_schema = build_schema
+        self.generator = generator or DbGenerator()
+        self.interval = interval
+        self.check_indexes = check_indexes
+        self.cache = cache
+        self.nodes: Dict[str, Node] = dict()
+        self._schema: Optional[SchemaT] = None
+        self._signatures: Dict[str, str] = dict()
+        # foreign key rows of the nodes, by referencing table; None when unknown
+        self._foreign_keys: Optional[Dict[str, List[Any]]] = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def graphql_schema(self) -> SchemaT:
+        if self._schema is None:
+            self.refresh()
+        assert self._schema is not None
+        return self._schema
+
+    def refresh(self) -> Set[str]:
+        """rebuild the changed nodes, returns the names of added, changed and removed nodes"""
+        with self._lock:
+            with connect(self.config) as cnxn:
+                cursor = cnxn.cursor()
+                dialect = None if self.config.dialect is None else get_dialect(self.config.dialect)
+                statistics: Optional[Dict[str, List[Any]]] = None
+                foreign_keys: Optional[Dict[str, List[Any]]] = None
+                if dialect is None:
+                    node_names = self.generator._get_node_names(
+                        cursor, self.config)
+                    columns = self.generator._get_columns(
+                        cursor, self.config, node_names)
+                else:
+                    node_names, columns, statistics = dialect.catalog(
+                        cursor, self.config.schema, self.generator._wanted_tables(self.config))
+                    foreign_keys = dialect.foreign_keys(cursor, self.config.schema, node_names)
+                signatures = {
+                    table: self._signature(cursor, table, columns.get(table, []),
+                                           None if statistics is None else statistics.get(table, []),
+                                           None if foreign_keys is None else foreign_keys.get(table, []))
+                    for table in node_names
+                }
+                changed = {
+                    table: node_name for table, node_name in node_names.items()
+                    if self._signatures.get(table) != signatures[table]
+                }
+                removed = {
+                    node.name for node in self.nodes.values()
+                } - set(node_names.values())
+                if not changed and not removed and self._schema is not None:
+                    return set()
+                if self._schema is None and self.cache is not None:
+                    # the signatures are read first: a table changed meanwhile
+                    # is rebuilt by the next refresh
+                    nodes = rebuilt = self.cache.get_nodes(self.config)
+                else:
+                    rebuilt = self.generator._build_nodes(
+                        cursor, self.config, changed, columns, statistics,
+                        None if dialect is None else dialect.type_mapping)
+                    # relations are rebuilt from scratch, in both directions
+                    nodes = {
+                        name: replace(node, relations={}) if node.relations else node
+                        for name, node in self.nodes.items() if name not in removed
+                    }
+                    nodes.update(rebuilt)
+                    tables = {node.table: name for name, node in nodes.items()}
+                    if foreign_keys is None:
+                        foreign_keys = self._read_foreign_keys(cursor, tables, set(changed), {
+                            node.table for node in self.nodes.values() if node.name in removed})
+                    self._foreign_keys = foreign_keys
+                    if foreign_keys:
+                        nodes = _build_relations(nodes, tables, foreign_keys)
+
+            updated = {name for name, node in nodes.items() if self.nodes.get(name) != node}
+            schema = self.build_schema(nodes)
+            self.nodes, self._signatures, self._schema = nodes, signatures, schema
+            if changed or removed:
+                LOGGER.info(
+                    f"schema refreshed: {len(rebuilt)} nodes rebuilt, {len(removed)} removed")
+            return updated | set(rebuilt) | removed
+
+    def _read_foreign_keys(self, cursor: pyodbc.Cursor, tables: Dict[str, str], changed: Set[str],
+                           removed: Set[str]) -> Dict[str, List[Any]]:
+        """foreign keys of `tables`, only those of the tables referencing or
+        being `changed` or `removed` read again once known"""
+        if self._foreign_keys is None:
+            return self.generator._get_foreign_keys(cursor, self.config, tables)
+        affected = changed | removed
+        stale = changed | {
+            table for table, rows in self._foreign_keys.items()
+            if any(row.pktable_name in affected for row in rows)
+        }
+        foreign_keys = {
+            table: rows for table, rows in self._foreign_keys.items()
+            if table in tables and table not in stale
+        }
+        foreign_keys.update(self.generator._get_foreign_keys(
+            cursor, self.config, [table for table in tables if table in stale]))
+        return foreign_keys
+
+    def _signature(self, cursor: pyodbc.Cursor, table: str, columns: List[Any],
+                   statistics: Optional[List[Any]] = None,
+                   foreign_keys: Optional[List[Any]] = None) -> str:
+        digest = hashlib.sha256()
+        for row in columns:
+            digest.update(
+                repr((row.column_name, row.type_name, row.nullable)).encode())
+        for row in foreign_keys or []:
+            digest.update(repr((row.fk_name, row.fkcolumn_name, row.pktable_name,
+                                row.pkcolumn_name)).encode())
+        if self.check_indexes:
+            if statistics is None:
+                statistics = cursor.statistics(table=table, schema=self.config.schema)
+            for row in statistics:
+                if row.index_name is not None:
+                    digest.update(
+                        repr((row.index_name, row.non_unique, row.column_name)).encode())
+        return digest.hexdigest()
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._run, name='transpicere-schema-refresher', daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            try:
+                self.refresh()
+            except Exception:
+                # keep serving the previous schema, retry on next tick
+                LOGGER.exception("schema refresh failed")
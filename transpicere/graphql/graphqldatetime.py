@@ -1,6 +1,8 @@
+import re
 from datetime import date, datetime, time
+from functools import lru_cache
 from math import modf, floor
-from typing import Any
+from typing import Any, Optional
 
 from dateutil import tz
 from dateutil.parser import parse as dateutil_parse
@@ -14,18 +16,41 @@ from graphql.pyutils import inspect
 from graphql.type import GraphQLScalarType
 
 DEFAULT_TIMEZONE = tzutc()
+# parsed strings are kept: values from cached documents and hot variables repeat
+PARSE_CACHE_SIZE = 4096
+ISO_DATE = re.compile(r"\d{4}-\d{2}-\d{2}")
 
 
 def serialize_datetime(output_value: datetime) -> str:
     return output_value.isoformat()
 
 
+@lru_cache(maxsize=PARSE_CACHE_SIZE)
+def parse_iso_datetime(input_value: str) -> Optional[datetime]:
+    if ISO_DATE.match(input_value):
+        try:
+            return datetime.fromisoformat(input_value)
+        except ValueError:
+            pass
+    return None
+
+
+def parse_datetime_str(input_value: str) -> datetime:
+    # fromisoformat is much faster than dateutil, which handles everything
+    # else. dateutil results are not cached: it fills in the missing parts of
+    # relative values, like "10:30", from the current date
+    parsed = parse_iso_datetime(input_value)
+    if parsed is None:
+        return dateutil_parse(input_value)
+    return parsed
+
+
 def parse_datetime(input_value: Any) -> datetime:
     try:
         if isinstance(input_value, float) or isinstance(input_value, int):
             return datetime.fromtimestamp(float(input_value), tz=DEFAULT_TIMEZONE)
         elif isinstance(input_value, str):
-            return dateutil_parse(input_value)
+            return parse_datetime_str(input_value)
         raise ValueError(
             f"Datetime cannot represent non datetime value: {inspect(input_value)}")
     except ValueError:
@@ -69,7 +94,9 @@ def get_date(d: datetime) -> date:
 
 def parse_date(input_value: Any) -> date:
     try:
-        d = parse_datetime(input)
+        if isinstance(input_value, str) and len(input_value) == 10 and ISO_DATE.match(input_value):
+            return date.fromisoformat(input_value)
+        d = parse_datetime(input_value)
         return get_date(d)
     except (GraphQLError, ValueError):
         raise GraphQLError(
@@ -78,6 +105,8 @@ def parse_date(input_value: Any) -> date:
 
 def parse_date_literal(value_node: ValueNode, _variables: Any = None) -> date:
     try:
+        if isinstance(value_node, StringValueNode):
+            return parse_date(value_node.value)
         d = parse_datetime_literal(value_node, _variables)
         return get_date(d)
     except (GraphQLError, ValueError):
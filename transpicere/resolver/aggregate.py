@@ -0,0 +1,122 @@
+from decimal import Decimal
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from graphql import GraphQLFloat, GraphQLInt, GraphQLResolveInfo
+
+from transpicere.generator.db import Node, Query
+from transpicere.graphql import *
+from transpicere.resolver.connection import ConnectionSource
+from transpicere.resolver.loader import MAX_STATEMENTS, selected_fields, selected_names, timed_fetchall
+from transpicere.resolver.metrics import Instrumentation
+from transpicere.resolver.pagination import Ranges
+from transpicere.resolver.sql import CompiledQuery, compile_aggregate_query
+
+# (function, column) pairs, the column of count is empty
+Aggregates = Tuple[Tuple[str, str], ...]
+
+# type of the aggregate of a column, by column type: sums are widened so
+# they do not overflow, averages of exact types stay exact
+SUM_TYPES = {
+    GraphQLInt.name: GraphQLLong.name,
+    GraphQLLong.name: GraphQLDecimal.name,
+    GraphQLFloat.name: GraphQLFloat.name,
+    GraphQLDecimal.name: GraphQLDecimal.name,
+}
+AVG_TYPES = {
+    GraphQLInt.name: GraphQLDecimal.name,
+    GraphQLLong.name: GraphQLDecimal.name,
+    GraphQLFloat.name: GraphQLFloat.name,
+    GraphQLDecimal.name: GraphQLDecimal.name,
+}
+ORDERED_TYPES = {
+    name: name for name in (
+        GraphQLInt.name, GraphQLLong.name, GraphQLFloat.name, GraphQLDecimal.name,
+        GraphQLDate.name, GraphQLTime.name, GraphQLDatetime.name)
+}
+FUNCTIONS = {'sum': SUM_TYPES, 'avg': AVG_TYPES, 'min': ORDERED_TYPES, 'max': ORDERED_TYPES}
+
+
+def to_decimal(value: Any) -> Decimal:
+    # drivers return the averages of some databases as floats
+    return value if isinstance(value, Decimal) else Decimal(str(value))
+
+
+COERCERS: Dict[str, Callable[[Any], Any]] = {
+    GraphQLLong.name: int,
+    GraphQLDecimal.name: to_decimal,
+    GraphQLFloat.name: float,
+}
+
+
+def aggregate_columns(node: Node) -> Dict[str, Dict[str, str]]:
+    """type of the aggregate of each column of `node`, by function"""
+    return {
+        function: {
+            column: types[field.data_type] for column, field in node.fields.items()
+            if not field.is_list and field.data_type in types
+        } for function, types in FUNCTIONS.items()
+    }
+
+
+class AggregateQuery:
+    """count, sum, avg, min and max of the columns of a node, in a single SELECT
+
+    the rows aggregated are those of a `Query`, with its range conditions,
+    or the whole table. only the selected aggregates are computed; results
+    are typed by `aggregate_columns` and coerced to the Python type of
+    their scalar, the database returning them untyped.
+    """
+
+    def __init__(self, node: Node, instrumentation: Optional[Instrumentation] = None, name: str = ''):
+        self.node = node
+        self.name = name
+        self.instrumentation = instrumentation
+        self.columns = aggregate_columns(node)
+        self._statements: Dict[Tuple[Optional[Tuple[str, ...]], Ranges, Aggregates], CompiledQuery] = dict()
+
+    def selection(self, info: GraphQLResolveInfo) -> Aggregates:
+        """the aggregates selected under the resolved field"""
+        selected = set()
+        for field_node in selected_fields(info, info.field_nodes):
+            function = field_node.name.value
+            if function == 'count':
+                selected.add(('count', ''))
+            elif function in self.columns:
+                for column in selected_names(info, [field_node]):
+                    if column in self.columns[function]:
+                        selected.add((function, column))
+        return tuple(sorted(selected))
+
+    def statement(self, query: Optional[Query], ranges: Ranges, aggregates: Aggregates) -> CompiledQuery:
+        key = (None if query is None else tuple(query.params), ranges, aggregates)
+        compiled = self._statements.get(key)
+        if compiled is None:
+            if len(self._statements) >= MAX_STATEMENTS:
+                self._statements.pop(next(iter(self._statements)), None)
+            compiled = self._statements.setdefault(
+                key, compile_aggregate_query(self.node, query, aggregates, ranges))
+        return compiled
+
+    def fetch(self, connections: ConnectionSource, aggregates: Aggregates, query: Optional[Query] = None,
+              values: Optional[List[Any]] = None, ranges: Ranges = ()) -> Dict[str, Any]:
+        """the aggregates, as {'count': n, function: {column: value}}, of the rows
+        matching `values`, bound to the params then the `ranges` of `query`"""
+        result: Dict[str, Any] = {function: dict() for function in FUNCTIONS}
+        if not aggregates:
+            return result
+        compiled = self.statement(query, ranges, aggregates)
+        with connections.borrow() as cnxn:
+            if self.instrumentation is None:
+                rows = cnxn.execute(compiled.sql, values or []).fetchall()
+            else:
+                rows = timed_fetchall(self.instrumentation, cnxn.execute, compiled.sql, values or [],
+                                      self.node.name, self.name)
+        row = rows[0]
+        for column_alias, (function, column) in zip(compiled.columns, aggregates):
+            value = getattr(row, column_alias)
+            if function == 'count':
+                result['count'] = int(value)
+                continue
+            coerce = COERCERS.get(self.columns[function][column])
+            result[function][column] = value if value is None or coerce is None else coerce(value)
+        return result
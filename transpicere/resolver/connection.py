@@ -0,0 +1,64 @@
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, ContextManager, Iterator, Protocol, Sequence
+
+import pyodbc
+
+# errors of the connection itself, rather than of a statement: the
+# connection is not to be used again
+CONNECTION_ERRORS = (pyodbc.OperationalError, pyodbc.InterfaceError)
+
+
+class PreparedConnection:
+    """pyodbc connection keeping one cursor per statement
+
+    pyodbc only prepares a statement again when a cursor executes a sql text
+    different from its previous one, so dedicating a cursor to each compiled
+    statement keeps it prepared for the lifetime of the connection.
+    """
+
+    def __init__(self, cnxn: pyodbc.Connection, max_statements: int = 256):
+        self.cnxn = cnxn
+        self.max_statements = max_statements
+        self._cursors: 'OrderedDict[str, pyodbc.Cursor]' = OrderedDict()
+
+    def execute(self, sql: str, params: Sequence[Any] = ()) -> pyodbc.Cursor:
+        cursor = self._cursors.get(sql)
+        if cursor is None:
+            cursor = self.cnxn.cursor()
+            self._cursors[sql] = cursor
+            if len(self._cursors) > self.max_statements:
+                _, evicted = self._cursors.popitem(last=False)
+                evicted.close()
+        else:
+            self._cursors.move_to_end(sql)
+        return cursor.execute(sql, *params)
+
+    def close(self) -> None:
+        for cursor in self._cursors.values():
+            cursor.close()
+        self._cursors.clear()
+        self.cnxn.close()
+
+
+class ConnectionSource(Protocol):
+    def borrow(self) -> ContextManager[PreparedConnection]:
+        ...
+
+
+class Connections:
+    """one lazily opened `PreparedConnection` per thread"""
+
+    def __init__(self, connection_string: str):
+        self.connection_string = connection_string
+        self._local = threading.local()
+
+    @contextmanager
+    def borrow(self) -> Iterator[PreparedConnection]:
+        cnxn = getattr(self._local, 'cnxn', None)
+        if cnxn is None:
+            cnxn = PreparedConnection(pyodbc.connect(
+                self.connection_string, autocommit=True))
+            self._local.cnxn = cnxn
+        yield cnxn
@@ -0,0 +1,143 @@
+from typing import Any, Callable, Dict, Optional, Set, Type
+
+from graphql import (FieldNode, FragmentSpreadNode, GraphQLError, GraphQLNamedType,
+                     InlineFragmentNode, OperationDefinitionNode, SelectionSetNode,
+                     ValidationContext, ValidationRule, get_named_type, is_object_type)
+from graphql.utilities import value_from_ast_untyped
+
+from transpicere.generator.db import Node, Query, Relation
+from transpicere.resolver.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+
+# key of GraphQLField.extensions: rows returned by the field, from its literal
+# arguments, variables being Undefined
+COST = 'transpicere_cost'
+# key of GraphQLField.extensions: rows of the filter of the field, read by
+# the `AGGREGATE` fields nested in it whatever the rows it returns
+FILTERED = 'transpicere_filtered'
+# key of GraphQLField.extensions: marks the fields aggregating the rows of
+# the filter of the field they are nested in
+AGGREGATE = 'transpicere_aggregate'
+# rows assumed for a non unique query without statistics
+DEFAULT_CARDINALITY = 1000
+DEFAULT_MAX_COST = 10000
+RowEstimate = Callable[[Dict[str, Any]], int]
+
+
+def query_rows(query: Query, max_page_size: int = MAX_PAGE_SIZE,
+               default_page_size: int = DEFAULT_PAGE_SIZE) -> RowEstimate:
+    """rows of a lookup: one for unique queries, a page of at most the cardinality otherwise"""
+    if query.unique:
+        return lambda _args: 1
+    cardinality = DEFAULT_CARDINALITY if query.cardinality is None else query.cardinality
+
+    def rows(args: Dict[str, Any]) -> int:
+        first = args.get('first')
+        if first is None:
+            first = default_page_size
+        elif not isinstance(first, int):
+            # a variable: the largest page it may ask for
+            first = max_page_size
+        return min(max(first, 0), max_page_size, cardinality)
+    return rows
+
+
+def filtered_rows(query: Query) -> RowEstimate:
+    """rows of the filter of a lookup, first and after aside"""
+    rows = 1
+    if not query.unique:
+        rows = DEFAULT_CARDINALITY if query.cardinality is None else query.cardinality
+    return lambda _args: rows
+
+
+def table_rows(node: Node) -> RowEstimate:
+    """rows of a table: the cardinality of its lookups without parameters"""
+    known = [query.cardinality for query in node.queries.values()
+             if not query.params and query.cardinality is not None]
+    rows = max(known) if known else DEFAULT_CARDINALITY
+    return lambda _args: rows
+
+
+def relation_rows(relation: Relation) -> RowEstimate:
+    """rows of a relation: one for unique relations, all the related rows otherwise"""
+    rows = 1
+    if not relation.unique:
+        rows = DEFAULT_CARDINALITY if relation.cardinality is None else relation.cardinality
+    return lambda _args: rows
+
+
+def operation_cost(context: ValidationContext, operation: OperationDefinitionNode) -> int:
+    """estimated rows read by `operation`
+
+    every field carrying a `COST` estimate reads its rows once per row of
+    the fields it is nested in; other fields are free and pass the row
+    count of their parent on, so lists of rows multiply the cost of their
+    nested lookups. `AGGREGATE` fields read the rows of the `FILTERED`
+    estimate of their parent field once per row of its own parent.
+    """
+    root_type = context.schema.get_root_type(operation.operation)
+    if root_type is None:
+        return 0
+    visited: Set[str] = set()
+
+    def selection_cost(parent_type: GraphQLNamedType, selection_set: SelectionSetNode,
+                       multiplier: int, aggregated: int = 0) -> int:
+        cost = 0
+        for selection in selection_set.selections:
+            if isinstance(selection, FieldNode):
+                field_def = getattr(parent_type, 'fields', {}).get(
+                    selection.name.value)
+                if field_def is None:
+                    continue
+                rows = 1
+                extensions = field_def.extensions or {}
+                if extensions.get(AGGREGATE):
+                    cost += aggregated
+                estimate: Optional[RowEstimate] = extensions.get(COST)
+                if estimate is not None:
+                    rows = estimate(literal_arguments(selection))
+                    cost += multiplier * rows
+                filtered: Optional[RowEstimate] = extensions.get(FILTERED)
+                field_type = get_named_type(field_def.type)
+                if selection.selection_set is not None and is_object_type(field_type):
+                    cost += selection_cost(
+                        field_type, selection.selection_set, multiplier * rows,
+                        0 if filtered is None else multiplier * filtered(literal_arguments(selection)))
+            elif isinstance(selection, InlineFragmentNode):
+                fragment_type = parent_type
+                if selection.type_condition is not None:
+                    fragment_type = context.schema.get_type(
+                        selection.type_condition.name.value) or parent_type
+                cost += selection_cost(fragment_type,
+                                       selection.selection_set, multiplier, aggregated)
+            elif isinstance(selection, FragmentSpreadNode):
+                name = selection.name.value
+                fragment = context.get_fragment(name)
+                if fragment is None or name in visited:
+                    continue
+                visited.add(name)
+                fragment_type = context.schema.get_type(
+                    fragment.type_condition.name.value) or parent_type
+                cost += selection_cost(fragment_type,
+                                       fragment.selection_set, multiplier, aggregated)
+                visited.discard(name)
+        return cost
+    return selection_cost(root_type, operation.selection_set, 1)
+
+
+def literal_arguments(field_node: FieldNode) -> Dict[str, Any]:
+    return {argument.name.value: value_from_ast_untyped(argument.value)
+            for argument in field_node.arguments}
+
+
+def cost_rule(max_cost: int = DEFAULT_MAX_COST) -> Type[ValidationRule]:
+    """validation rule rejecting the operations estimated to read more than `max_cost` rows"""
+
+    class CostRule(ValidationRule):
+        def enter_operation_definition(self, node: OperationDefinitionNode, *_args: Any) -> None:
+            cost = operation_cost(self.context, node)
+            if cost > max_cost:
+                name = node.name.value if node.name else 'anonymous'
+                self.report_error(GraphQLError(
+                    f"operation {name} costs {cost} rows, more than the maximum of {max_cost}", node))
+
+    return CostRule
@@ -0,0 +1,96 @@
+import asyncio
+import contextvars
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, Optional, Type, TypeVar, cast
+
+from graphql import ExecutionContext, OperationDefinitionNode
+from graphql.pyutils import is_awaitable
+
+T = TypeVar('T')
+
+
+async def _await(awaitable: Awaitable[T], context: Optional[contextvars.Context] = None) -> T:
+    if context is not None:
+        # the task runs in a copy of the context of the loop thread
+        for variable, value in context.items():
+            variable.set(value)
+    return await awaitable
+
+
+class ContextThreadPoolExecutor(ThreadPoolExecutor):
+    """thread pool running its tasks in the context they are submitted from
+
+    unlike `asyncio.to_thread`, `run_in_executor` does not carry the
+    context variables of the calling task to the thread.
+    """
+
+    def submit(self, fn: Callable[..., T], /, *args: Any, **kwargs: Any) -> 'Future[T]':
+        return super().submit(contextvars.copy_context().run, fn, *args, **kwargs)
+
+
+class AsyncExecutor:
+    """event loop thread running async GraphQL executions
+
+    the loop default executor is a thread pool of `max_workers` threads, so
+    the blocking pyodbc calls that async resolvers offload with
+    `run_in_executor(None, ...)` run at most `max_workers` at a time, each
+    borrowing its own pooled connection. `max_workers` should not exceed the
+    connection pool size.
+    executions see the context variables of the thread running them, in the
+    loop as in the thread pool.
+    """
+
+    def __init__(self, max_workers: int = 10):
+        self.threads = ContextThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix='transpicere-sql')
+        self.loop = asyncio.new_event_loop()
+        self.loop.set_default_executor(self.threads)
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def start(self) -> None:
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self.loop.run_forever, name='transpicere-loop', daemon=True)
+                self._thread.start()
+
+    def run(self, awaitable: Awaitable[T]) -> T:
+        """wait, from a thread outside of the loop, for `awaitable` run in the loop"""
+        self.start()
+        return asyncio.run_coroutine_threadsafe(
+            _await(awaitable, contextvars.copy_context()), self.loop).result()
+
+    def close(self) -> None:
+        if self._thread is not None:
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            self._thread.join()
+            self._thread = None
+        self.threads.shutdown()
+
+    def execution_context_class(self) -> Type[ExecutionContext]:
+        """execution context running async resolvers in the loop
+
+        sync callers such as graphql_sync or graphql_server's sync views
+        block until the operation is complete, while the loop keeps serving
+        the operations of other requests.
+        """
+        executor = self
+
+        class AsyncExecutionContext(ExecutionContext):
+            def __init__(self, *args: Any, **kwargs: Any):
+                super().__init__(*args, **kwargs)
+                # sync callers pass a predicate ignoring awaitables
+                self.is_awaitable = is_awaitable  # type: ignore
+
+            def execute_operation(self, operation: OperationDefinitionNode, root_value: Any) -> Any:
+                return self.wait(super().execute_operation(operation, root_value))
+
+            def wait(self, result: Any) -> Any:
+                """`result`, once run in the loop if awaitable"""
+                if self.is_awaitable(result):
+                    return executor.run(cast(Awaitable[Any], result))
+                return result
+
+        return AsyncExecutionContext
@@ -0,0 +1,265 @@
+import asyncio
+from collections import deque
+from copy import copy
+from itertools import islice
+from typing import Any, Deque, Dict, Iterable, Iterator, List, Optional, Tuple, Type
+
+from graphql import (DirectiveLocation, DocumentNode, ExecutionContext, ExecutionResult,
+                     FieldNode, FragmentSpreadNode, GraphQLArgument, GraphQLBoolean,
+                     GraphQLDirective, GraphQLError, GraphQLInt, GraphQLList, GraphQLNonNull,
+                     GraphQLObjectType, GraphQLOutputType, GraphQLResolveInfo, GraphQLSchema,
+                     GraphQLString, InlineFragmentNode, OperationDefinitionNode, SelectionNode,
+                     SelectionSetNode, located_error)
+from graphql.execution.collect_fields import collect_fields
+from graphql.execution.values import get_directive_values
+from graphql.pyutils import Path, is_iterable
+
+# items of a streamed list completed and sent together
+STREAM_BATCH_SIZE = 100
+
+GraphQLDeferDirective = GraphQLDirective(
+    name='defer',
+    locations=[DirectiveLocation.FRAGMENT_SPREAD, DirectiveLocation.INLINE_FRAGMENT],
+    args={
+        'if': GraphQLArgument(GraphQLNonNull(GraphQLBoolean), default_value=True),
+        'label': GraphQLArgument(GraphQLString),
+    },
+    description='Delivers the fragment after the rest of the response.',
+)
+GraphQLStreamDirective = GraphQLDirective(
+    name='stream',
+    locations=[DirectiveLocation.FIELD],
+    args={
+        'if': GraphQLArgument(GraphQLNonNull(GraphQLBoolean), default_value=True),
+        'label': GraphQLArgument(GraphQLString),
+        'initialCount': GraphQLArgument(GraphQLInt, default_value=0),
+    },
+    description='Delivers the items of a list after the first `initialCount`.',
+)
+INCREMENTAL_DIRECTIVES = (GraphQLDeferDirective, GraphQLStreamDirective)
+
+Fields = Dict[str, List[FieldNode]]
+# the fields of a deferred fragment, by label
+Deferred = List[Tuple[Optional[str], Fields]]
+_CLASSES: Dict[Type[ExecutionContext], Type[ExecutionContext]] = dict()
+
+
+def incremental_execution_context_class(base: Type[ExecutionContext] = ExecutionContext) -> Type[ExecutionContext]:
+    """`base` leaving the deferred fragments and streamed items out of the result
+
+    they are executed afterwards, one after the other, by
+    `subsequent_payloads`. the awaitables of async resolvers are waited
+    for by the `wait` method of `base`, see `AsyncExecutor`.
+    the class is built once per `base`.
+    """
+    execution_context_class = _CLASSES.get(base)
+    if execution_context_class is None:
+        execution_context_class = _CLASSES.setdefault(base, _incremental(base))
+    return execution_context_class
+
+
+def _incremental(base: Type[ExecutionContext]) -> Type[ExecutionContext]:
+
+    class IncrementalExecutionContext(base):  # type: ignore
+        def __init__(self, *args: Any, **kwargs: Any):
+            super().__init__(*args, **kwargs)
+            # iterators of the incremental results still to send, in order
+            self.pending: Deque[Iterator[Dict[str, Any]]] = deque()
+            self.reported_errors = 0
+            self._split_cache: Dict[Tuple[Any, ...], Tuple[Fields, Deferred]] = {}
+
+        def wait(self, result: Any) -> Any:
+            wait = getattr(super(), 'wait', None)
+            return result if wait is None else wait(result)
+
+        def execute_operation(self, operation: OperationDefinitionNode, root_value: Any) -> Any:
+            root_type = self.schema.get_root_type(operation.operation)
+            if root_type is not None:
+                eager, deferred = self.split_selections(root_type, operation.selection_set.selections)
+                if deferred:
+                    self.defer(root_type, root_value, None, deferred)
+                    operation = copy(operation)
+                    operation.selection_set = eager
+            return super().execute_operation(operation, root_value)
+
+        def split_selections(self, runtime_type: GraphQLObjectType, selections: Iterable[SelectionNode]
+                             ) -> Tuple[SelectionSetNode, Deferred]:
+            """the selections executed now, and the fields of the fragments deferred"""
+            eager: List[SelectionNode] = []
+            deferred: Deferred = []
+            for selection in selections:
+                defer = None
+                if isinstance(selection, (InlineFragmentNode, FragmentSpreadNode)):
+                    defer = get_directive_values(GraphQLDeferDirective, selection, self.variable_values)
+                if not defer or not defer['if']:
+                    eager.append(selection)
+                    continue
+                fields = collect_fields(self.schema, self.fragments, self.variable_values,
+                                        runtime_type, SelectionSetNode(selections=(selection,)))
+                if fields:
+                    deferred.append((defer.get('label'), fields))
+            return SelectionSetNode(selections=tuple(eager)), deferred
+
+        def split_subfields(self, return_type: GraphQLObjectType, field_nodes: List[FieldNode]
+                            ) -> Tuple[Fields, Deferred]:
+            key = (return_type, *map(id, field_nodes))
+            split = self._split_cache.get(key)
+            if split is None:
+                eager, deferred = self.split_selections(return_type, [
+                    selection for field_node in field_nodes if field_node.selection_set
+                    for selection in field_node.selection_set.selections])
+                fields = collect_fields(self.schema, self.fragments, self.variable_values,
+                                        return_type, eager)
+                split = self._split_cache[key] = (fields, deferred)
+            return split
+
+        def collect_subfields(self, return_type: GraphQLObjectType, field_nodes: List[FieldNode]) -> Fields:
+            return self.split_subfields(return_type, field_nodes)[0]
+
+        def complete_object_value(self, return_type: GraphQLObjectType, field_nodes: List[FieldNode],
+                                  info: GraphQLResolveInfo, path: Path, result: Any) -> Any:
+            deferred = self.split_subfields(return_type, field_nodes)[1]
+            if deferred:
+                self.defer(return_type, result, path, deferred)
+            return super().complete_object_value(return_type, field_nodes, info, path, result)
+
+        def complete_list_value(self, return_type: GraphQLList[GraphQLOutputType], field_nodes: List[FieldNode],
+                                info: GraphQLResolveInfo, path: Path, result: Any) -> Any:
+            stream = get_directive_values(GraphQLStreamDirective, field_nodes[0], self.variable_values)
+            if not stream or not stream['if'] or not is_iterable(result):
+                return super().complete_list_value(return_type, field_nodes, info, path, result)
+            initial_count = stream['initialCount']
+            if initial_count < 0:
+                raise GraphQLError(f"initialCount must be positive, got {initial_count}")
+            items = iter(result)
+            initial = list(islice(items, initial_count))
+            self.pending.append(self.streamed(
+                items, len(initial), return_type.of_type, field_nodes, info, path, stream.get('label')))
+            return super().complete_list_value(return_type, field_nodes, info, path, initial)
+
+        def defer(self, parent_type: GraphQLObjectType, source: Any, path: Optional[Path],
+                  deferred: Deferred) -> None:
+            for label, fields in deferred:
+                self.pending.append(self.deferred(parent_type, source, path, fields, label))
+
+        def deferred(self, parent_type: GraphQLObjectType, source: Any, path: Optional[Path],
+                     fields: Fields, label: Optional[str]) -> Iterator[Dict[str, Any]]:
+            try:
+                data = self.wait(self.execute_fields(parent_type, source, path, fields))
+            except GraphQLError as error:
+                yield self.incremental({'data': None}, path, label, error)
+                return
+            yield self.incremental({'data': data}, path, label)
+
+        def streamed(self, items: Iterator[Any], index: int, item_type: GraphQLOutputType,
+                     field_nodes: List[FieldNode], info: GraphQLResolveInfo, path: Path,
+                     label: Optional[str]) -> Iterator[Dict[str, Any]]:
+            while True:
+                batch = list(islice(items, STREAM_BATCH_SIZE))
+                if not batch:
+                    return
+                first = path.add_key(index, None)
+                try:
+                    completed = self.wait(self.complete_items(item_type, field_nodes, info, path, index, batch))
+                except GraphQLError as error:
+                    # a null item of a non null list ends the stream
+                    yield self.incremental({'items': None}, first, label, error)
+                    return
+                yield self.incremental({'items': completed}, first, label)
+                index += len(batch)
+
+        def complete_items(self, item_type: GraphQLOutputType, field_nodes: List[FieldNode],
+                           info: GraphQLResolveInfo, path: Path, index: int, items: List[Any]) -> Any:
+            """complete `items`, from position `index` of the list, as complete_list_value does"""
+            completed = [self.complete_item(item_type, field_nodes, info, path.add_key(position, None), item)
+                         for position, item in enumerate(items, index)]
+            awaitables = [position for position, value in enumerate(completed) if self.is_awaitable(value)]
+            if not awaitables:
+                return completed
+
+            async def gather() -> List[Any]:
+                values = await asyncio.gather(*(completed[position] for position in awaitables))
+                for position, value in zip(awaitables, values):
+                    completed[position] = value
+                return completed
+            return gather()
+
+        def complete_item(self, item_type: GraphQLOutputType, field_nodes: List[FieldNode],
+                          info: GraphQLResolveInfo, item_path: Path, item: Any) -> Any:
+            try:
+                completed = self.complete_value(item_type, field_nodes, info, item_path, item)
+            except Exception as raw_error:
+                self.handle_field_error(
+                    located_error(raw_error, field_nodes, item_path.as_list()), item_type, item_path)
+                return None
+            if not self.is_awaitable(completed):
+                return completed
+
+            async def await_completed() -> Any:
+                try:
+                    return await completed
+                except Exception as raw_error:
+                    self.handle_field_error(
+                        located_error(raw_error, field_nodes, item_path.as_list()), item_type, item_path)
+                    return None
+            return await_completed()
+
+        def incremental(self, result: Dict[str, Any], path: Optional[Path], label: Optional[str],
+                        error: Optional[GraphQLError] = None) -> Dict[str, Any]:
+            """`result` with its path, label and the errors raised since the last one"""
+            result['path'] = [] if path is None else path.as_list()
+            if label is not None:
+                result['label'] = label
+            errors = self.collected_errors.errors[self.reported_errors:]
+            self.reported_errors += len(errors)
+            if error is not None:
+                errors.append(error)
+            if errors:
+                result['errors'] = errors
+            return result
+
+        def subsequent_payloads(self) -> Iterator[Dict[str, Any]]:
+            """the incremental results, one per payload, the last one without next"""
+            held: Optional[Dict[str, Any]] = None
+            while self.pending:
+                # executing a result may append the ones it defers or streams
+                for result in self.pending[0]:
+                    if held is not None:
+                        yield {'incremental': [held], 'hasNext': True}
+                    held = result
+                self.pending.popleft()
+            yield {'hasNext': False} if held is None else {'incremental': [held], 'hasNext': False}
+
+    return IncrementalExecutionContext
+
+
+def execute_incrementally(schema: GraphQLSchema, document: DocumentNode, root_value: Any = None,
+                          context_value: Any = None, variable_values: Optional[Dict[str, Any]] = None,
+                          operation_name: Optional[str] = None, middleware: Any = None,
+                          execution_context_class: Optional[Type[ExecutionContext]] = None
+                          ) -> Tuple[ExecutionResult, Optional[Iterator[Dict[str, Any]]]]:
+    """execute `document` delivering its @defer fragments and @stream items incrementally
+
+    returns the initial result, and the iterator of the subsequent payloads,
+    as `{'incremental': [result], 'hasNext': bool}` dicts, when some of the
+    operation was deferred or streamed. each deferred result holds the
+    `data`, or streamed result the `items`, at its `path`, with the
+    `errors` raised while executing it. nothing is executed but when
+    iterating, so the rows of the results are not held together in memory.
+    """
+    context: Any = incremental_execution_context_class(execution_context_class or ExecutionContext).build(
+        schema, document, root_value, context_value, variable_values, operation_name,
+        middleware=middleware)
+    if isinstance(context, list):
+        return ExecutionResult(data=None, errors=context), None
+    errors = context.collected_errors.errors
+    try:
+        data = context.wait(context.execute_operation(context.operation, root_value))
+    except GraphQLError as error:
+        context.collected_errors.add(error, None)
+        return context.build_response(None, errors), None
+    result = context.build_response(data, errors)
+    context.reported_errors = len(errors)
+    if not context.pending:
+        return result, None
+    return result, context.subsequent_payloads()
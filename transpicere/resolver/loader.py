@@ -0,0 +1,373 @@
+import asyncio
+from collections.abc import MutableMapping
+from datetime import datetime, time
+from time import perf_counter
+from typing import (TYPE_CHECKING, Any, Callable, Dict, Hashable, Iterable, List, Optional,
+                    Sequence, Set, Tuple)
+from uuid import UUID
+
+from graphql import (FieldNode, FragmentSpreadNode, GraphQLResolveInfo,
+                     InlineFragmentNode, SelectionSetNode)
+from graphql.execution.values import get_argument_values
+
+from transpicere.generator.db import Node, Query
+from transpicere.graphql import GraphQLDatetime, GraphQLTime, GraphQLUuid
+from transpicere.resolver.connection import ConnectionSource
+from transpicere.resolver.metrics import Instrumentation
+from transpicere.resolver.sql import CompiledQuery, compile_query
+
+if TYPE_CHECKING:
+    from transpicere.resolver.rowcache import RowCache
+
+# lowest bound parameter limit among the usual drivers (sqlite < 3.32)
+MAX_PARAMS = 999
+# bound on the statements kept per query: one per batch size and projection
+MAX_STATEMENTS = 256
+LOADERS = 'transpicere_loaders'
+# key of the context mapping: the group of rows fetched together, by row id
+ROW_GROUPS = 'transpicere_rows'
+Key = Tuple[Hashable, ...]
+Columns = Tuple[str, ...]
+
+
+def naive_value(value: Any) -> Any:
+    # drivers bind the wall clock of aware values, and return naive ones
+    return value.replace(tzinfo=None) if isinstance(value, (datetime, time)) else value
+
+
+def uuid_value(value: Any) -> Any:
+    # pyodbc returns GUID columns as str by default
+    if isinstance(value, UUID):
+        return value
+    try:
+        return UUID(str(value))
+    except ValueError:
+        return value
+
+
+# the form argument and row values of a param type are compared in
+KEY_NORMALIZERS: Dict[str, Callable[[Any], Any]] = {
+    GraphQLUuid.name: uuid_value,
+    GraphQLDatetime.name: naive_value,
+    GraphQLTime.name: naive_value,
+}
+
+
+class BatchQuery:
+    """statements looking up several keys of a `Query` at once
+
+    batches are rounded up to a power of two keys, padded with their last
+    key, so that only log2(max_keys) statements are ever compiled and
+    prepared per query and projection, whatever the number of keys requested.
+    """
+
+    def __init__(self, node: Node, query: Query, max_params: int = MAX_PARAMS,
+                 instrumentation: Optional[Instrumentation] = None, name: str = ''):
+        self.node = node
+        self.query = query
+        self.name = name
+        self.instrumentation = instrumentation
+        self.params = tuple(query.params)
+        self.unique = query.unique
+        self.columns = tuple(node.fields)
+        self.relation_columns = relation_columns(node)
+        self.max_keys = max(1, max_params // len(self.params))
+        self.normalizers = tuple(
+            (index, KEY_NORMALIZERS[field.data_type]) for index, field in enumerate(query.params.values())
+            if field.data_type in KEY_NORMALIZERS)
+        self._statements: Dict[Tuple[int, Columns], CompiledQuery] = dict()
+
+    def normalize(self, key: Key) -> Key:
+        """`key` in the form its rows are matched in, see `KEY_NORMALIZERS`"""
+        if not self.normalizers:
+            return key
+        normalized = list(key)
+        for index, normalize in self.normalizers:
+            normalized[index] = normalize(key[index])
+        return tuple(normalized)
+
+    def projection(self, names: Iterable[str]) -> Columns:
+        """columns to select for the requested `names`, keys and the columns
+        of the requested relations included, in table order"""
+        wanted = requested_columns(names, self.relation_columns).union(self.params)
+        return tuple(column for column in self.columns if column in wanted)
+
+    def statement(self, count: int, columns: Columns) -> CompiledQuery:
+        compiled = self._statements.get((count, columns))
+        if compiled is None:
+            if len(self._statements) >= MAX_STATEMENTS:
+                self._statements.pop(next(iter(self._statements)), None)
+            compiled = self._statements.setdefault(
+                (count, columns), compile_query(self.node, self.query, count, columns))
+        return compiled
+
+    def chunks(self, keys: Sequence[Key], columns: Columns) -> Iterable[Tuple[CompiledQuery, List[Any]]]:
+        for start in range(0, len(keys), self.max_keys):
+            chunk = keys[start:start + self.max_keys]
+            count = min(1 << (len(chunk) - 1).bit_length(), self.max_keys)
+            padded = list(chunk) + [chunk[-1]] * (count - len(chunk))
+            yield self.statement(count, columns), [value for key in padded for value in key]
+
+
+class QueryLoader:
+    """per request cache and batcher of the lookups of one `BatchQuery`
+
+    `load_many` fetches every missing key with one statement per chunk of
+    `max_keys`. `load` is its asyncio counterpart: keys requested during the
+    same loop iteration are fetched together, on the loop default executor.
+    only the requested columns are fetched: a key already loaded is fetched
+    again when more columns are requested for it.
+    the rows of unique queries are looked up in `cache` first, if any.
+    """
+
+    def __init__(self, connections: ConnectionSource, batch: BatchQuery,
+                 cache: 'Optional[RowCache]' = None):
+        self.connections = connections
+        self.batch = batch
+        self.cache = cache if batch.unique else None
+        self._results: Dict[Key, Any] = dict()
+        self._loaded: Dict[Key, Columns] = dict()
+        self._pending: Dict[Key, 'asyncio.Future[Any]'] = dict()
+        self._pending_columns: Set[str] = set()
+        self._dispatch_task: 'Optional[asyncio.Task[None]]' = None
+
+    def covers(self, key: Key, columns: Columns) -> bool:
+        loaded = self._loaded.get(key)
+        return loaded is not None and (loaded == columns or set(columns).issubset(loaded))
+
+    def get(self, key: Key) -> Any:
+        return self._results[key]
+
+    def load_many(self, keys: Iterable[Key], columns: Optional[Columns] = None) -> List[Any]:
+        keys = list(keys)
+        columns = self.batch.columns if columns is None else columns
+        missing = list(dict.fromkeys(
+            key for key in keys if not self.covers(key, columns)))
+        if missing:
+            self._store(missing, self._union(missing, columns))
+        return [self._results[key] for key in keys]
+
+    def load(self, key: Key, columns: Optional[Columns] = None) -> 'asyncio.Future[Any]':
+        loop = asyncio.get_running_loop()
+        columns = self.batch.columns if columns is None else columns
+        if self.covers(key, columns):
+            future = loop.create_future()
+            future.set_result(self._results[key])
+            return future
+        self._pending_columns.update(columns)
+        pending = self._pending.get(key)
+        if pending is not None:
+            return pending
+        if not self._pending:
+            self._dispatch_task = loop.create_task(self._dispatch())
+        future = self._pending[key] = loop.create_future()
+        return future
+
+    async def _dispatch(self) -> None:
+        pending, self._pending = self._pending, dict()
+        columns = self._union(pending, self.batch.projection(self._pending_columns))
+        self._pending_columns = set()
+        try:
+            # pyodbc blocks: fetch on the loop default executor
+            await asyncio.get_running_loop().run_in_executor(None, self._store, list(pending), columns)
+        except Exception as e:
+            for future in pending.values():
+                future.set_exception(e)
+            return
+        for key, future in pending.items():
+            future.set_result(self._results[key])
+
+    def _union(self, keys: Iterable[Key], columns: Columns) -> Columns:
+        # keep the columns previously loaded for these keys, their rows are replaced
+        loaded = set(columns)
+        for key in keys:
+            loaded.update(self._loaded.get(key, ()))
+        return self.batch.projection(loaded)
+
+    def _store(self, keys: Sequence[Key], columns: Columns) -> None:
+        if self.cache is None:
+            self._results.update(self.fetch(keys, columns))
+        else:
+            self._results.update(self._fetch_cached(self.cache, keys, columns))
+        for key in keys:
+            self._loaded[key] = columns
+
+    def _fetch_cached(self, cache: 'RowCache', keys: Sequence[Key], columns: Columns) -> Dict[Key, Any]:
+        node, params = self.batch.node.name, self.batch.params
+        results: Dict[Key, Any] = dict()
+        missing: List[Key] = []
+        for key in keys:
+            row = cache.get(node, params, key, columns)
+            if row is None:
+                missing.append(key)
+            else:
+                results[key] = row
+        if missing:
+            generation = cache.generation(node)
+            fetched = self.fetch(missing, columns)
+            for key, row in fetched.items():
+                cache.put(node, params, key, columns, row, generation)
+            results.update(fetched)
+        return results
+
+    def fetch(self, keys: Sequence[Key], columns: Optional[Columns] = None) -> Dict[Key, Any]:
+        batch = self.batch
+        columns = batch.columns if columns is None else columns
+        results: Dict[Key, Any] = {
+            key: None if batch.unique else [] for key in keys
+        }
+        # a key may be requested in several forms, e.g. as a UUID argument and
+        # as the str value of a referencing GUID column
+        wanted: Dict[Key, List[Key]] = dict()
+        for key in results:
+            wanted.setdefault(batch.normalize(key), []).append(key)
+        instrumentation = batch.instrumentation
+        with self.connections.borrow() as cnxn:
+            for compiled, values in batch.chunks(keys, columns):
+                if instrumentation is None:
+                    rows = cnxn.execute(compiled.sql, values).fetchall()
+                else:
+                    rows = timed_fetchall(
+                        instrumentation, cnxn.execute, compiled.sql, values, batch.node.name, batch.name)
+                for row in rows:
+                    for key in wanted.get(batch.normalize(tuple(getattr(row, param) for param in batch.params)), ()):
+                        if batch.unique:
+                            results[key] = row
+                        else:
+                            results[key].append(row)
+        return results
+
+
+def relation_columns(node: Node) -> Dict[str, Columns]:
+    """columns the rows of each relation of `node` are looked up by"""
+    return {name: tuple(relation.columns) for name, relation in node.relations.items()}
+
+
+def requested_columns(names: Iterable[str], relations: Dict[str, Columns]) -> Set[str]:
+    wanted: Set[str] = set()
+    for name in names:
+        wanted.add(name)
+        wanted.update(relations.get(name, ()))
+    return wanted
+
+
+def timed_fetchall(instrumentation: Instrumentation, execute: Any, sql: str, values: Sequence[Any],
+                   node: str, query: str) -> List[Any]:
+    start = perf_counter()
+    cursor = execute(sql, values)
+    executed = perf_counter()
+    instrumentation.observe('sql', executed - start, node, query)
+    rows: List[Any] = cursor.fetchall()
+    instrumentation.observe('fetch', perf_counter() - executed, node, query)
+    return rows
+
+
+def get_loader(info: GraphQLResolveInfo, connections: ConnectionSource, batch: BatchQuery,
+               cache: 'Optional[RowCache]' = None) -> QueryLoader:
+    """loader of `batch` for the current request, kept in the context mapping"""
+    context = info.context
+    if not isinstance(context, MutableMapping):
+        return QueryLoader(connections, batch, cache)
+    loaders = context.setdefault(LOADERS, dict())
+    loader: Optional[QueryLoader] = loaders.get(id(batch))
+    if loader is None:
+        loader = loaders[id(batch)] = QueryLoader(connections, batch, cache)
+    return loader
+
+
+def remember_rows(info: GraphQLResolveInfo, rows: Iterable[Any]) -> None:
+    """record `rows` as fetched together, for their relations to be loaded together
+
+    graphql-core completes the rows of a list one after the other: the
+    relation resolver of the first row looks the others up in its group.
+    """
+    context = info.context
+    if not isinstance(context, MutableMapping):
+        return
+    group = list({id(row): row for row in rows}.values())
+    groups = context.setdefault(ROW_GROUPS, dict())
+    for row in group:
+        groups[id(row)] = group
+
+
+def row_group(info: GraphQLResolveInfo, row: Any) -> List[Any]:
+    """rows fetched along with `row`, itself included"""
+    context = info.context
+    if not isinstance(context, MutableMapping):
+        return [row]
+    group: List[Any] = context.get(ROW_GROUPS, {}).get(id(row), [row])
+    return group
+
+
+def loaded_rows(results: Iterable[Any], unique: bool) -> List[Any]:
+    """rows of the results of `QueryLoader.load_many`, misses dropped"""
+    if unique:
+        return [row for row in results if row is not None]
+    return [row for rows in results for row in rows]
+
+
+def relation_key(row: Any, columns: Columns) -> Optional[Key]:
+    """values of `columns` in `row`, None when one is null: no row matches it"""
+    key = tuple(getattr(row, column) for column in columns)
+    if any(value is None for value in key):
+        return None
+    return key
+
+
+def sibling_fields(info: GraphQLResolveInfo) -> List[FieldNode]:
+    """every root selection of the resolved field, under any alias
+
+    graphql-core resolves sync sibling fields one after the other: reading
+    their arguments upfront lets the first one load all the keys.
+    """
+    if info.path.prev is not None:
+        return []
+    fields: List[FieldNode] = []
+
+    def collect(selection_set: SelectionSetNode) -> None:
+        for selection in selection_set.selections:
+            if isinstance(selection, FieldNode):
+                if selection.name.value == info.field_name:
+                    fields.append(selection)
+            elif isinstance(selection, InlineFragmentNode):
+                collect(selection.selection_set)
+            elif isinstance(selection, FragmentSpreadNode):
+                fragment = info.fragments.get(selection.name.value)
+                if fragment is not None:
+                    collect(fragment.selection_set)
+    collect(info.operation.selection_set)
+    return fields
+
+
+def field_keys(info: GraphQLResolveInfo, fields: Iterable[FieldNode], params: Sequence[str]) -> List[Key]:
+    field_def = info.parent_type.fields[info.field_name]
+    keys: List[Key] = []
+    for field_node in fields:
+        args = get_argument_values(field_def, field_node, info.variable_values)
+        keys.append(tuple(args[param] for param in params))
+    return keys
+
+
+def selected_fields(info: GraphQLResolveInfo, fields: Iterable[FieldNode]) -> List[FieldNode]:
+    """sub fields selected by `fields`, through fragments"""
+    selected: List[FieldNode] = []
+
+    def collect(selection_set: Optional[SelectionSetNode]) -> None:
+        if selection_set is None:
+            return
+        for selection in selection_set.selections:
+            if isinstance(selection, FieldNode):
+                selected.append(selection)
+            elif isinstance(selection, InlineFragmentNode):
+                collect(selection.selection_set)
+            elif isinstance(selection, FragmentSpreadNode):
+                fragment = info.fragments.get(selection.name.value)
+                if fragment is not None:
+                    collect(fragment.selection_set)
+    for field_node in fields:
+        collect(field_node.selection_set)
+    return selected
+
+
+def selected_names(info: GraphQLResolveInfo, fields: Iterable[FieldNode]) -> Set[str]:
+    return {field_node.name.value for field_node in selected_fields(info, fields)}
@@ -0,0 +1,178 @@
+import inspect
+import re
+import threading
+from bisect import bisect_left
+from functools import wraps
+from time import perf_counter
+from typing import (Any, Awaitable, Callable, Dict, List, Optional, Protocol, Sequence,
+                    Tuple, Type, cast)
+
+from graphql import ExecutionContext, GraphQLLeafType, OperationDefinitionNode
+from graphql.pyutils import is_awaitable
+
+PHASES = ('parse', 'validate', 'resolve', 'sql', 'fetch', 'serialize')
+# seconds, from half a millisecond to ten seconds
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025,
+                   0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+Labels = Tuple[str, str, str]
+# characters not allowed in prometheus metric and label names
+INVALID_NAME = re.compile(r'[^a-zA-Z0-9_]')
+
+
+class Instrumentation(Protocol):
+    """receives the duration of the phases of a request
+
+    `node` and `query` name the `Node` and `Query` the phase ran for, they
+    are empty for the phases of the whole operation (parse, validate,
+    serialize).
+    instrumentation is disabled by passing None wherever it is accepted:
+    nothing is timed then.
+    """
+
+    def observe(self, phase: str, seconds: float, node: str = '', query: str = '') -> None:
+        ...
+
+
+class Histogram:
+    __slots__ = ('buckets', 'counts', 'sum', 'count')
+
+    def __init__(self, buckets: Sequence[float]):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self) -> List[int]:
+        counts: List[int] = []
+        total = 0
+        for count in self.counts:
+            total += count
+            counts.append(total)
+        return counts
+
+
+class Metrics:
+    """in memory latency histograms per phase, node and query
+
+    `render` returns them, along with the registered gauges, in the
+    prometheus text format.
+    """
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS, prefix: str = 'transpicere'):
+        self.buckets = tuple(buckets)
+        self.prefix = prefix
+        self._histograms: Dict[Labels, Histogram] = dict()
+        self._gauges: Dict[Tuple[str, Tuple[Tuple[str, str], ...]], Callable[[], float]] = dict()
+        self._lock = threading.Lock()
+
+    def observe(self, phase: str, seconds: float, node: str = '', query: str = '') -> None:
+        labels = (phase, node, query)
+        with self._lock:
+            histogram = self._histograms.get(labels)
+            if histogram is None:
+                histogram = self._histograms[labels] = Histogram(self.buckets)
+            histogram.observe(seconds)
+
+    def gauge(self, name: str, function: Callable[[], float],
+              labels: Optional[Dict[str, str]] = None) -> None:
+        """expose the value returned by `function` when rendered
+
+        the characters of `name` and of the label names not allowed by
+        prometheus are replaced by underscores; label values are escaped.
+        """
+        key = tuple(sorted((metric_name(label), value) for label, value in (labels or {}).items()))
+        self._gauges[(metric_name(name), key)] = function
+
+    def histogram(self, phase: str, node: str = '', query: str = '') -> Optional[Histogram]:
+        return self._histograms.get((phase, node, query))
+
+    def render(self) -> str:
+        name = f"{self.prefix}_phase_seconds"
+        lines = [f"# TYPE {name} histogram"]
+        with self._lock:
+            histograms = sorted(
+                (labels, histogram.cumulative(), histogram.sum, histogram.count)
+                for labels, histogram in self._histograms.items())
+        for (phase, node, query), counts, total, count in histograms:
+            labels = f'phase="{phase}",node="{escape(node)}",query="{escape(query)}"'
+            for bound, cumulative in zip(self.buckets, counts):
+                lines.append(
+                    f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+            lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {counts[-1]}')
+            lines.append(f'{name}_sum{{{labels}}} {total}')
+            lines.append(f'{name}_count{{{labels}}} {count}')
+        typed = None
+        for (gauge, gauge_labels), function in sorted(self._gauges.items()):
+            if gauge != typed:
+                lines.append(f"# TYPE {self.prefix}_{gauge} gauge")
+                typed = gauge
+            labels = ','.join(f'{label}="{escape(value)}"' for label, value in gauge_labels)
+            lines.append(f"{self.prefix}_{gauge}{{{labels}}} {function()}" if labels
+                         else f"{self.prefix}_{gauge} {function()}")
+        return '\n'.join(lines) + '\n'
+
+    def execution_context_class(self, base: Type[ExecutionContext] = ExecutionContext) -> Type[ExecutionContext]:
+        """`base` timing the serialization of the leaf values of each operation"""
+        metrics = self
+
+        class InstrumentedExecutionContext(base):  # type: ignore
+            serialize_time = 0.0
+
+            def complete_leaf_value(self, return_type: GraphQLLeafType, result: Any) -> Any:
+                start = perf_counter()
+                try:
+                    return super().complete_leaf_value(return_type, result)
+                finally:
+                    self.serialize_time += perf_counter() - start
+
+            def execute_operation(self, operation: OperationDefinitionNode, root_value: Any) -> Any:
+                result = super().execute_operation(operation, root_value)
+                if is_awaitable(result):
+                    async def observed() -> Any:
+                        try:
+                            return await cast(Awaitable[Any], result)
+                        finally:
+                            metrics.observe('serialize', self.serialize_time)
+                    return observed()
+                metrics.observe('serialize', self.serialize_time)
+                return result
+
+        return InstrumentedExecutionContext
+
+
+def instrument_resolver(resolve: Callable[..., Any], instrumentation: Instrumentation,
+                        node: str, query: str) -> Callable[..., Any]:
+    """`resolve` reporting its duration as the resolve phase of `node` and `query`"""
+    if inspect.iscoroutinefunction(resolve):
+        @wraps(resolve)
+        async def resolve_async(*args: Any, **kwargs: Any) -> Any:
+            start = perf_counter()
+            try:
+                return await resolve(*args, **kwargs)
+            finally:
+                instrumentation.observe(
+                    'resolve', perf_counter() - start, node, query)
+        return resolve_async
+
+    @wraps(resolve)
+    def resolve_sync(*args: Any, **kwargs: Any) -> Any:
+        start = perf_counter()
+        try:
+            return resolve(*args, **kwargs)
+        finally:
+            instrumentation.observe(
+                'resolve', perf_counter() - start, node, query)
+    return resolve_sync
+
+
+def metric_name(name: str) -> str:
+    return INVALID_NAME.sub('_', name)
+
+
+def escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
@@ -0,0 +1,234 @@
+import base64
+import binascii
+import hashlib
+import json
+from datetime import date, datetime, time
+from decimal import Decimal
+from time import perf_counter
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+from uuid import UUID
+
+from graphql import GraphQLError, GraphQLResolveInfo
+
+from transpicere.generator.db import Node, Query
+from transpicere.graphql import *
+from transpicere.resolver.connection import ConnectionSource
+from transpicere.resolver.metrics import Instrumentation
+from transpicere.resolver.loader import (MAX_STATEMENTS, Columns, relation_columns,
+                                        requested_columns, selected_fields, selected_names)
+from transpicere.resolver.sql import RANGE_OPERATORS, CompiledQuery, compile_page_query
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+FETCH_SIZE = 100
+# (column, operator) range conditions of a page
+Ranges = Tuple[Tuple[str, str], ...]
+
+DECODERS: Dict[str, Callable[[Any], Any]] = {
+    GraphQLLong.name: int,
+    GraphQLDecimal.name: Decimal,
+    GraphQLUuid.name: UUID,
+    GraphQLDatetime.name: datetime.fromisoformat,
+    GraphQLDate.name: date.fromisoformat,
+    GraphQLTime.name: time.fromisoformat,
+}
+
+
+def encode_value(value: Any) -> Any:
+    if isinstance(value, (date, time)):
+        return value.isoformat()
+    if isinstance(value, (Decimal, UUID)):
+        return str(value)
+    return value
+
+
+class Page:
+    __slots__ = ('query', 'rows', 'has_next_page', 'args')
+
+    def __init__(self, query: 'PageQuery', rows: List[Any], has_next_page: bool,
+                 args: Optional[Dict[str, Any]] = None):
+        self.query = query
+        self.rows = rows
+        self.has_next_page = has_next_page
+        # the filter of the page: its params and range arguments
+        self.args = args or dict()
+
+    @property
+    def end_cursor(self) -> Optional[str]:
+        return self.query.encode_cursor(self.rows[-1]) if self.rows else None
+
+
+class PageQuery:
+    """keyset pagination over the rows of a non unique `Query`
+
+    rows are ordered by the index columns, then by the columns of the
+    smallest unique index of non null columns of the node (all its columns
+    when it has none) to tell apart the rows sharing the same index values.
+    rows with a null range column are left out, the nulls of the nullable
+    columns telling the rows apart are sorted first. nodes introspected
+    without a dialect have nullable columns only, see `_build_fields`: their
+    pages always compare the order columns one by one.
+    the rows of a query with `ranges` are filtered by the `{column}_gt`,
+    `_gte`, `_lt`, `_lte` and `_between` arguments given for its range
+    column, which follows the params in the order. cursors are the
+    base64 encoded order values of the last row of a page, tagged with the
+    query they come from.
+    """
+
+    def __init__(self, node: Node, query: Query, max_page_size: int = MAX_PAGE_SIZE,
+                 default_page_size: int = DEFAULT_PAGE_SIZE, fetch_size: int = FETCH_SIZE,
+                 instrumentation: Optional[Instrumentation] = None, name: str = ''):
+        self.node = node
+        self.query = query
+        self.name = name
+        self.instrumentation = instrumentation
+        self.params = tuple(query.params)
+        self.ranges = tuple(query.ranges)
+        self.order = self.params + self.ranges + tuple(
+            column for column in tiebreaker(node)
+            if column not in query.params and column not in query.ranges)
+        # params are bound by equality: their values are never null
+        self.not_null = tuple(column for column in self.ranges if node.fields[column].is_nullable)
+        self.nullable = tuple(column for column in self.order[len(self.params) + len(self.ranges):]
+                              if node.fields[column].is_nullable)
+        self.max_page_size = max_page_size
+        self.default_page_size = min(default_page_size, max_page_size)
+        self.fetch_size = fetch_size
+        self._decoders = [
+            DECODERS.get(node.fields[column].data_type, lambda value: value) for column in self.order
+        ]
+        self.relation_columns = relation_columns(node)
+        self._tag = hashlib.sha256(
+            repr((node.name, self.order)).encode()).hexdigest()[:8]
+        self._statements: Dict[Tuple[bool, Columns, Ranges, Columns], CompiledQuery] = dict()
+
+    def projection(self, names: Sequence[str]) -> Columns:
+        wanted = requested_columns(names, self.relation_columns).union(self.order)
+        return tuple(column for column in self.node.fields if column in wanted)
+
+    def statement(self, after: bool, columns: Columns, ranges: Ranges = (),
+                  nulls: Columns = ()) -> CompiledQuery:
+        """`nulls` are the nullable order columns null in the cursor"""
+        key = (after, columns, ranges, nulls)
+        compiled = self._statements.get(key)
+        if compiled is None:
+            if len(self._statements) >= MAX_STATEMENTS:
+                self._statements.pop(next(iter(self._statements)), None)
+            compiled = self._statements.setdefault(key, compile_page_query(
+                self.node, self.query, self.order, columns, after, ranges,
+                self.not_null, self.nullable, nulls))
+        return compiled
+
+    def range_conditions(self, args: Dict[str, Any]) -> Tuple[Ranges, List[Any]]:
+        """(column, operator) conditions of the range arguments given in `args`, and their values"""
+        ranges: List[Tuple[str, str]] = []
+        values: List[Any] = []
+        for column in self.ranges:
+            for operator in RANGE_OPERATORS:
+                value = args.get(f"{column}_{operator}")
+                if value is None:
+                    continue
+                if operator == 'between':
+                    if len(value) != 2:
+                        raise GraphQLError(
+                            f"{column}_between takes two values, got {len(value)}")
+                    values.extend(value)
+                else:
+                    values.append(value)
+                ranges.append((column, operator))
+        return tuple(ranges), values
+
+    def encode_cursor(self, row: Any) -> str:
+        values = [encode_value(getattr(row, column)) for column in self.order]
+        payload = json.dumps([self._tag, values], separators=(',', ':'))
+        return base64.urlsafe_b64encode(payload.encode()).decode()
+
+    def decode_cursor(self, cursor: str) -> List[Any]:
+        try:
+            tag, values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+            if tag != self._tag or len(values) != len(self.order):
+                raise ValueError(cursor)
+            return [None if value is None else decode(value)
+                    for decode, value in zip(self._decoders, values)]
+        except (ValueError, TypeError, binascii.Error):
+            raise GraphQLError(f"invalid cursor: {cursor}")
+
+    def page_size(self, first: Optional[int]) -> int:
+        if first is None:
+            return self.default_page_size
+        if first < 0 or first > self.max_page_size:
+            raise GraphQLError(
+                f"first must be between 0 and {self.max_page_size}, got {first}")
+        return first
+
+    def fetch(self, connections: ConnectionSource, args: Dict[str, Any], columns: Columns,
+              first: Optional[int] = None, after: Optional[str] = None) -> Page:
+        size = self.page_size(first)
+        values = [args[param] for param in self.params]
+        ranges, range_values = self.range_conditions(args)
+        values.extend(range_values)
+        if after is None:
+            compiled = self.statement(False, columns, ranges)
+        else:
+            cursor_values = self.decode_cursor(after)
+            nulls = tuple(column for column, value in zip(self.order, cursor_values)
+                          if value is None and column in self.nullable)
+            if len(nulls) != cursor_values.count(None):
+                raise GraphQLError(f"invalid cursor: {after}")
+            compiled = self.statement(True, columns, ranges, nulls)
+            values.extend(cursor_values[index] for index in compiled.cursor_values)
+        # one more row tells whether there is a next page
+        values.append(size + 1)
+        rows: List[Any] = []
+        instrumentation = self.instrumentation
+        with connections.borrow() as cnxn:
+            start = perf_counter() if instrumentation is not None else 0.0
+            cursor = cnxn.execute(compiled.sql, values)
+            if instrumentation is not None:
+                executed = perf_counter()
+                instrumentation.observe(
+                    'sql', executed - start, self.node.name, self.name)
+            while len(rows) <= size:
+                batch = cursor.fetchmany(min(self.fetch_size, size + 1 - len(rows)))
+                if not batch:
+                    break
+                rows.extend(batch)
+            if instrumentation is not None:
+                instrumentation.observe(
+                    'fetch', perf_counter() - executed, self.node.name, self.name)
+        has_next_page = len(rows) > size
+        del rows[size:]
+        return Page(self, rows, has_next_page, args)
+
+    def iterate(self, connections: ConnectionSource, args: Dict[str, Any], columns: Columns) -> Iterator[Any]:
+        """every row matching `args`, read a page of `max_page_size` rows at a time
+
+        the first page is fetched before returning, so that invalid arguments
+        raise here. the connection is only borrowed while fetching a page:
+        rows written between two pages may be missed or returned.
+        """
+        page = self.fetch(connections, args, columns, self.max_page_size)
+        return self._pages(connections, page, columns)
+
+    def _pages(self, connections: ConnectionSource, page: Page, columns: Columns) -> Iterator[Any]:
+        while True:
+            yield from page.rows
+            if not page.has_next_page:
+                return
+            page = self.fetch(connections, page.args, columns, self.max_page_size, page.end_cursor)
+
+    def selected_columns(self, info: GraphQLResolveInfo) -> Columns:
+        edges = [field_node for field_node in selected_fields(info, info.field_nodes)
+                 if field_node.name.value == 'edges']
+        nodes = [field_node for field_node in selected_fields(info, edges)
+                 if field_node.name.value == 'node']
+        return self.projection(list(selected_names(info, nodes)))
+
+
+def tiebreaker(node: Node) -> Tuple[str, ...]:
+    # a unique index allows any number of nulls: only non null columns tell rows apart
+    unique = sorted((len(query.params), name) for name, query in node.queries.items()
+                    if query.unique and not any(node.fields[column].is_nullable for column in query.params))
+    if unique:
+        return tuple(node.queries[unique[0][1]].params)
+    return tuple(node.fields)
@@ -0,0 +1,197 @@
+import logging
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any, Callable, Deque, Iterator, Optional
+
+import pyodbc
+
+from transpicere.resolver.connection import CONNECTION_ERRORS, PreparedConnection
+
+LOGGER = logging.Logger(__name__)
+
+
+class PoolTimeout(Exception):
+    pass
+
+
+@dataclass
+class PoolStats:
+    created: int = field(default=0)
+    closed: int = field(default=0)
+    in_use: int = field(default=0)
+    idle: int = field(default=0)
+    acquired: int = field(default=0)
+    waits: int = field(default=0)
+    wait_time: float = field(default=0.0)
+    timeouts: int = field(default=0)
+    failed_checks: int = field(default=0)
+
+
+class _Pooled:
+    __slots__ = ('connection', 'created_at', 'released_at', 'uses')
+
+    def __init__(self, connection: PreparedConnection):
+        self.connection = connection
+        self.created_at = self.released_at = time.monotonic()
+        self.uses = 0
+
+
+class ConnectionPool:
+    """bounded pool of `PreparedConnection`
+
+    `min_size` connections are opened upfront, at most `max_size` are open
+    at any time. connections are recycled after `max_uses` borrows or `max_age` seconds,
+    and checked with `ping_sql` before being handed out when they were idle
+    for more than `ping_after` seconds (None disables the check): a
+    connection used just before is not worth a round trip. `borrow` waits at
+    most `timeout` seconds for a free connection, then raises `PoolTimeout`.
+    a connection raising one of `CONNECTION_ERRORS` while borrowed is closed
+    instead of going back to the pool; other errors, e.g. of the sql or of
+    its params, keep the connection and its prepared statements.
+    """
+
+    def __init__(self, connection_string: str, min_size: int = 0, max_size: int = 10,
+                 timeout: float = 30.0, max_uses: Optional[int] = None,
+                 max_age: Optional[float] = None, ping_sql: Optional[str] = "SELECT 1",
+                 ping_after: float = 5.0, connect: Optional[Callable[[], Any]] = None):
+        if max_size < 1 or min_size > max_size:
+            raise ValueError(
+                f"invalid pool size min={min_size} max={max_size}")
+        self.connection_string = connection_string
+        self.min_size = min_size
+        self.max_size = max_size
+        self.timeout = timeout
+        self.max_uses = max_uses
+        self.max_age = max_age
+        self.ping_sql = ping_sql
+        self.ping_after = ping_after
+        self._connect = connect or (lambda: pyodbc.connect(
+            connection_string, autocommit=True))
+        self._idle: Deque[_Pooled] = deque()
+        self._size = 0
+        self._stats = PoolStats()
+        self._condition = threading.Condition()
+        for _ in range(min_size):
+            self._reserve()
+            self._idle.append(self._create())
+
+    @contextmanager
+    def borrow(self) -> Iterator[PreparedConnection]:
+        pooled = self.acquire()
+        try:
+            yield pooled.connection
+        except CONNECTION_ERRORS:
+            self.release(pooled, broken=True)
+            raise
+        except BaseException:
+            self.release(pooled)
+            raise
+        else:
+            self.release(pooled)
+
+    def acquire(self) -> _Pooled:
+        start = time.monotonic()
+        deadline = start + self.timeout
+        waited = False
+        while True:
+            pooled = None
+            with self._condition:
+                while not self._idle and self._size >= self.max_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._stats.timeouts += 1
+                        raise PoolTimeout(
+                            f"no connection available after {self.timeout}s")
+                    waited = True
+                    self._condition.wait(remaining)
+                if self._idle:
+                    pooled = self._idle.pop()
+                else:
+                    self._reserve()
+            if pooled is None:
+                pooled = self._create()
+            elif self._expired(pooled) or not self._alive(pooled):
+                self._discard(pooled)
+                continue
+            pooled.uses += 1
+            with self._condition:
+                self._stats.acquired += 1
+                if waited:
+                    self._stats.waits += 1
+                    self._stats.wait_time += time.monotonic() - start
+            return pooled
+
+    def release(self, pooled: _Pooled, broken: bool = False) -> None:
+        if broken or self._expired(pooled):
+            self._discard(pooled)
+            return
+        pooled.released_at = time.monotonic()
+        with self._condition:
+            self._idle.append(pooled)
+            self._condition.notify()
+
+    def close(self) -> None:
+        with self._condition:
+            idle, self._idle = self._idle, deque()
+        for pooled in idle:
+            self._discard(pooled)
+
+    def stats(self) -> PoolStats:
+        with self._condition:
+            idle = len(self._idle)
+            return PoolStats(
+                created=self._stats.created,
+                closed=self._stats.closed,
+                in_use=self._size - idle,
+                idle=idle,
+                acquired=self._stats.acquired,
+                waits=self._stats.waits,
+                wait_time=self._stats.wait_time,
+                timeouts=self._stats.timeouts,
+                failed_checks=self._stats.failed_checks
+            )
+
+    def _reserve(self) -> None:
+        # called with the lock held: the slot is taken before connecting
+        self._size += 1
+
+    def _create(self) -> _Pooled:
+        try:
+            pooled = _Pooled(PreparedConnection(self._connect()))
+        except BaseException:
+            with self._condition:
+                self._size -= 1
+                self._condition.notify()
+            raise
+        with self._condition:
+            self._stats.created += 1
+        return pooled
+
+    def _discard(self, pooled: _Pooled) -> None:
+        try:
+            pooled.connection.close()
+        except pyodbc.Error as e:
+            LOGGER.warning(f"error closing connection: {e}")
+        with self._condition:
+            self._size -= 1
+            self._stats.closed += 1
+            self._condition.notify()
+
+    def _expired(self, pooled: _Pooled) -> bool:
+        if self.max_uses is not None and pooled.uses >= self.max_uses:
+            return True
+        return self.max_age is not None and time.monotonic() - pooled.created_at >= self.max_age
+
+    def _alive(self, pooled: _Pooled) -> bool:
+        if self.ping_sql is None or time.monotonic() - pooled.released_at <= self.ping_after:
+            return True
+        try:
+            pooled.connection.execute(self.ping_sql).fetchall()
+            return True
+        except pyodbc.Error:
+            with self._condition:
+                self._stats.failed_checks += 1
+            return False
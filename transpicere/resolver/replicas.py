@@ -0,0 +1,174 @@
+import logging
+import threading
+import time
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field, replace
+from typing import Callable, Dict, Iterator, List, Set, Tuple
+
+import pyodbc
+
+from transpicere.resolver.connection import CONNECTION_ERRORS, ConnectionSource, PreparedConnection
+from transpicere.resolver.pool import PoolTimeout
+
+LOGGER = logging.Logger(__name__)
+PRIMARY = 'primary'
+BALANCING = ('round_robin', 'least_outstanding')
+
+# reads of the current request or task go to the primary, see `primary_reads`
+READ_FROM_PRIMARY: ContextVar[bool] = ContextVar('transpicere_read_from_primary', default=False)
+
+
+@contextmanager
+def primary_reads() -> Iterator[None]:
+    """send the reads made within to the primary, to read the writes just made
+
+    the flag is a context variable: it follows the request into the
+    resolvers run by `AsyncExecutor`.
+    """
+    token = READ_FROM_PRIMARY.set(True)
+    try:
+        yield
+    finally:
+        READ_FROM_PRIMARY.reset(token)
+
+
+@dataclass
+class ReplicaStats:
+    weight: int = field(default=1)
+    healthy: bool = field(default=True)
+    outstanding: int = field(default=0)
+    borrowed: int = field(default=0)
+    errors: int = field(default=0)
+    ejections: int = field(default=0)
+    # seconds connections were borrowed for, in total and at most
+    latency: float = field(default=0.0)
+    max_latency: float = field(default=0.0)
+
+
+class _Replica:
+    __slots__ = ('name', 'source', 'weight', 'current', 'failures', 'ejected_until', 'stats')
+
+    def __init__(self, name: str, source: ConnectionSource, weight: int):
+        self.name = name
+        self.source = source
+        self.weight = weight
+        # smooth weighted round robin counter
+        self.current = 0
+        self.failures = 0
+        self.ejected_until = 0.0
+        self.stats = ReplicaStats(weight=weight)
+
+
+class ReplicaRouter:
+    """`ConnectionSource` spreading the reads over replicas of a primary
+
+    `replicas` maps names to the sources and weights of the read replicas.
+    reads are balanced over them by weighted `round_robin`, or by
+    `least_outstanding` connections per weight. they go to the primary
+    within `primary_reads`, or when no replica is available; writes borrow
+    from `primary` explicitly.
+    a replica whose connection raises one of `CONNECTION_ERRORS`
+    `max_failures` times in a row is ejected for `retry_after` seconds, then
+    given reads again: a success puts it back, a failure ejects it again.
+    errors of the statements, such as a bad query, are no failure of the
+    replica. the errors are raised to the borrower, but a replica failing to
+    hand out a connection is skipped for the next one.
+    """
+
+    def __init__(self, primary: ConnectionSource, replicas: Dict[str, Tuple[ConnectionSource, int]],
+                 balancing: str = 'round_robin', max_failures: int = 3, retry_after: float = 30.0,
+                 clock: Callable[[], float] = time.monotonic):
+        if balancing not in BALANCING:
+            raise ValueError(f"unknown balancing {balancing}, expected one of {', '.join(BALANCING)}")
+        self.primary = primary
+        self.balancing = balancing
+        self.max_failures = max_failures
+        self.retry_after = retry_after
+        self._clock = clock
+        self._primary = _Replica(PRIMARY, primary, 0)
+        self._replicas: List[_Replica] = []
+        for name, (source, weight) in replicas.items():
+            if name == PRIMARY or weight < 1:
+                raise ValueError(f"invalid replica {name} of weight {weight}")
+            self._replicas.append(_Replica(name, source, weight))
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def borrow(self) -> Iterator[PreparedConnection]:
+        with ExitStack() as stack:
+            replica, cnxn = self._acquire(stack)
+            start = self._clock()
+            try:
+                yield cnxn
+            except CONNECTION_ERRORS:
+                self._release(replica, start, failed=True)
+                raise
+            except BaseException:
+                self._release(replica, start)
+                raise
+            else:
+                self._release(replica, start)
+
+    def stats(self) -> Dict[str, ReplicaStats]:
+        """counters of the primary and of every replica, by name"""
+        now = self._clock()
+        with self._lock:
+            return {replica.name: replace(replica.stats, healthy=replica.ejected_until <= now)
+                    for replica in (self._primary, *self._replicas)}
+
+    def _acquire(self, stack: ExitStack) -> Tuple[_Replica, PreparedConnection]:
+        skipped: Set[str] = set()
+        while True:
+            replica = self._choose(skipped)
+            try:
+                cnxn = stack.enter_context(replica.source.borrow())
+            except (pyodbc.Error, PoolTimeout) as e:
+                self._release(replica, self._clock(), failed=isinstance(e, CONNECTION_ERRORS),
+                              acquired=False)
+                if replica is self._primary:
+                    raise
+                LOGGER.warning(f"replica {replica.name} unavailable: {e}")
+                skipped.add(replica.name)
+                continue
+            return replica, cnxn
+
+    def _choose(self, skipped: Set[str]) -> _Replica:
+        """the replica to read from, counted as outstanding"""
+        now = self._clock()
+        with self._lock:
+            candidates = [] if READ_FROM_PRIMARY.get() else [
+                replica for replica in self._replicas
+                if replica.name not in skipped and replica.ejected_until <= now]
+            if not candidates:
+                chosen = self._primary
+            elif self.balancing == 'least_outstanding':
+                chosen = min(candidates, key=lambda replica: (replica.stats.outstanding + 1) / replica.weight)
+            else:
+                total = 0
+                for replica in candidates:
+                    replica.current += replica.weight
+                    total += replica.weight
+                chosen = max(candidates, key=lambda replica: replica.current)
+                chosen.current -= total
+            chosen.stats.outstanding += 1
+            return chosen
+
+    def _release(self, replica: _Replica, start: float, failed: bool = False, acquired: bool = True) -> None:
+        elapsed = self._clock() - start
+        with self._lock:
+            stats = replica.stats
+            stats.outstanding -= 1
+            if acquired:
+                stats.borrowed += 1
+                stats.latency += elapsed
+                stats.max_latency = max(stats.max_latency, elapsed)
+            if not failed:
+                replica.failures = 0
+                return
+            stats.errors += 1
+            replica.failures += 1
+            if replica is not self._primary and replica.failures >= self.max_failures:
+                replica.ejected_until = self._clock() + self.retry_after
+                stats.ejections += 1
+                LOGGER.warning(f"replica {replica.name} ejected for {self.retry_after}s")
@@ -0,0 +1,157 @@
+import sys
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Optional, Set, Tuple
+
+from transpicere.resolver.loader import Columns, Key
+
+DEFAULT_MAX_BYTES = 64 << 20
+DEFAULT_TTL = 60.0
+Generation = Tuple[int, int]
+# the params of the unique query, then their values: several unique
+# queries of a node look rows up by different columns
+EntryKey = Tuple[Columns, Key]
+
+
+@dataclass
+class RowCacheStats:
+    hits: int = field(default=0)
+    misses: int = field(default=0)
+    evictions: int = field(default=0)
+    evicted_bytes: int = field(default=0)
+    invalidations: int = field(default=0)
+    entries: int = field(default=0)
+    bytes: int = field(default=0)
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+
+class _Entry:
+    __slots__ = ('row', 'columns', 'expires', 'size')
+
+    def __init__(self, row: Any, columns: Columns, expires: float, size: int):
+        self.row = row
+        self.columns = columns
+        self.expires = expires
+        self.size = size
+
+
+class RowCache:
+    """cross request cache of the rows found by unique `Query` lookups
+
+    entries are keyed by node name, index params and their values, hold the columns they
+    were fetched with and expire after the TTL of their node, `default_ttl`
+    unless set in `ttls` (0 disables caching for a node). the least recently
+    used entries are evicted past `max_bytes`, estimated with sys.getsizeof.
+    `invalidate` drops the entries of a node after a write to its table;
+    lookups started before it do not store their stale rows.
+    missing rows are not cached.
+    """
+
+    def __init__(self, max_bytes: int = DEFAULT_MAX_BYTES, default_ttl: float = DEFAULT_TTL,
+                 ttls: Optional[Dict[str, float]] = None,
+                 clock: Callable[[], float] = time.monotonic):
+        self.max_bytes = max_bytes
+        self.default_ttl = default_ttl
+        self.ttls = dict(ttls or {})
+        self.clock = clock
+        self._entries: 'OrderedDict[Tuple[str, EntryKey], _Entry]' = OrderedDict()
+        self._keys: Dict[str, Set[EntryKey]] = dict()
+        self._epoch = 0
+        self._generations: Dict[str, int] = dict()
+        self._bytes = 0
+        self._stats = RowCacheStats()
+        self._lock = threading.Lock()
+
+    def ttl(self, node: str) -> float:
+        return self.ttls.get(node, self.default_ttl)
+
+    def generation(self, node: str) -> Generation:
+        """to pass to `put`, taken before the rows are fetched"""
+        with self._lock:
+            return self._epoch, self._generations.get(node, 0)
+
+    def get(self, node: str, params: Columns, key: Key, columns: Columns) -> Optional[Any]:
+        """cached row of the `params` values `key` with at least `columns`"""
+        entry_key = (params, key)
+        with self._lock:
+            entry = self._entries.get((node, entry_key))
+            if entry is not None and entry.expires <= self.clock():
+                self._remove(node, entry_key)
+                entry = None
+            if entry is None or not (entry.columns == columns or set(columns).issubset(entry.columns)):
+                self._stats.misses += 1
+                return None
+            self._entries.move_to_end((node, entry_key))
+            self._stats.hits += 1
+            return entry.row
+
+    def put(self, node: str, params: Columns, key: Key, columns: Columns, row: Any,
+            generation: Generation) -> None:
+        ttl = self.ttl(node)
+        if row is None or ttl <= 0:
+            return
+        size = row_size(row, columns)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if generation != (self._epoch, self._generations.get(node, 0)):
+                return
+            entry_key = (params, key)
+            self._remove(node, entry_key)
+            self._entries[(node, entry_key)] = _Entry(
+                row, columns, self.clock() + ttl, size)
+            self._keys.setdefault(node, set()).add(entry_key)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                (evicted_node, evicted_key), evicted = next(
+                    iter(self._entries.items()))
+                self._remove(evicted_node, evicted_key)
+                self._stats.evictions += 1
+                self._stats.evicted_bytes += evicted.size
+
+    def invalidate(self, node: Optional[str] = None) -> None:
+        """drop the entries of `node`, of every node when None"""
+        with self._lock:
+            self._stats.invalidations += 1
+            if node is None:
+                self._epoch += 1
+                self._entries.clear()
+                self._keys.clear()
+                self._bytes = 0
+                return
+            self._generations[node] = self._generations.get(node, 0) + 1
+            for key in list(self._keys.get(node, ())):
+                self._remove(node, key)
+
+    def stats(self) -> RowCacheStats:
+        with self._lock:
+            return RowCacheStats(
+                hits=self._stats.hits,
+                misses=self._stats.misses,
+                evictions=self._stats.evictions,
+                evicted_bytes=self._stats.evicted_bytes,
+                invalidations=self._stats.invalidations,
+                entries=len(self._entries),
+                bytes=self._bytes
+            )
+
+    def _remove(self, node: str, key: EntryKey) -> None:
+        entry = self._entries.pop((node, key), None)
+        if entry is None:
+            return
+        self._bytes -= entry.size
+        keys = self._keys.get(node)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._keys[node]
+
+
+def row_size(row: Any, columns: Columns) -> int:
+    return sys.getsizeof(row) + sum(sys.getsizeof(getattr(row, column)) for column in columns)
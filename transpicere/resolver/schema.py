@@ -0,0 +1,411 @@
+import asyncio
+import threading
+from functools import lru_cache, partial
+from typing import Any, Callable, Dict, Generic, Iterator, Optional, Sequence, Tuple, TypeVar
+
+from graphql import (GraphQLArgument, GraphQLBoolean, GraphQLError, GraphQLField, GraphQLFloat,
+                     GraphQLID, GraphQLInt, GraphQLList, GraphQLNonNull,
+                     GraphQLObjectType, GraphQLScalarType,
+                     GraphQLSchema, GraphQLString, GraphQLResolveInfo, specified_directives)
+
+from transpicere.generator.db import Field, Node, Query, Relation, intern_field
+from transpicere.graphql import *
+from transpicere.resolver.aggregate import AggregateQuery, aggregate_columns
+from transpicere.resolver.connection import ConnectionSource
+from transpicere.resolver.cost import (AGGREGATE, COST, FILTERED, filtered_rows, query_rows,
+                                       relation_rows, table_rows)
+from transpicere.resolver.incremental import INCREMENTAL_DIRECTIVES
+from transpicere.resolver.metrics import Instrumentation, instrument_resolver
+from transpicere.resolver.loader import (BatchQuery, Columns, field_keys, get_loader,
+                                        loaded_rows, relation_key, remember_rows, row_group,
+                                        selected_names, sibling_fields)
+from transpicere.resolver.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, Page, PageQuery
+from transpicere.resolver.rowcache import RowCache
+from transpicere.resolver.sql import RANGE_OPERATORS
+
+SCALARS: Dict[str, GraphQLScalarType] = {
+    scalar.name: scalar for scalar in (
+        GraphQLBoolean, GraphQLInt, GraphQLFloat, GraphQLString, GraphQLID,
+        GraphQLLong, GraphQLDatetime, GraphQLDate, GraphQLTime, GraphQLDecimal, GraphQLUuid
+    )
+}
+
+
+T = TypeVar('T')
+
+
+class Lazy(Generic[T]):
+    """value built on first use"""
+    __slots__ = ('factory', 'value')
+    lock = threading.Lock()
+
+    def __init__(self, factory: Callable[[], T]):
+        self.factory: Optional[Callable[[], T]] = factory
+        self.value: Optional[T] = None
+
+    def get(self) -> T:
+        value = self.value
+        if value is None:
+            with self.lock:
+                if self.value is None:
+                    assert self.factory is not None
+                    self.value = self.factory()
+                    self.factory = None
+                value = self.value
+        return value
+
+
+# extension of the root fields of non unique queries, see `export_rows`
+EXPORT = 'export'
+# the fields of a connection that need its rows
+PAGE_FIELDS = {'edges', 'pageInfo'}
+PAGE_INFO = GraphQLObjectType('PageInfo', {
+    'hasNextPage': GraphQLField(GraphQLNonNull(GraphQLBoolean),
+                                resolve=lambda page, _info: page.has_next_page),
+    'endCursor': GraphQLField(GraphQLString,
+                              resolve=lambda page, _info: page.end_cursor),
+})
+
+
+def field_type(field: Field) -> Any:
+    output_type: Any = SCALARS[field.data_type]
+    if field.is_list:
+        output_type = GraphQLList(GraphQLNonNull(output_type))
+    if not field.is_nullable:
+        output_type = GraphQLNonNull(output_type)
+    return output_type
+
+
+# `Field`s are interned: the columns of a type share their GraphQL field
+@lru_cache(maxsize=None)
+def column_field(field: Field) -> GraphQLField:
+    return GraphQLField(field_type(field))
+
+
+@lru_cache(maxsize=None)
+def param_argument(field: Field) -> GraphQLArgument:
+    return GraphQLArgument(field_type(field))
+
+
+@lru_cache(maxsize=None)
+def range_arguments(column: str, field: Field) -> Dict[str, GraphQLArgument]:
+    """the optional range arguments of `column`, `between` takes a list of two values"""
+    return {
+        f"{column}_{operator}": param_argument(intern_field(
+            field.data_type, is_list=operator == 'between'))
+        for operator in RANGE_OPERATORS
+    }
+
+
+def resolve_query(connections: ConnectionSource, lazy_batch: Lazy[BatchQuery], cache: Optional[RowCache],
+                  _root: Any, info: GraphQLResolveInfo, **args: Any) -> Any:
+    batch = lazy_batch.get()
+    key = tuple(args[param] for param in batch.params)
+    loader = get_loader(info, connections, batch, cache)
+    columns = batch.projection(selected_names(info, info.field_nodes))
+    if not loader.covers(key, columns):
+        siblings = sibling_fields(info)
+        columns = batch.projection(selected_names(info, siblings) | set(columns))
+        rows = loader.load_many(
+            [key] + field_keys(info, siblings, batch.params), columns)
+        if batch.relation_columns:
+            remember_rows(info, loaded_rows(rows, batch.unique))
+    return loader.get(key)
+
+
+async def resolve_query_async(connections: ConnectionSource, lazy_batch: Lazy[BatchQuery], cache: Optional[RowCache],
+                              _root: Any, info: GraphQLResolveInfo, **args: Any) -> Any:
+    batch = lazy_batch.get()
+    key = tuple(args[param] for param in batch.params)
+    columns = batch.projection(selected_names(info, info.field_nodes))
+    return await get_loader(info, connections, batch, cache).load(key, columns)
+
+
+def resolve_page(connections: ConnectionSource, lazy_page_query: Lazy[PageQuery],
+                 _root: Any, info: GraphQLResolveInfo, first: Optional[int] = None,
+                 after: Optional[str] = None, **args: Any) -> Any:
+    page_query = lazy_page_query.get()
+    if not PAGE_FIELDS & selected_names(info, info.field_nodes):
+        # only aggregates: no row to fetch
+        return Page(page_query, [], False, args)
+    page = page_query.fetch(connections, args, page_query.selected_columns(info), first, after)
+    if page_query.relation_columns:
+        remember_rows(info, page.rows)
+    return page
+
+
+async def resolve_page_async(connections: ConnectionSource, lazy_page_query: Lazy[PageQuery],
+                             _root: Any, info: GraphQLResolveInfo, first: Optional[int] = None,
+                             after: Optional[str] = None, **args: Any) -> Any:
+    page_query = lazy_page_query.get()
+    if not PAGE_FIELDS & selected_names(info, info.field_nodes):
+        return Page(page_query, [], False, args)
+    fetch = partial(page_query.fetch, connections, args,
+                    page_query.selected_columns(info), first, after)
+    return await asyncio.get_running_loop().run_in_executor(None, fetch)
+
+
+def export_rows(connections: ConnectionSource, lazy_page_query: Lazy[PageQuery], args: Dict[str, Any],
+                names: Optional[Sequence[str]] = None) -> Tuple[Columns, Iterator[Any]]:
+    """the columns `names`, all those of the node by default, and every row
+    matching `args`, see `PageQuery.iterate`"""
+    page_query = lazy_page_query.get()
+    columns = tuple(names) if names else tuple(page_query.node.fields)
+    unknown = [column for column in columns if column not in page_query.node.fields]
+    if unknown:
+        raise GraphQLError(f"unknown columns: {', '.join(unknown)}")
+    return columns, page_query.iterate(connections, args, page_query.projection(columns))
+
+
+def aggregate_fetch(connections: ConnectionSource, lazy_aggregate: Lazy[AggregateQuery],
+                    root: Any, info: GraphQLResolveInfo) -> Callable[[], Dict[str, Any]]:
+    """fetch of the selected aggregates: of the rows of the filter of the
+    page under a connection, of the whole table at the root"""
+    aggregate = lazy_aggregate.get()
+    selection = aggregate.selection(info)
+    if not isinstance(root, Page):
+        return partial(aggregate.fetch, connections, selection)
+    page_query = root.query
+    ranges, range_values = page_query.range_conditions(root.args)
+    values = [root.args[param] for param in page_query.params] + range_values
+    return partial(aggregate.fetch, connections, selection, page_query.query, values, ranges)
+
+
+def resolve_aggregate(connections: ConnectionSource, lazy_aggregate: Lazy[AggregateQuery],
+                      root: Any, info: GraphQLResolveInfo) -> Any:
+    return aggregate_fetch(connections, lazy_aggregate, root, info)()
+
+
+async def resolve_aggregate_async(connections: ConnectionSource, lazy_aggregate: Lazy[AggregateQuery],
+                                  root: Any, info: GraphQLResolveInfo) -> Any:
+    fetch = aggregate_fetch(connections, lazy_aggregate, root, info)
+    return await asyncio.get_running_loop().run_in_executor(None, fetch)
+
+
+def resolve_relation(connections: ConnectionSource, lazy_batch: Lazy[BatchQuery], columns: Columns,
+                     row: Any, info: GraphQLResolveInfo) -> Any:
+    batch = lazy_batch.get()
+    key = relation_key(row, columns)
+    if key is None:
+        return None if batch.unique else []
+    loader = get_loader(info, connections, batch)
+    selected = batch.projection(selected_names(info, info.field_nodes))
+    if not loader.covers(key, selected):
+        # the related rows of every row fetched along with this one, at once
+        keys = [relation_key(other, columns) for other in row_group(info, row)]
+        rows = loader.load_many(
+            [key] + [other for other in keys if other is not None], selected)
+        if batch.relation_columns:
+            remember_rows(info, loaded_rows(rows, batch.unique))
+    return loader.get(key)
+
+
+async def resolve_relation_async(connections: ConnectionSource, lazy_batch: Lazy[BatchQuery],
+                                 columns: Columns, row: Any, info: GraphQLResolveInfo) -> Any:
+    batch = lazy_batch.get()
+    key = relation_key(row, columns)
+    if key is None:
+        return None if batch.unique else []
+    selected = batch.projection(selected_names(info, info.field_nodes))
+    return await get_loader(info, connections, batch).load(key, selected)
+
+
+def relation_query(relation: Relation, target: Node) -> Query:
+    """lookup of the rows of `relation` by the columns of its target"""
+    return Query(
+        unique=relation.unique,
+        return_type=target.name,
+        params={column: intern_field(target.fields[column].data_type, is_nullable=False)
+                for column in relation.columns.values()},
+        cardinality=relation.cardinality)
+
+
+def instrumented(resolve: Callable[..., Any], instrumentation: Optional[Instrumentation],
+                 node: Node, query_name: str) -> Callable[..., Any]:
+    if instrumentation is None:
+        return resolve
+    return instrument_resolver(resolve, instrumentation, node.name, query_name)
+
+
+def node_type(node: Node, relations: Callable[[], Dict[str, GraphQLField]] = dict) -> GraphQLObjectType:
+    # a thunk: the fields are only built when the schema collects its types,
+    # once the types the relations return are all defined
+    return GraphQLObjectType(node.name, lambda: {
+        **{name: column_field(field) for name, field in node.fields.items()},
+        **relations()
+    })
+
+
+def relation_fields(node: Node, nodes: Dict[str, Node], types: Dict[str, GraphQLObjectType],
+                    connections: ConnectionSource, run_async: bool,
+                    instrumentation: Optional[Instrumentation]) -> Dict[str, GraphQLField]:
+    resolve = resolve_relation_async if run_async else resolve_relation
+    fields: Dict[str, GraphQLField] = dict()
+    for name, relation in node.relations.items():
+        target = nodes.get(relation.target)
+        if target is None:
+            continue
+        batch = Lazy(partial(BatchQuery, target, relation_query(relation, target),
+                             instrumentation=instrumentation, name=name))
+        target_type: Any = types[target.name]
+        if not relation.unique:
+            target_type = GraphQLNonNull(GraphQLList(GraphQLNonNull(target_type)))
+        fields[name] = GraphQLField(
+            target_type,
+            resolve=instrumented(
+                partial(resolve, connections, batch, tuple(relation.columns)), instrumentation, target, name),
+            extensions={COST: relation_rows(relation)}
+        )
+    return fields
+
+
+def resolve_cursor(edge: Any, _info: GraphQLResolveInfo) -> Any:
+    return edge[0].query.encode_cursor(edge[1])
+
+
+def resolve_edge_node(edge: Any, _info: GraphQLResolveInfo) -> Any:
+    return edge[1]
+
+
+def resolve_edges(page: Any, _info: GraphQLResolveInfo) -> Any:
+    return [(page, row) for row in page.rows]
+
+
+def resolve_page_info(page: Any, _info: GraphQLResolveInfo) -> Any:
+    return page
+
+
+EDGE_CURSOR = GraphQLField(GraphQLNonNull(GraphQLString), resolve=resolve_cursor)
+PAGE_INFO_FIELD = GraphQLField(GraphQLNonNull(PAGE_INFO), resolve=resolve_page_info)
+FIRST_ARGUMENT = GraphQLArgument(GraphQLInt)
+AFTER_ARGUMENT = GraphQLArgument(GraphQLString)
+COUNT_FIELD = GraphQLField(GraphQLNonNull(GraphQLLong))
+
+
+def connection_type(node: Node, object_type: GraphQLObjectType,
+                    aggregate: Optional[GraphQLField] = None) -> GraphQLObjectType:
+    # edges are (page, row) pairs, the cursor depends on the query of the page
+    edge_type = GraphQLObjectType(f"{node.name}_edge", lambda: {
+        'cursor': EDGE_CURSOR,
+        'node': GraphQLField(GraphQLNonNull(object_type), resolve=resolve_edge_node),
+    })
+    return GraphQLObjectType(f"{node.name}_connection", lambda: {
+        'edges': GraphQLField(GraphQLNonNull(GraphQLList(GraphQLNonNull(edge_type))),
+                              resolve=resolve_edges),
+        'pageInfo': PAGE_INFO_FIELD,
+        **({} if aggregate is None else {'aggregate': aggregate}),
+    })
+
+
+@lru_cache(maxsize=None)
+def aggregate_value_field(type_name: str) -> GraphQLField:
+    return GraphQLField(SCALARS[type_name])
+
+
+def aggregate_type(node: Node) -> GraphQLObjectType:
+    def fields() -> Dict[str, GraphQLField]:
+        aggregate_fields = {'count': COUNT_FIELD}
+        for function, columns in aggregate_columns(node).items():
+            if columns:
+                aggregate_fields[function] = GraphQLField(GraphQLNonNull(GraphQLObjectType(
+                    f"{node.name}_aggregate_{function}", {
+                        column: aggregate_value_field(type_name) for column, type_name in columns.items()
+                    })))
+        return aggregate_fields
+    return GraphQLObjectType(f"{node.name}_aggregate", fields)
+
+
+def build_schema(nodes: Dict[str, Node], connections: ConnectionSource, run_async: bool = False,
+                 max_page_size: int = MAX_PAGE_SIZE, row_cache: Optional[RowCache] = None,
+                 instrumentation: Optional[Instrumentation] = None, aggregates: bool = True) -> GraphQLSchema:
+    """turn the introspected `Node`s into a `GraphQLSchema`
+
+    every unique `Query` becomes a root field resolved by a SELECT of the
+    selected columns, compiled once per batch size and projection; the
+    lookups of a request are batched by `QueryLoader`, and their rows kept
+    across requests in `row_cache` when given.
+    non unique queries return a connection paginated with `first`/`after`
+    over the index, see `PageQuery`, and take the range arguments of their
+    range column if any.
+    rows are returned as is and read by the default field resolver.
+    with `run_async` the resolvers are coroutines, to be executed with
+    `AsyncExecutor.execution_context_class` so that independent root fields
+    query the database concurrently.
+    the `Relation`s of a node are fields of its type, resolved for all the
+    rows fetched together at once: a nested query runs one statement per
+    relation and level, whatever the number of rows. the rows of a non
+    unique relation are all returned, unpaginated.
+    with `aggregates`, every node has a `{node}_aggregate` root field, and
+    every connection an `aggregate` field over the rows of its filter,
+    first and after aside: the selected count, sum, avg, min and max are
+    computed by a single SELECT, see `AggregateQuery`.
+    root and relation fields carry the estimate of the rows they return,
+    see `cost_rule`; aggregates count the rows they read: the whole table
+    at the root, the filter of their connection otherwise.
+    the statements of a query are only prepared when it is first resolved,
+    and the GraphQL fields of the columns are shared by every type.
+    `instrumentation` receives the resolve, sql and fetch durations of every
+    query, labelled with the node and query names.
+    the schema declares the @defer and @stream directives, which are only
+    honoured by `execute_incrementally`, and the root fields of non unique
+    queries export all their rows through their `EXPORT` extension.
+    """
+    resolve = resolve_query_async if run_async else resolve_query
+    resolve_list = resolve_page_async if run_async else resolve_page
+    resolve_aggregates = resolve_aggregate_async if run_async else resolve_aggregate
+    types: Dict[str, GraphQLObjectType] = dict()
+    for node in nodes.values():
+        types[node.name] = node_type(node, partial(
+            relation_fields, node, nodes, types, connections, run_async, instrumentation))
+    root_fields: Dict[str, GraphQLField] = dict()
+    for node in nodes.values():
+        object_type = types[node.name]
+        list_type: Optional[GraphQLObjectType] = None
+        aggregate_name = f"{node.name}_aggregate"
+        aggregate_field: Optional[GraphQLField] = None
+        if aggregates:
+            lazy_aggregate = Lazy(partial(AggregateQuery, node, instrumentation, aggregate_name))
+            resolve_aggregate_field = partial(resolve_aggregates, connections, lazy_aggregate)
+            aggregate_field = GraphQLField(GraphQLNonNull(aggregate_type(node)),
+                                           resolve=resolve_aggregate_field,
+                                           extensions={AGGREGATE: True})
+            root_fields[aggregate_name] = GraphQLField(
+                aggregate_field.type,
+                resolve=instrumented(resolve_aggregate_field, instrumentation, node, aggregate_name),
+                extensions={COST: table_rows(node)})
+        for query_name, query in node.queries.items():
+            args = {
+                name: param_argument(param) for name, param in query.params.items()
+            }
+            if query.unique:
+                batch = Lazy(partial(BatchQuery, node, query, instrumentation=instrumentation,
+                                     name=query_name))
+                root_fields[query_name] = GraphQLField(
+                    object_type,
+                    args=args,
+                    resolve=instrumented(
+                        partial(resolve, connections, batch, row_cache), instrumentation, node, query_name),
+                    extensions={COST: query_rows(query)}
+                )
+                continue
+            if list_type is None:
+                list_type = connection_type(node, object_type, aggregate_field)
+            for column, param in query.ranges.items():
+                args.update(range_arguments(column, param))
+            args['first'] = FIRST_ARGUMENT
+            args['after'] = AFTER_ARGUMENT
+            page_query = Lazy(partial(PageQuery, node, query, max_page_size,
+                                      instrumentation=instrumentation, name=query_name))
+            root_fields[query_name] = GraphQLField(
+                GraphQLNonNull(list_type),
+                args=args,
+                resolve=instrumented(
+                    partial(resolve_list, connections, page_query), instrumentation, node, query_name),
+                extensions={
+                    COST: query_rows(query, max_page_size, min(DEFAULT_PAGE_SIZE, max_page_size)),
+                    FILTERED: filtered_rows(query),
+                    EXPORT: partial(export_rows, connections, page_query),
+                }
+            )
+    return GraphQLSchema(query=GraphQLObjectType('Query', root_fields),
+                         directives=[*specified_directives, *INCREMENTAL_DIRECTIVES])
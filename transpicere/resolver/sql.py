@@ -0,0 +1,158 @@
+from dataclasses import dataclass
+from typing import Iterable, List, Optional, Tuple
+
+from transpicere.generator.db import Node, Query
+
+# range arguments of a column, by the suffix of their name
+RANGE_OPERATORS = {'gt': '>', 'gte': '>=', 'lt': '<', 'lte': '<=', 'between': 'BETWEEN'}
+
+
+@dataclass(frozen=True)
+class CompiledQuery:
+    """parameterized SELECT of a `Query`, values are bound in `params` order"""
+    sql: str
+    params: Tuple[str, ...]
+    columns: Tuple[str, ...]
+    unique: bool
+    # positions in the order of the cursor values bound, of page queries
+    cursor_values: Tuple[int, ...] = ()
+
+
+def quote_identifier(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+def table_name(node: Node) -> str:
+    table = quote_identifier(node.table)
+    if node.schema:
+        return f"{quote_identifier(node.schema)}.{table}"
+    return table
+
+
+def compile_query(node: Node, query: Query, count: int = 1,
+                  columns: Optional[Iterable[str]] = None) -> CompiledQuery:
+    """SELECT `columns` (all by default) of the rows matching `count` keys,
+    bound as `count` x `params` values"""
+    selected = tuple(node.fields if columns is None else columns)
+    params = tuple(query.params)
+    select = ", ".join(quote_identifier(column) for column in selected)
+    if count == 1:
+        where = " AND ".join(
+            f"{quote_identifier(param)} = ?" for param in params)
+    elif len(params) == 1:
+        where = f"{quote_identifier(params[0])} IN ({', '.join('?' * count)})"
+    else:
+        columns = ", ".join(quote_identifier(param) for param in params)
+        key = f"({', '.join('?' * len(params))})"
+        where = f"({columns}) IN ({', '.join([key] * count)})"
+    return CompiledQuery(
+        sql=f"SELECT {select} FROM {table_name(node)} WHERE {where}",
+        params=params,
+        columns=selected,
+        unique=query.unique
+    )
+
+
+def compile_page_query(node: Node, query: Query, order: Tuple[str, ...], columns: Tuple[str, ...],
+                       after: bool, ranges: Tuple[Tuple[str, str], ...] = (),
+                       not_null: Tuple[str, ...] = (), nullable: Tuple[str, ...] = (),
+                       nulls: Tuple[str, ...] = ()) -> CompiledQuery:
+    """keyset page of a `Query`: its params, then the values of the `ranges`
+    (column, operator) conditions, then the `cursor_values` of the order when
+    `after`, then the limit
+
+    a null compares to nothing: rows with a null in the `not_null` columns
+    are left out, the `nullable` order columns sort their nulls first
+    explicitly. `nulls` are the nullable columns null in the cursor, they
+    are matched with IS NULL instead of being bound.
+    """
+    params = tuple(query.params)
+    select = ", ".join(quote_identifier(column) for column in columns)
+    conditions = filter_conditions(params, ranges)
+    conditions.extend(f"{quote_identifier(column)} IS NOT NULL" for column in not_null)
+    cursor_values: Tuple[int, ...] = ()
+    if after:
+        condition, cursor_values = keyset_condition(order, nullable, nulls)
+        conditions.append(condition)
+    where = f" WHERE {' AND '.join(conditions)}" if conditions else ''
+    order_by = ", ".join(
+        f"CASE WHEN {quote_identifier(column)} IS NULL THEN 0 ELSE 1 END, {quote_identifier(column)}"
+        if column in nullable else quote_identifier(column) for column in order)
+    return CompiledQuery(
+        sql=f"SELECT {select} FROM {table_name(node)}{where} "
+        f"ORDER BY {order_by} LIMIT ?",
+        params=params,
+        columns=columns,
+        unique=False,
+        cursor_values=cursor_values
+    )
+
+
+def keyset_condition(order: Tuple[str, ...], nullable: Tuple[str, ...],
+                     nulls: Tuple[str, ...]) -> Tuple[str, Tuple[int, ...]]:
+    """rows after the cursor in `order`, and the positions of the values bound
+
+    the leading columns without nulls are compared as a row value, which
+    the index seeks to; from the first `nullable` column on, the comparison
+    is spelled out column by column, nulls first.
+    """
+    split = next((index for index, column in enumerate(order) if column in nullable), len(order))
+    leading = order[:split]
+    keys = ", ".join(quote_identifier(column) for column in leading)
+    marks = ', '.join('?' * len(leading))
+    if split == len(order):
+        if len(order) == 1:
+            return f"{quote_identifier(order[0])} > ?", (0,)
+        return f"({keys}) > ({marks})", tuple(range(split))
+    terms: List[str] = []
+    bound: List[int] = []
+    equal: List[str] = []
+    equal_bound: List[int] = []
+    for index in range(split, len(order)):
+        column = quote_identifier(order[index])
+        if order[index] in nulls:
+            terms.append(' AND '.join(equal + [f"{column} IS NOT NULL"]))
+            bound.extend(equal_bound)
+            equal.append(f"{column} IS NULL")
+        else:
+            terms.append(' AND '.join(equal + [f"{column} > ?"]))
+            bound.extend(equal_bound + [index])
+            equal.append(f"{column} = ?")
+            equal_bound.append(index)
+    following = ' OR '.join(f"({term})" for term in terms)
+    if not leading:
+        return f"({following})", tuple(bound)
+    leading_bound = tuple(range(split))
+    return (f"({keys}) >= ({marks}) AND (({keys}) > ({marks}) OR {following})",
+            leading_bound + leading_bound + tuple(bound))
+
+
+def filter_conditions(params: Tuple[str, ...], ranges: Tuple[Tuple[str, str], ...]) -> List[str]:
+    """equality on `params` then the (column, operator) `ranges`, in binding order"""
+    conditions = [f"{quote_identifier(param)} = ?" for param in params]
+    for column, operator in ranges:
+        if operator == 'between':
+            conditions.append(f"{quote_identifier(column)} BETWEEN ? AND ?")
+        else:
+            conditions.append(
+                f"{quote_identifier(column)} {RANGE_OPERATORS[operator]} ?")
+    return conditions
+
+
+def compile_aggregate_query(node: Node, query: Optional[Query], aggregates: Tuple[Tuple[str, str], ...],
+                            ranges: Tuple[Tuple[str, str], ...] = ()) -> CompiledQuery:
+    """SELECT of the (function, column) `aggregates`, as a0, a1..., over the
+    rows of `query` (all rows when None); `count` counts rows, its column is ignored"""
+    params = tuple(query.params) if query is not None else ()
+    select = ", ".join(
+        f"{'COUNT(*)' if function == 'count' else f'{function.upper()}({quote_identifier(column)})'}"
+        f" AS {quote_identifier(f'a{index}')}"
+        for index, (function, column) in enumerate(aggregates))
+    conditions = filter_conditions(params, ranges)
+    where = f" WHERE {' AND '.join(conditions)}" if conditions else ''
+    return CompiledQuery(
+        sql=f"SELECT {select} FROM {table_name(node)}{where}",
+        params=params,
+        columns=tuple(f"a{index}" for index in range(len(aggregates))),
+        unique=True
+    )
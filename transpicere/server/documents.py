@@ -0,0 +1,126 @@
+import hashlib
+import threading
+from collections import OrderedDict
+from time import perf_counter
+from dataclasses import dataclass, field
+from typing import Any, Collection, Dict, Hashable, List, Optional, Tuple, Type
+
+from graphql import (ASTValidationRule, DocumentNode, GraphQLError, GraphQLSchema,
+                     parse, specified_rules, validate)
+
+from transpicere.resolver.metrics import Instrumentation
+
+PERSISTED_QUERY_NOT_FOUND = 'PersistedQueryNotFound'
+
+
+@dataclass
+class DocumentCacheStats:
+    hits: int = field(default=0)
+    misses: int = field(default=0)
+    evictions: int = field(default=0)
+    size: int = field(default=0)
+    persisted: int = field(default=0)
+
+
+class _LRU:
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self.entries: 'OrderedDict[Hashable, Any]' = OrderedDict()
+
+    def get(self, key: Hashable) -> Any:
+        value = self.entries.get(key)
+        if value is not None:
+            self.entries.move_to_end(key)
+        return value
+
+    def put(self, key: Hashable, value: Any) -> int:
+        self.entries[key] = value
+        self.entries.move_to_end(key)
+        evicted = 0
+        while len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+            evicted += 1
+        return evicted
+
+
+class DocumentCache:
+    """LRU cache of parsed and validated query documents
+
+    entries are keyed by the sha256 of the query text and the schema they
+    were validated against, so a schema swapped by `SchemaRefresher`
+    validates its queries again. parse and validate durations of the missed
+    queries go to `instrumentation`. the cache also stores the queries of the
+    automatic persisted queries protocol: a client sends the sha256 of a
+    query only, and the full query once when it is unknown.
+    """
+
+    def __init__(self, max_size: int = 1024, max_persisted: int = 10000,
+                 rules: Optional[Collection[Type[ASTValidationRule]]] = None,
+                 instrumentation: Optional[Instrumentation] = None):
+        self.rules = specified_rules if rules is None else rules
+        self.instrumentation = instrumentation
+        self._documents = _LRU(max_size)
+        self._persisted = _LRU(max_persisted)
+        self._stats = DocumentCacheStats()
+        self._lock = threading.Lock()
+
+    def get(self, schema: GraphQLSchema, query: str,
+            query_hash: Optional[str] = None) -> Tuple[Optional[DocumentNode], List[GraphQLError]]:
+        """the document of `query` and its validation errors"""
+        key = (id(schema), query_hash or sha256(query))
+        with self._lock:
+            entry = self._documents.get(key)
+            if entry is not None and entry[0] is schema:
+                self._stats.hits += 1
+                return entry[1], entry[2]
+            self._stats.misses += 1
+        start = perf_counter()
+        try:
+            document = parse(query)
+        except GraphQLError as e:
+            return None, [e]
+        parsed = perf_counter()
+        errors = validate(schema, document, self.rules)
+        if self.instrumentation is not None:
+            self.instrumentation.observe('parse', parsed - start)
+            self.instrumentation.observe('validate', perf_counter() - parsed)
+        with self._lock:
+            # the schema is kept with its entries: its id is not reused while cached
+            self._stats.evictions += self._documents.put(
+                key, (schema, document, errors))
+        return document, errors
+
+    def persisted_query(self, query: Optional[str], extensions: Optional[Dict[str, Any]]) -> Tuple[Optional[str], Optional[str]]:
+        """query text and hash of a request, following the persisted query extension"""
+        persisted = (extensions or {}).get('persistedQuery')
+        if not persisted:
+            return query, None
+        query_hash = persisted.get('sha256Hash')
+        if persisted.get('version') != 1 or not isinstance(query_hash, str):
+            raise GraphQLError('Unsupported persisted query version')
+        if query is None:
+            with self._lock:
+                query = self._persisted.get(query_hash)
+            if query is None:
+                raise GraphQLError(PERSISTED_QUERY_NOT_FOUND, extensions={
+                                   'code': 'PERSISTED_QUERY_NOT_FOUND'})
+            return query, query_hash
+        if sha256(query) != query_hash:
+            raise GraphQLError('provided sha does not match query')
+        with self._lock:
+            self._persisted.put(query_hash, query)
+        return query, query_hash
+
+    def stats(self) -> DocumentCacheStats:
+        with self._lock:
+            return DocumentCacheStats(
+                hits=self._stats.hits,
+                misses=self._stats.misses,
+                evictions=self._stats.evictions,
+                size=len(self._documents.entries),
+                persisted=len(self._persisted.entries)
+            )
+
+
+def sha256(query: str) -> str:
+    return hashlib.sha256(query.encode()).hexdigest()
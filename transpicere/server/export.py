@@ -0,0 +1,50 @@
+import json
+from typing import Any, Dict, Iterator, Optional, Sequence
+
+from graphql import GraphQLError, GraphQLField, GraphQLSchema, Undefined, is_non_null_type
+from graphql.utilities import coerce_input_value
+
+from transpicere.resolver.pagination import encode_value
+from transpicere.resolver.schema import EXPORT
+
+# arguments of the connections that do not apply to an export
+PAGE_ARGUMENTS = ('first', 'after')
+
+
+def export_field(schema: GraphQLSchema, name: str) -> Optional[GraphQLField]:
+    """the root field of the non unique query `name`, if any"""
+    field = schema.query_type.fields.get(name) if schema.query_type else None
+    return field if field is not None and EXPORT in field.extensions else None
+
+
+def export_arguments(field: GraphQLField, arguments: Dict[str, Any]) -> Dict[str, Any]:
+    """`arguments`, as json values, coerced to the arguments of `field`"""
+    args: Dict[str, Any] = dict()
+    for name, value in arguments.items():
+        argument = field.args.get(name)
+        if argument is None or name in PAGE_ARGUMENTS:
+            raise GraphQLError(f"unknown argument {name}")
+        args[name] = coerce_input_value(value, argument.type)
+    for name, argument in field.args.items():
+        if name not in args and argument.default_value is not Undefined:
+            args[name] = argument.default_value
+        if args.get(name) is None and is_non_null_type(argument.type):
+            raise GraphQLError(f"missing argument {name}")
+    return args
+
+
+def export_lines(schema: GraphQLSchema, name: str, arguments: Dict[str, Any],
+                 columns: Optional[Sequence[str]] = None) -> Iterator[str]:
+    """the rows of the non unique query `name` matching `arguments`, as ndjson lines
+
+    lines hold the `columns` of a row, all of them by default, encoded as
+    their cursor values are. rows are read a page at a time and their lines
+    written as the iterator is consumed, so exports of any size run in
+    constant memory. `arguments` are checked before returning.
+    """
+    field = export_field(schema, name)
+    if field is None:
+        raise GraphQLError(f"{name} is not a non unique query")
+    names, rows = field.extensions[EXPORT](export_arguments(field, arguments), columns)
+    return (json.dumps({column: encode_value(getattr(row, column)) for column in names},
+                       separators=(',', ':')) + '\n' for row in rows)
@@ -1,9 +1,24 @@
-from flask import Flask
-from graphql_server.flask import GraphQLView
+import json
 
-from web.schema import get_schema
+from flask import Flask, Response, abort, request, stream_with_context
+from graphql import GraphQLError, specified_rules
+
+from transpicere.resolver.cost import cost_rule
+from transpicere.server.documents import DocumentCache
+from transpicere.server.export import export_field, export_lines
+from web.schema import METRICS, get_schema, get_execution_context_class
+from web.view import CachedGraphQLView, reads
 
 SCHEMA = get_schema()
+DOCUMENT_CACHE_SIZE = 1024
+# estimated rows an operation may read before it is rejected
+MAX_QUERY_COST = 10000
+VALIDATION_RULES = [*specified_rules, cost_rule(MAX_QUERY_COST)]
+DOCUMENTS = DocumentCache(max_size=DOCUMENT_CACHE_SIZE, rules=VALIDATION_RULES,
+                          instrumentation=METRICS)
+if METRICS is not None:
+    METRICS.gauge('document_cache_hits', lambda: DOCUMENTS.stats().hits)
+    METRICS.gauge('document_cache_misses', lambda: DOCUMENTS.stats().misses)
 
 app = Flask(__name__)
 
@@ -13,10 +28,51 @@ def hello():
     return "Hello World!"
 
 
-app.add_url_rule('/graphql', view_func=GraphQLView.as_view(
+@app.route("/metrics")
+def metrics():
+    if METRICS is None:
+        abort(404)
+    return Response(METRICS.render(), content_type="text/plain; version=0.0.4")
+
+
+@app.route("/export/<name>", methods=['GET', 'POST'])
+def export(name: str):
+    """every row of the non unique query `name`, as ndjson
+
+    its arguments are the json object `args` and the columns the list
+    `columns` of the body, or the query string.
+    """
+    schema = getattr(SCHEMA, 'graphql_schema', SCHEMA)
+    if export_field(schema, name) is None:
+        abort(404)
+    try:
+        if request.method == 'POST':
+            body = request.get_json(force=True) or {}
+            arguments, columns = body.get('args') or {}, body.get('columns')
+        else:
+            arguments = json.loads(request.args.get('args', '{}'))
+            columns = request.args.get('columns', '').split(',') if request.args.get('columns') else None
+        with reads():
+            lines = export_lines(schema, name, arguments, columns)
+    except (GraphQLError, ValueError) as e:
+        return Response(json.dumps({'errors': [{'message': str(e)}]}), status=400,
+                        content_type="application/json")
+    return Response(stream_with_context(read(lines)), content_type="application/x-ndjson")
+
+
+def read(lines):
+    # the pages following the first are read while the response is written
+    with reads():
+        yield from lines
+
+
+app.add_url_rule('/graphql', view_func=CachedGraphQLView.as_view(
     'graphql',
     schema=SCHEMA,
+    documents=DOCUMENTS,
+    validation_rules=VALIDATION_RULES,
     graphiql=True,
+    execution_context_class=get_execution_context_class(),
 ))
 
 if __name__ == '__main__':
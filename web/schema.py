@@ -1,12 +1,50 @@
+import importlib
+import os
+from functools import partial
 from transpicere.graphql import *
+from transpicere.generator.cache import IntrospectionCache
+from transpicere.generator.db import DbConfig, ReplicaConfig
+from transpicere.generator.refresh import SchemaRefresher
+from transpicere.resolver.executor import AsyncExecutor
+from transpicere.resolver.metrics import Metrics
+from transpicere.resolver.connection import ConnectionSource
+from transpicere.resolver.pool import ConnectionPool
+from transpicere.resolver.replicas import ReplicaRouter
+from transpicere.resolver.rowcache import RowCache
+from transpicere.resolver.schema import build_schema
 import pyodbc
-from graphql import GraphQLField, GraphQLSchema, GraphQLObjectType
-from graphql import GraphQLString
+from graphql import ExecutionContext, GraphQLSchema
+from typing import List, Optional, Type, Union
+
+CONNECTION_STRING = "Driver={PostgreSQL ANSI};Uid=user;Pwd=password;Server=localhost;Port=5432;Database=postgres_transpicere;Pooling=true;Min Pool Size=0;Max Pool Size=100;Connection Lifetime=0;"
+TABLE_NAME = "sample"
+POOL_SIZE = 10
+# read replicas of CONNECTION_STRING, each with its own pool of POOL_SIZE
+REPLICAS: List[ReplicaConfig] = []
+# 'round_robin' or 'least_outstanding', see `ReplicaRouter`
+BALANCING = 'round_robin'
+# run resolvers as coroutines, their sql on a thread pool
+ASYNC_EXECUTION = True
+EXECUTOR = AsyncExecutor(max_workers=POOL_SIZE) if ASYNC_EXECUTION else None
+# rows of unique lookups kept across requests, e.g.
+# RowCache(max_bytes=64 << 20, default_ttl=30.0); they may be up to its TTL
+# stale: nothing calls `invalidate` on writes. None to always query
+ROW_CACHE: Optional[RowCache] = None
+# phase latency histograms served on /metrics, None to disable
+METRICS: Optional[Metrics] = Metrics()
+# directory of the introspected model shared by the workers, None to
+# introspect the catalog in every worker. the model is loaded from pickles:
+# the directory must only be writable by trusted users
+INTROSPECTION_CACHE_DIR: Optional[str] = os.path.expanduser('~/.cache/transpicere')
+# module written by `python -m transpicere.generator.codegen` to build the
+# schema from, e.g. 'web.generated_schema'; None to introspect the catalog
+# and refresh the schema as it changes
+GENERATED_SCHEMA: Optional[str] = None
 
 
 def init_db():
-    connection_string = "Driver={PostgreSQL ANSI};Uid=user;Pwd=password;Server=localhost;Port=5432;Database=postgres_transpicere;Pooling=true;Min Pool Size=0;Max Pool Size=100;Connection Lifetime=0;"
-    table_name = f"sample"
+    connection_string = CONNECTION_STRING
+    table_name = TABLE_NAME
     print(f"using table {table_name}")
     with pyodbc.connect(connection_string) as cnxn:
         cursor = cnxn.cursor()
@@ -39,14 +77,47 @@ def init_db():
         cursor.commit()
 
 
-def get_schema() -> GraphQLSchema:
-    schema = GraphQLSchema(
-        query=GraphQLObjectType(
-            name='RootQueryType',
-            fields={
-                'hello': GraphQLField(
-                    GraphQLString,
-                    resolve=lambda obj, info: 'me!')
-            }))
-
+def get_schema() -> Union[SchemaRefresher[GraphQLSchema], GraphQLSchema]:
+    config = DbConfig(connection_string=CONNECTION_STRING, tables=[TABLE_NAME], replicas=REPLICAS)
+    pool = ConnectionPool(config.connection_string, min_size=1, max_size=POOL_SIZE)
+    connections: ConnectionSource = pool
+    if config.replicas:
+        connections = router = ReplicaRouter(pool, {
+            replica.name or f"replica{index}": (
+                ConnectionPool(replica.connection_string, min_size=1, max_size=POOL_SIZE), replica.weight)
+            for index, replica in enumerate(config.replicas)
+        }, balancing=BALANCING)
+    options = dict(run_async=ASYNC_EXECUTION, row_cache=ROW_CACHE, instrumentation=METRICS)
+    schema: Union[SchemaRefresher[GraphQLSchema], GraphQLSchema]
+    if GENERATED_SCHEMA is not None:
+        schema = importlib.import_module(GENERATED_SCHEMA).build_schema(connections, **options)
+    else:
+        schema = SchemaRefresher(
+            config,
+            build_schema=partial(build_schema, connections=connections, **options),
+            cache=None if INTROSPECTION_CACHE_DIR is None else IntrospectionCache(INTROSPECTION_CACHE_DIR))
+    if METRICS is not None:
+        METRICS.gauge('pool_in_use', lambda: pool.stats().in_use)
+        METRICS.gauge('pool_idle', lambda: pool.stats().idle)
+        if config.replicas:
+            # replica names are user input: they are label values, not part of the metric names
+            for name in router.stats():
+                for counter in ('outstanding', 'borrowed', 'errors', 'latency'):
+                    METRICS.gauge(f"replica_{counter}",
+                                  lambda name=name, counter=counter: getattr(router.stats()[name], counter),
+                                  labels={'replica': name})
+                METRICS.gauge('replica_healthy', lambda name=name: int(router.stats()[name].healthy),
+                              labels={'replica': name})
+        if ROW_CACHE is not None:
+            METRICS.gauge('row_cache_hit_rate', lambda: ROW_CACHE.stats().hit_rate)
+            METRICS.gauge('row_cache_evicted_bytes', lambda: ROW_CACHE.stats().evicted_bytes)
+    if isinstance(schema, SchemaRefresher):
+        schema.start()
     return schema
+
+
+def get_execution_context_class() -> Optional[Type[ExecutionContext]]:
+    execution_context_class = None if EXECUTOR is None else EXECUTOR.execution_context_class()
+    if METRICS is not None:
+        return METRICS.execution_context_class(execution_context_class or ExecutionContext)
+    return execution_context_class
@@ -0,0 +1,132 @@
+from contextlib import nullcontext
+from functools import partial
+from typing import Any, ContextManager, Dict, Iterator, Optional, Tuple
+
+from flask import Response, request, stream_with_context
+from graphql import ExecutionResult, GraphQLError, OperationType, execute, validate_schema
+from graphql.utilities import get_operation_ast
+from graphql_server import (HttpQueryError, encode_execution_results,
+                            format_execution_result, load_json_variables)
+from graphql_server.flask import GraphQLView
+
+from transpicere.resolver.incremental import execute_incrementally
+from transpicere.resolver.replicas import primary_reads
+from transpicere.server.documents import DocumentCache
+
+MULTIPART = 'multipart/mixed'
+# sent by clients that must read their own writes: their reads go to the primary
+READ_YOUR_WRITES = 'X-Read-Your-Writes'
+
+
+def reads() -> ContextManager[Any]:
+    """the database the request reads from, see `ReplicaRouter`"""
+    return primary_reads() if READ_YOUR_WRITES in request.headers else nullcontext()
+
+
+class CachedGraphQLView(GraphQLView):
+    """GraphQLView reusing parsed and validated documents
+
+    queries go through `documents`, which also implements automatic
+    persisted queries. batches and graphiql pages use the default path.
+    clients accepting multipart/mixed responses get the @defer fragments
+    and @stream items of their query in parts following the initial
+    result, written as they are executed.
+    """
+    documents: Optional[DocumentCache] = None
+
+    def dispatch_request(self) -> Any:
+        if self.documents is None or request.method.lower() == 'get' and self.should_display_graphiql():
+            return super().dispatch_request()
+        try:
+            request_method = request.method.lower()
+            if request_method not in ('get', 'post'):
+                raise HttpQueryError(405, "GraphQL only supports GET and POST requests.",
+                                     headers={"Allow": "GET, POST"})
+            data = self.parse_body()
+            if isinstance(data, list):
+                return super().dispatch_request()
+            with reads():
+                result, subsequent = self.execute(request_method, data, request.args,
+                                                  incremental=MULTIPART in request.headers.get('Accept', ''))
+            if subsequent is not None:
+                return Response(stream_with_context(self.multipart(result, subsequent)),
+                                content_type=f'{MULTIPART}; boundary="-"')
+            body, status_code = encode_execution_results(
+                [result],
+                format_error=self.format_error,
+                encode=partial(self.encode, pretty=self.pretty or request.args.get("pretty")),
+            )
+            return Response(body, status=status_code, content_type="application/json")
+        except HttpQueryError as e:
+            return Response(
+                self.encode(dict(errors=[self.format_error(GraphQLError(e.message))])),
+                status=e.status_code,
+                headers=e.headers,
+                content_type="application/json",
+            )
+
+    def multipart(self, result: ExecutionResult, subsequent: Iterator[Dict[str, Any]]) -> Iterator[str]:
+        initial, _ = format_execution_result(result, self.format_error)
+        yield self.part({**(initial or {}), 'hasNext': True})
+        with reads():
+            for payload in subsequent:
+                for incremental in payload.get('incremental', ()):
+                    if 'errors' in incremental:
+                        incremental['errors'] = [self.format_error(error) for error in incremental['errors']]
+                yield self.part(payload)
+        yield '\r\n-----\r\n'
+
+    def part(self, payload: Dict[str, Any]) -> str:
+        return f'\r\n---\r\nContent-Type: application/json; charset=utf-8\r\n\r\n{self.encode(payload)}'
+
+    def execute(self, request_method: str, data: Dict[str, Any], query_data: Dict[str, Any],
+                incremental: bool = False) -> Tuple[ExecutionResult, Optional[Iterator[Dict[str, Any]]]]:
+        """the result of the query, and its subsequent payloads when `incremental`
+        and some of it is deferred or streamed"""
+        assert self.documents is not None
+        query = data.get("query") or query_data.get("query")
+        variables = load_json_variables(
+            data.get("variables") or query_data.get("variables"))
+        operation_name = data.get(
+            "operationName") or query_data.get("operationName")
+        extensions = load_json_variables(
+            data.get("extensions") or query_data.get("extensions"))
+        try:
+            query, query_hash = self.documents.persisted_query(
+                query, extensions)
+        except GraphQLError as e:
+            return ExecutionResult(data=None, errors=[e]), None
+        if not query:
+            raise HttpQueryError(400, "Must provide query string.")
+        if not isinstance(query, str):
+            raise HttpQueryError(400, "Unexpected query type.")
+
+        schema_errors = validate_schema(self.schema)
+        if schema_errors:
+            return ExecutionResult(data=None, errors=schema_errors), None
+        document, errors = self.documents.get(self.schema, query, query_hash)
+        if document is None or errors:
+            return ExecutionResult(data=None, errors=errors), None
+
+        if request_method == "get":
+            operation_ast = get_operation_ast(document, operation_name)
+            if operation_ast and operation_ast.operation != OperationType.QUERY:
+                raise HttpQueryError(
+                    405,
+                    f"Can only perform a {operation_ast.operation.value} operation from a POST request.",
+                    headers={"Allow": "POST"},
+                )
+        result = (execute_incrementally if incremental else execute)(
+            self.schema,
+            document,
+            root_value=self.get_root_value(),
+            context_value=self.get_context(),
+            variable_values=variables,
+            operation_name=operation_name,
+            middleware=self.get_middleware(),
+            execution_context_class=self.get_execution_context_class(),
+        )
+        if incremental:
+            return result
+        assert isinstance(result, ExecutionResult)
+        return result, None